@@ -5,6 +5,7 @@ from time import gmtime, strftime
 import numpy as np
 from scipy.integrate.quadrature import cumtrapz #@UnresolvedImport
 from scipy import interpolate
+from wafo.interpolate import _grid_interpolator
 from scipy import integrate
 __all__ = ['PlotData', 'AxisLabels']
 
@@ -123,12 +124,19 @@ class PlotData(object):
         >>> hi = di.plot()
         >>> h = d.plot()
         
+        Gridded data are interpolated with a cached RectilinearInterp,
+        other data with griddata.
+
         See also
         --------
-        scipy.interpolate.griddata
+        scipy.interpolate.griddata,
+        wafo.interpolate.RectilinearInterp
         '''
         options = dict(method='linear')
         options.update(**kwds)
+        interpolator = _grid_interpolator(self, **options)
+        if interpolator is not None:
+            return interpolator(*points)
         if isinstance(self.args, (list, tuple)): # Multidimensional data
             ndim = len(self.args)
             if ndim < 2:
@@ -151,22 +159,23 @@ class PlotData(object):
         >>> d.dataCI = np.vstack((d.data*.9,d.data*1.1)).T
         >>> d.integrate(0,np.pi/2, return_ci=True)
         array([ 0.99940055,  0.85543644,  1.04553343])
+
+        Integrate gridded 2D data
+        >>> y = np.linspace(0,2,21)
+        >>> X, Y = np.meshgrid(x, y)
+        >>> d2 = PlotData(X + Y, [x, y])
+        >>> round(d2.integrate([0, 0], [1, 2]), 3)
+        3.0
         
         '''
         method = kwds.pop('method','trapz')
         fun = getattr(integrate, method)
         if isinstance(self.args, (list, tuple)): # Multidimensional data
-            raise NotImplementedError('integration for ndim>1 not implemented')
-            #ndim = len(self.args)
-            #if ndim < 2:
-#                msg = '''Unable to determine plotter-type, because len(self.args)<2.
-#                If the data is 1D, then self.args should be a vector!
-#                If the data is 2D, then length(self.args) should be 2.
-#                If the data is 3D, then length(self.args) should be 3.
-#                Unless you fix this, the plot methods will not work!'''
-#                warnings.warn(msg)
-#            else:
-#                return interpolate.griddata(self.args, self.data.ravel(), **kwds)
+            interpolator = _grid_interpolator(self)
+            if interpolator is None:
+                raise NotImplementedError('integration for ndim>1 only '
+                                          'implemented for gridded data')
+            return interpolator.integrate(a, b, method, **kwds)
         else: #One dimensional data
             return_ci = kwds.pop('return_ci', False)
             x  = self.args
@@ -385,6 +385,70 @@ class CovData1D(PlotData):
 
         _set_seed(iseed)
 
+        dT = self.sampling_period()
+
+        x = zeros((ns, cases + 1))
+
+        if derivative:
+            xder = x.copy()
+
+        S = self._circulant_spectrum(ns, nugget)
+        nfft = S.shape[0]
+
+        cases1 = floor(cases / 2)
+        cases2 = ceil(cases / 2)
+# Generate standard normal random numbers for the simulations
+
+        #randn = np.random.randn
+        epsi = randn(nfft, cases2) + 1j * randn(nfft, cases2)
+        Ssqr = sqrt(S / (nfft)) # #sqrt(S(wn)*dw )
+        ephat = epsi * Ssqr #[:,np.newaxis]
+        y = fft(ephat, nfft, axis=0)
+        x[:, 1:cases + 1] = hstack((y[2:ns + 2, 0:cases2].real, y[2:ns + 2, 0:cases1].imag))
+
+        x[:, 0] = linspace(0, (ns - 1) * dT, ns) ##(0:dT:(dT*(np-1)))'
+
+        if derivative:
+            Ssqr = Ssqr * r_[0:(nfft / 2 + 1), -(nfft / 2 - 1):0] * 2 * pi / nfft / dT
+            ephat = epsi * Ssqr #[:,newaxis]
+            y = fft(ephat, nfft, axis=0)
+            xder[:, 1:(cases + 1)] = hstack((y[2:ns + 2, 0:cases2].imag - y[2:ns + 2, 0:cases1].real))
+            xder[:, 0] = x[:, 0]
+
+        if self.tr is not None:
+            print('   Transforming data.')
+            g = self.tr
+            if derivative:
+                for ix in range(cases):
+                    tmp = g.gauss2dat(x[:, ix + 1], xder[:, ix + 1])
+                    x[:, ix + 1] = tmp[0]
+                    xder[:, ix + 1] = tmp[1]
+            else:
+                for ix in range(cases):
+                    x[:, ix + 1] = g.gauss2dat(x[:, ix + 1])
+
+        if derivative:
+            return x, xder
+        else:
+            return x
+        
+    def _circulant_spectrum(self, ns=0, nugget=0):
+        '''
+        Return nonnegative spectrum of the circulant embedding of the ACF
+
+        Parameters
+        ----------
+        ns : scalar
+            number of points to simulate, nfft >= 2*ns.
+        nugget : scalar
+            nugget effect added to acf(0).
+
+        Returns
+        -------
+        S : array, shape (nfft, 1)
+            eigenvalues of the circulant embedding of the covariance matrix,
+            with negative values and high frequency noise truncated to zero.
+        '''
         acf = self.data.ravel()
         n = acf.size
 
@@ -395,13 +459,6 @@ class CovData1D(PlotData):
 
         acf.shape = (n, 1)
 
-        dT = self.sampling_period()
-
-        x = zeros((ns, cases + 1))
-
-        if derivative:
-            xder = x.copy()
-
         ## add a nugget effect to ensure that round off errors
         ## do not result in negative spectral estimates
         acf[0] = acf[0] + nugget
@@ -455,44 +512,64 @@ class CovData1D(PlotData):
             ## truncating small values to zero to ensure that
             ## that high frequency noise is not added to
             ## the simulated timeseries
+        return S
 
-        cases1 = floor(cases / 2)
-        cases2 = ceil(cases / 2)
-# Generate standard normal random numbers for the simulations
+    def sim_iter(self, ns=None, cases=1, iseed=None, blocksize=2 ** 14,
+                 reltol=1e-6):
+        '''
+        Simulates a Gaussian process from ACF block by block
 
-        #randn = np.random.randn
-        epsi = randn(nfft, cases2) + 1j * randn(nfft, cases2)
-        Ssqr = sqrt(S / (nfft)) # #sqrt(S(wn)*dw )
-        ephat = epsi * Ssqr #[:,np.newaxis]
-        y = fft(ephat, nfft, axis=0)
-        x[:, 1:cases + 1] = hstack((y[2:ns + 2, 0:cases2].real, y[2:ns + 2, 0:cases1].imag))
+        Parameters
+        ----------
+        ns : scalar
+            total number of simulated points.  (default length(S)-1=n-1).
+        cases : scalar
+            number of replicates (default=1)
+        iseed : int or state
+            starting state/seed number for a private random number generator
+            (default the global generator in numpy.random is used)
+        blocksize : scalar
+            number of points in each block (default 2**14)
+        reltol : scalar
+            relative part of the filter energy that may be truncated.
 
-        x[:, 0] = linspace(0, (ns - 1) * dT, ns) ##(0:dT:(dT*(np-1)))'
+        Returns
+        -------
+        xs : generator
+            yielding consecutive blocks of the simulation as
+            blocksize x cases+1 matrices ( t,X1(t) X2(t) ...).
 
-        if derivative:
-            Ssqr = Ssqr * r_[0:(nfft / 2 + 1), -(nfft / 2 - 1):0] * 2 * pi / nfft / dT
-            ephat = epsi * Ssqr #[:,newaxis]
-            y = fft(ephat, nfft, axis=0)
-            xder[:, 1:(cases + 1)] = hstack((y[2:ns + 2, 0:cases2].imag - y[2:ns + 2, 0:cases1].real))
-            xder[:, 0] = x[:, 0]
+        Details
+        -------
+        The process is simulated by filtering white noise with the square
+        root of the circulant embedding of the ACF. Memory is bounded by the
+        blocksize and the length of the ACF, not by ns.
 
-        if self.tr is not None:
-            print('   Transforming data.')
-            g = self.tr
-            if derivative:
-                for ix in range(cases):
-                    tmp = g.gauss2dat(x[:, ix + 1], xder[:, ix + 1])
-                    x[:, ix + 1] = tmp[0]
-                    xder[:, ix + 1] = tmp[1]
-            else:
-                for ix in range(cases):
-                    x[:, ix + 1] = g.gauss2dat(x[:, ix + 1])
+        Example:
+        >>> import numpy as np
+        >>> import wafo.spectrum.models as sm
+        >>> Sj = sm.Jonswap()
+        >>> S = Sj.tospecdata()   #Make spec
+        >>> R = S.tocovdata()
+        >>> for x in R.sim_iter(ns=20000, blocksize=5000):
+        ...     x.shape
+        (5000, 2)
+        (5000, 2)
+        (5000, 2)
+        (5000, 2)
+
+        See also
+        --------
+        sim, SpecData1D.sim_iter
+        '''
+        if ns is None:
+            ns = self.data.size - 1
+        sqrt_s = sqrt(self._circulant_spectrum().ravel())
+        return _wafospec.core._sim_blocks(sqrt_s, ns, cases,
+                                          self.sampling_period(), blocksize,
+                                          reltol, self.tr,
+                                          _wafospec.core._random_state(iseed))
 
-        if derivative:
-            return x, xder
-        else:
-            return x
-        
     def simcond(self, xo, cases=1, method='approx', inds=None):
         """ 
         Simulate values conditionally on observed known values
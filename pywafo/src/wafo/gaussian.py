@@ -8,7 +8,7 @@ import numpy as np
 import wafo.mvnprdmod as mvnprdmod
 import wafo.rindmod as rindmod
 import warnings
-from wafo.misc import common_shape
+from wafo.misc import common_shape, parallel_map
 
 __all__ = ['Rind', 'rindmod', 'mvnprdmod', 'mvn', 'cdflomax' , 'prbnormtndpc', 
            'prbnormndpc', 'prbnormnd', 'cdfnorm2d', 'prbnorm2d','cdfnorm','invnorm', 
@@ -316,11 +316,67 @@ class Rind(object):
             indI = r_[-1:Ntd]
 
         Ex, indI = atleast_1d(m, indI)
+        return self._rind(BIG, Ex, Blo, Bup, indI, xc, nt, self._get_seed())
+
+    def map(self, problems, num_workers=1):
+        '''
+        Return rind results for a sequence of independent problems
+
+        Parameters
+        ----------
+        problems : iterable of tuples
+            arguments (cov, m, ab, bb[, indI, xc, nt]) to rind for each problem.
+        num_workers : scalar integer, optional
+            number of worker processes used to evaluate the problems.
+            (default 1, i.e., evaluate them in this process)
+
+        Returns
+        -------
+        results : list
+            rind(*problem) for each problem, i.e., (val, err, terr) tuples.
+
+        Notes
+        -----
+        The integration constants of rindmod are module globals. Every
+        problem is therefore evaluated by a copy of this Rind object that
+        sets its own constants in the process where it runs. Each problem
+        gets its own seed drawn from a stream started at the seed attribute,
+        so the results are reproducible and independent of num_workers when
+        seed is given.
+
+        Example
+        -------
+        >>> n = 5
+        >>> Sc = (ones((n, n)) - eye(n)) * 0.3 + eye(n)
+        >>> rind = Rind(seed=1)
+        >>> problems = [(Sc[:k, :k], zeros(k), -inf, -1.2, r_[-1, k - 1])
+        ...             for k in range(2, n + 1)]
+        >>> res = rind.map(problems)
+        >>> res2 = rind.map(problems, num_workers=2)
+        >>> np.allclose([r[0] for r in res], [r[0] for r in res2])
+        True
+        '''
+        problems = list(problems)
+        seeds = self._get_seeds(len(problems))
+        options = self.__dict__.copy()
+        tasks = [(options, problem, seed)
+                 for problem, seed in zip(problems, seeds)]
+        return list(parallel_map(_rind_problem, tasks, num_workers))
+
+    def _get_seed(self):
         if self.seed is None:
-            seed = int(floor(random.rand(1) * 1e10)) #@UndefinedVariable
-        else:
-            seed = int(self.seed)
+            return int(floor(random.rand(1) * 1e10)) #@UndefinedVariable
+        return int(self.seed)
 
+    def _get_seeds(self, n):
+        '''Return one seed for each of n problems, see Rind.map'''
+        if self.seed is None:
+            return [self._get_seed() for unused_k in range(n)]
+        seeds = random.RandomState(int(self.seed)).randint(1, 2 ** 31 - 1,
+                                                            size=n)
+        return [int(seed) for seed in seeds]
+
+    def _rind(self, BIG, Ex, Blo, Bup, indI, xc, nt, seed):
         #   INFIN  = INTEGER, array of integration limits flags:  size 1 x Nb
         #            if INFIN(I) < 0, Ith limits are (-infinity, infinity);
         #            if INFIN(I) = 0, Ith limits are (-infinity, Hup(I)];
@@ -338,6 +394,15 @@ class Rind(object):
         ind2 = indI + 1
         return rindmod.rind(BIG, Ex, xc, nt, ind2, Blo, Bup, infin, seed) #@UndefinedVariable
               
+def _rind_problem(args):
+    '''Return rind(*problem) with the given options and seed, see Rind.map'''
+    options, problem, seed = args
+    rind = Rind.__new__(Rind)
+    rind.__dict__.update(options)
+    rind.seed = seed
+    rind.set_constants()
+    return rind(*problem)
+
 def test_rind():
     ''' Small test function
     '''
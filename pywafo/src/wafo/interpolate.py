@@ -24,7 +24,8 @@ import polynomial as pl
 
 
 __all__ = ['PPform', 'savitzky_golay', 'savitzky_golay_piecewise', 'sgolay2d','SmoothSpline', 
-           'pchip_slopes','slopes','stineman_interp', 'Pchip','StinemanInterp', 'CubicHermiteSpline']
+           'pchip_slopes','slopes','stineman_interp', 'Pchip','StinemanInterp', 'CubicHermiteSpline',
+           'RectilinearInterp']
 
 def savitzky_golay(y, window_size, order, deriv=0):
     r"""Smooth (and optionally differentiate) data with a Savitzky-Golay filter.
@@ -985,6 +986,285 @@ class Pchip(PiecewisePolynomial):
             yp = slopes(x, y, method=method, monotone=True)
         super(Pchip, self).__init__(x, zip(y,yp), orders=3)
         
+def _is_equidistant(x):
+    '''
+    Return True if the sorted grid x is equidistant apart from round off
+    '''
+    dx = diff(x)
+    return np.allclose(dx, dx.mean(), rtol=1e-10, atol=0)
+
+class RectilinearInterp(object):
+    '''
+    Interpolator for data given on a rectilinear grid
+
+    Parameters
+    ----------
+    args : vector or list of vectors
+        grid points along each axis (1D or N-D data, respectively).
+    data : array-like
+        data values at the grid with shape as returned by meshgrid(*args),
+        i.e., (len(args[1]), len(args[0]), len(args[2]), ...) for N-D data.
+    method : {'linear', 'nearest', 'cubic'}
+        Method of interpolation. 'cubic' is an interpolating cubic spline
+        (1-D) or bicubic spline (2-D) and is not available for ndim > 2.
+    fill_value : float, optional
+        Value returned for points outside the grid (default nan).
+
+    The grid is sorted and the cell lookup, and for cubic splines also the
+    coefficients, is built once so that the object can be called repeatedly
+    at a cost of O(log(n)) per point and axis. The linear and nearest
+    interpolators read the data attribute on each call, so the data may be
+    changed or replaced afterwards.
+
+    Example
+    -------
+    >>> import wafo.interpolate as wi
+    >>> x = np.linspace(0, 1, 11)
+    >>> y = np.linspace(0, 2, 21)
+    >>> X, Y = np.meshgrid(x, y)
+    >>> f = wi.RectilinearInterp([x, y], X + 2 * Y)
+    >>> f([0.15, 0.5], [0.25, 3])
+    array([ 0.65,   nan])
+    >>> f(0.15, 0.25) == f(np.array([[0.15, 0.25]]))
+    array([ True], dtype=bool)
+    '''
+    def __init__(self, args, data, method='linear', fill_value=np.nan):
+        from scipy.interpolate import (InterpolatedUnivariateSpline,
+                                       RectBivariateSpline)
+        if isinstance(args, (list, tuple)):
+            args = [np.asarray(arg, dtype=float).ravel() for arg in args]
+        else:
+            args = [np.asarray(args, dtype=float).ravel()]
+        ndim = len(args)
+        grid_shape = tuple(len(arg) for arg in args)
+        if ndim > 1:
+            # meshgrid convention: the first two axes are swapped
+            data_shape = (grid_shape[1], grid_shape[0]) + grid_shape[2:]
+        else:
+            data_shape = grid_shape
+        order = [None] * ndim
+        for axis, arg in enumerate(args):
+            if np.any(np.diff(arg) <= 0):
+                order[axis] = np.argsort(arg, kind='mergesort')
+                args[axis] = arg = arg[order[axis]]
+                if np.any(np.diff(arg) <= 0):
+                    raise ValueError('Grid points must be distinct!')
+        self.args = args
+        self.ndim = ndim
+        self.method = method
+        self.fill_value = fill_value
+        self._order = order
+        self._data_shape = data_shape
+        if method in ('linear', 'nearest'):
+            if min(grid_shape) < 2:
+                raise ValueError('At least 2 grid points needed along each axis!')
+            # the data are read on each call, so that changes show up
+            self.data = data
+            strides = list(np.cumprod((1,) + data_shape[:0:-1])[::-1])
+            if ndim > 1:
+                strides[0], strides[1] = strides[1], strides[0]
+            self._strides = strides
+            self._inv_dx = [1. / diff(arg) for arg in args]
+            self._inv_step = [(len(arg) - 1) / (arg[-1] - arg[0])
+                              if _is_equidistant(arg) else None
+                              for arg in args]
+        elif method == 'cubic' and ndim == 1:
+            self._interp = InterpolatedUnivariateSpline(args[0],
+                                                        self._values(data), k=3)
+        elif method == 'cubic' and ndim == 2:
+            self._interp = RectBivariateSpline(args[0], args[1],
+                                               self._values(data),
+                                               kx=3, ky=3, s=0)
+        else:
+            raise ValueError('Method %s not implemented for ndim=%d' %
+                             (method, ndim))
+
+    def _values(self, data):
+        '''
+        Return data as an array with axes and order of the sorted grid
+        '''
+        values = np.asarray(data).reshape(self._data_shape)
+        if self.ndim > 1:
+            values = values.swapaxes(0, 1)
+        for axis, order in enumerate(self._order):
+            if order is not None:
+                values = values.take(order, axis=axis)
+        return values
+
+    def _points(self, points):
+        ndim = self.ndim
+        if len(points) == 1 and ndim > 1:
+            points = points[0]
+            if not isinstance(points, (list, tuple)):
+                points = np.asarray(points, dtype=float)
+                points = [points[..., i] for i in range(ndim)]
+        if len(points) != ndim:
+            raise ValueError('Expected %d coordinates, got %d' %
+                             (ndim, len(points)))
+        return np.broadcast_arrays(*[np.asarray(xi, dtype=float)
+                                     for xi in points])
+
+    def __call__(self, *points):
+        '''
+        Return interpolated data at points
+
+        Parameters
+        ----------
+        points : ndim arrays or ndarray of shape (..., ndim)
+            coordinates of the points (broadcasted against each other).
+        '''
+        points = self._points(points)
+        shape = points[0].shape
+        xi = [x.ravel() for x in points]
+        with np.errstate(invalid='ignore'): # NaNs are outside the grid
+            if self.method == 'cubic':
+                if self.ndim == 1:
+                    yi = self._interp(xi[0])
+                else:
+                    yi = self._interp.ev(xi[0], xi[1])
+                outside = np.zeros(len(xi[0]), dtype=bool)
+                for x, arg in zip(xi, self.args):
+                    outside |= ~((arg[0] <= x) & (x <= arg[-1]))
+                yi[outside] = self.fill_value
+            else:
+                yi = self._eval_grid(xi)
+        return yi.reshape(shape)
+
+    def _find_cells(self, x, axis):
+        '''
+        Return index to the grid cell containing x along axis
+        '''
+        arg = self.args[axis]
+        n = len(arg)
+        inv_step = self._inv_step[axis]
+        if inv_step is None:
+            return np.clip(arg.searchsorted(x, side='right') - 1, 0, n - 2)
+        # equidistant grid: guess the cell and correct for round off
+        # fmin and fmax also map NaNs into the grid
+        i = np.fmax(np.fmin((x - arg[0]) * inv_step, n - 2), 0).astype(int)
+        i -= (x < arg[i]) & (i > 0)
+        i += (arg[i + 1] <= x) & (i < n - 2)
+        return i
+
+    def _eval_grid(self, xi):
+        values = np.asarray(self.data).reshape(self._data_shape).ravel()
+        n = len(xi[0])
+        index = np.zeros(n, dtype=int)
+        outside = np.zeros(n, dtype=bool)
+        cells = []
+        for axis, x in enumerate(xi):
+            arg = self.args[axis]
+            outside |= ~((arg[0] <= x) & (x <= arg[-1]))
+            i = self._find_cells(x, axis)
+            t = (x - arg[i]) * self._inv_dx[axis][i] # relative position in cell
+            order = self._order[axis]
+            stride = self._strides[axis]
+            if self.method == 'nearest':
+                i = i + (t > 0.5)
+                if order is not None:
+                    i = order[i]
+                index += i * stride
+            else:
+                i0, i1 = i, i + 1
+                if order is not None:
+                    i0, i1 = order[i0], order[i1]
+                cells.append((t, i0 * stride, i1 * stride))
+        if self.method == 'nearest':
+            yi = values[index].astype(float)
+        else:
+            yi = np.zeros(n)
+            # sum over the 2**ndim corners of the cells
+            for corner in range(2 ** len(cells)):
+                weight = 1.0
+                index = 0
+                for k, (t, index0, index1) in enumerate(cells):
+                    if corner >> k & 1:
+                        weight = weight * t
+                        index = index + index1
+                    else:
+                        weight = weight * (1 - t)
+                        index = index + index0
+                yi += weight * values[index]
+        yi[outside] = self.fill_value
+        return yi
+
+    def integrate(self, a, b, method='trapz', **kwds):
+        '''
+        Return integral of the interpolated data over the box [a, b]
+
+        Parameters
+        ----------
+        a, b : array-like
+            lower and upper integration limits along each axis.
+        method : string
+            name of the integration rule in scipy.integrate used along each
+            axis, e.g., 'trapz' or 'simps'.
+
+        Example
+        -------
+        >>> import wafo.interpolate as wi
+        >>> x = np.linspace(0, 1, 11)
+        >>> y = np.linspace(0, 2, 21)
+        >>> X, Y = np.meshgrid(x, y)
+        >>> f = wi.RectilinearInterp([x, y], X + 2 * Y)
+        >>> np.allclose(f.integrate([0, 0], [1, 2]), 5)
+        True
+        >>> np.allclose(f.integrate([0.05, 0], [0.55, 1]), 0.65)
+        True
+        '''
+        from scipy import integrate
+        fun = getattr(integrate, method)
+        a = np.atleast_1d(a)
+        b = np.atleast_1d(b)
+        xi = []
+        for ai, bi, arg in zip(a, b, self.args):
+            ix = np.flatnonzero((ai < arg) & (arg < bi))
+            xi.append(np.hstack((ai, arg.take(ix), bi)))
+        fi = self(*np.meshgrid(*xi, indexing='ij'))
+        for x in xi[::-1]:
+            fi = fun(fi, x, axis=-1, **kwds)
+        return fi
+
+def _grid_interpolator(obj, method='linear', fill_value=np.nan, **options):
+    '''
+    Return cached RectilinearInterp for the data of obj or None
+
+    obj is a PlotData object. None is returned unless obj.data are on a
+    rectilinear grid, i.e., obj.data.shape equal to the shape of
+    meshgrid(*obj.args), and the options are handled by RectilinearInterp.
+    The grid lookup is cached on obj as long as obj.args is not replaced,
+    while the current obj.data are used on each call.
+    '''
+    args = obj.args
+    if not isinstance(args, (list, tuple)):
+        args = [args]
+    if (options or (method == 'cubic' and len(args) > 2) or
+            any(np.ndim(arg) != 1 for arg in args) or
+            np.size(obj.data) != np.prod([len(arg) for arg in args])):
+        return None
+    if method == 'cubic': # spline coefficients depend on the data
+        return RectilinearInterp(obj.args, obj.data, method, fill_value)
+    cache = obj.__dict__.get('_interpolators')
+    if cache is None or cache[0] is not obj.args:
+        cache = obj._interpolators = (obj.args, {})
+    key = (method, repr(fill_value))
+    if key not in cache[1]:
+        cache[1][key] = RectilinearInterp(obj.args, obj.data, method,
+                                          fill_value)
+    interpolator = cache[1][key]
+    interpolator.data = obj.data
+    return interpolator
+
+def test_rectilinear_interp():
+    x = np.array([0, 1, 2, 3, 4, 100]) * 1e-10
+    f = RectilinearInterp(x, (x * 1e10) ** 2)
+    xi = np.linspace(0, 100, 41) * 1e-10
+    assert np.allclose(f(xi), np.interp(xi, x, (x * 1e10) ** 2))
+    x = np.linspace(0, 1, 11) * 1e-10
+    f = RectilinearInterp(x, x * 1e10)
+    assert f._inv_step[0] is not None
+    assert np.allclose(f(xi / 100), xi / 100 * 1e10)
+
 def test_smoothing_spline():
     x = linspace(0, 2 * pi + pi / 4, 20) 
     y = sin(x) #+ np.random.randn(x.size)
@@ -926,6 +926,18 @@ class KDE(_KDE):
         points : (# of dimensions, # of points)-array
             Alternatively, a (# of dimensions,) vector can be passed in and
             treated as a single point.
+        method : 'direct' or 'support', optional
+            'direct' sums the kernel over all data for every point (default).
+            'support' sorts the data into cells as large as the support of
+            the kernel and sums only over the data in the cells next to
+            every point.
+        tol : real scalar, optional
+            kernel values less than tol times the kernel maximum are
+            neglected by the 'support' method. (default: the kernel is
+            truncated at its effective support)
+        blocksize : scalar integer, optional
+            maximum number of kernel evaluations done in one vectorized
+            step. (default 2**14)
 
         Returns
         -------
@@ -938,35 +950,109 @@ class KDE(_KDE):
         the dimensionality of the KDE.
         """
         d, m = points.shape
-       
-        result = np.zeros((m,))
-        
+        y = kwds.get('y', 1) * np.ones(self.n)
         r = kwds.get('r', 0)
-        if r==0:
-            fun = lambda xi : 1
-        else:
-            fun = lambda xi : (xi ** r).sum(axis=0)
-
-        if m >= self.n:
-            y = kwds.get('y', np.ones(self.n))
-            # there are more points than data, so loop over data
-            for i in range(self.n):
-                diff = self.dataset[:, i, np.newaxis] - points
-                tdiff = np.dot(self.inv_hs / self._lambda[i], diff)
-                result += y[i] * fun(diff) * self.kernel(tdiff) / self._lambda[i] ** d
+        method = kwds.get('method', 'direct')
+        blocksize = kwds.get('blocksize', 2 ** 14)
+
+        result = np.zeros((m,))
+        if method == 'support':
+            for ipt, idata in self._neighbours(points, kwds.get('tol'),
+                                               blocksize):
+                diff = self.dataset[:, idata] - points[:, ipt]
+                val = self._kernel_values(diff, y, r, idata)
+                result += np.bincount(ipt, weights=val, minlength=m)
+        elif method == 'direct':
+            nb = max(blocksize // self.n, 1)
+            for ix in range(0, m, nb):
+                diff = self.dataset[:, newaxis, :] - points[:, ix:ix + nb, newaxis]
+                val = self._kernel_values(diff, y, r)
+                result[ix:ix + nb] = val.sum(axis=-1)
         else:
-            y = kwds.get('y', 1)
-            # loop over points
-            for i in range(m):
-                diff = self.dataset - points[:, i, np.newaxis]
-                tdiff = np.dot(self.inv_hs, diff / self._lambda[np.newaxis, :])
-                tmp = y * fun(diff) * self.kernel(tdiff) / self._lambda ** d
-                result[i] = tmp.sum(axis= -1)
+            raise ValueError('Unknown method: %s' % method)
 
         result /= (self._norm_factor * self.kernel.norm_factor(d, self.n))
 
         return result
 
+    def _kernel_values(self, diff, y, r=0, idata=Ellipsis):
+        """Return weighted kernel values of diff = dataset[:, idata] - points
+        """
+        d = self.d
+        lambda_ = self._lambda[idata]
+        tdiff = np.tensordot(self.inv_hs, diff / lambda_, axes=1)
+        shape = tdiff.shape[1:]
+        val = y[idata] * self.kernel(tdiff.reshape(d, -1)).reshape(shape) / lambda_ ** d
+        if r != 0:
+            val *= (diff ** r).sum(axis=0)
+        return val
+
+    def _neighbours(self, points, tol=None, blocksize=2 ** 14):
+        """Return iterator over index to pairs of points and data within the kernel support
+
+        Each (ipt, idata) pair of index arrays yielded holds at most
+        blocksize pairs unless a single point has more neighbours.
+        """
+        tau = _kernel_radius(self.kernel, tol)
+        tpoints = np.dot(self.inv_hs, points)
+        tdata = np.dot(self.inv_hs, self.dataset)
+        # The support of the adaptive kernels scales with _lambda. Group the
+        # data in octaves of _lambda so that the cells are not too large.
+        octave = np.floor(np.log2(self._lambda / self._lambda.min()))
+        for k in np.unique(octave):
+            ind, = np.where(octave == k)
+            radius = tau * self._lambda[ind].max()
+            for ipt, idata in _cell_neighbours(tdata[:, ind], tpoints, radius,
+                                               blocksize):
+                yield ipt, ind[idata]
+
+def _kernel_radius(kernel, tol=None):
+    """Return radius where the kernel is less than tol times its maximum
+    """
+    tau = kernel.effective_support()[1]
+    if tol is None:
+        return tau
+    x = np.linspace(0, 10 * tau, 2001)
+    profile = np.maximum(kernel(x), kernel(-x))
+    ind, = np.where(profile > tol * profile.max())
+    return x[min(ind[-1] + 1, len(x) - 1)]
+
+def _cell_neighbours(data, points, radius, blocksize=2 ** 14):
+    """Return iterator over index to pairs of points and data in neighbouring cells
+
+    The data are sorted into cells of size radius (or larger), so that all
+    data closer than radius to a point (in max-norm) are in the 3**d cells
+    around the cell of the point.
+    """
+    if data.shape[1] == 0 or points.shape[1] == 0:
+        return
+    d = data.shape[0]
+    xmin = np.minimum(data.min(axis=1), points.min(axis=1))[:, newaxis]
+    xmax = np.maximum(data.max(axis=1), points.max(axis=1))[:, newaxis]
+    # Make sure the number of cells can be indexed by an integer
+    size = np.maximum(radius, (xmax - xmin) / (2 ** (62 // d) - 4))
+    shape = tuple(np.floor((xmax - xmin) / size).astype(int).ravel() + 3)
+    dkey = np.ravel_multi_index(np.floor((data - xmin) / size).astype(int) + 1, shape)
+    order = dkey.argsort(kind='mergesort')
+    dkey = dkey[order]
+    pcell = np.floor((points - xmin) / size).astype(int) + 1
+    for offset in product(*([(-1, 0, 1)] * d)):
+        pkey = np.ravel_multi_index(pcell + np.reshape(offset, (d, 1)), shape)
+        start = dkey.searchsorted(pkey, 'left')
+        num = dkey.searchsorted(pkey, 'right') - start
+        csum = np.cumsum(num)
+        # split the points in blocks with approximately blocksize pairs
+        ends = np.unique(np.r_[csum.searchsorted(np.arange(blocksize, csum[-1], blocksize)), len(num) - 1] + 1)
+        i0 = 0
+        for i1 in ends:
+            nb = num[i0:i1]
+            ipt = np.repeat(np.arange(i0, i1), nb)
+            first = np.repeat(start[i0:i1] - np.cumsum(nb) + nb, nb)
+            idata = order[first + np.arange(len(ipt))]
+            i0 = i1
+            if len(ipt):
+                yield ipt, idata
+
 class KRegression(_KDE):
     """ Kernel-Regression
 
@@ -2080,7 +2166,8 @@ class Kernel(object):
         return h
             
 
-    def hscv(self, data, hvec=None, inc=128, maxit=100, fulloutput=False):
+    def hscv(self, data, hvec=None, inc=128, maxit=100, fulloutput=False,
+             exact=False):
         '''
         HSCV Smoothed cross-validation estimate of smoothing parameter.
         
@@ -2092,6 +2179,11 @@ class Kernel(object):
            score  = score vector
            data   = data vector
            kernel = 'gaussian'      - Gaussian kernel the only supported
+           inc    = number of grid points used in the binned estimates
+           exact  = if True evaluate the score exactly by summing over all
+                    pairs of data in blocks (O(n^2) time, O(n) memory).
+                    Otherwise (default) the data are binned and the sum is
+                    computed by FFT convolution on a grid of inc points.
                                        
           Note that only the first 4 letters of the kernel name is needed.
           
@@ -2122,7 +2214,6 @@ class Kernel(object):
         hvec = np.asarray(hvec, dtype=float)
   
         steps = len(hvec)
-        score = np.zeros(steps)
 
         nfft = inc * 2 
         amin = A.min(axis=1) # Find the minimum value of A.
@@ -2187,18 +2278,26 @@ class Kernel(object):
   
             const = (441. / (64 * pi)) ** (1. / 18.) * (4 * pi) ** (-1. / 5.) * psi4 ** (-2. / 5.) * psi8 ** (-1. / 9.)
   
-            M = np.atleast_2d(datan) 
-  
-            Y = (M - M.T).ravel()
-  
-            for i in range(steps):
-                g = const * n ** (-23. / 45) * hvec[i] ** (-2)
-                sig1 = sqrt(2 * hvec[i] ** 2 + 2 * g ** 2)
-                sig2 = sqrt(hvec[i] ** 2 + 2 * g ** 2)
-                sig3 = sqrt(2 * g ** 2)
-                term2 = np.sum(kernel2(Y / sig1) / sig1 - 2 * kernel2(Y / sig2) / sig2 + kernel2(Y / sig3) / sig3)
-    
-                score[i] = 1. / (n * hvec[i] * 2. * sqrt(pi)) + term2 / n ** 2
+            g = const * n ** (-23. / 45) * hvec ** (-2)
+            sig1 = sqrt(2 * hvec ** 2 + 2 * g ** 2)
+            sig2 = sqrt(hvec ** 2 + 2 * g ** 2)
+            sig3 = sqrt(2 * g ** 2)
+            term2 = np.zeros(steps)
+            if exact:
+                blocksize = max(2 ** 20 // n, 1)
+                for ix in range(0, n, blocksize):
+                    Y = (datan[ix:ix + blocksize, None] - datan).ravel()
+                    for i in range(steps):
+                        term2[i] += np.sum(kernel2(Y / sig1[i]) / sig1[i] - 2 * kernel2(Y / sig2[i]) / sig2[i] + kernel2(Y / sig3[i]) / sig3[i])
+            else:
+                fc = fft(c, nfft)
+                for i in range(steps):
+                    kw = kernel2(xn / sig1[i]) / sig1[i] - 2 * kernel2(xn / sig2[i]) / sig2[i] + kernel2(xn / sig3[i]) / sig3[i]
+                    kw = np.r_[kw, 0, kw[-1:0:-1]]
+                    z = np.real(ifft(fc * fft(kw)))
+                    term2[i] = np.sum(c * z[:inc])
+
+            score = 1. / (n * hvec * 2. * sqrt(pi)) + term2 / n ** 2
     
             idx = score.argmin()
             # Kernel other than Gaussian scale bandwidth
@@ -2906,7 +3005,7 @@ def bitget(int_type, offset):
     return np.bitwise_and(int_type, 1 << offset) >> offset
     
 
-def gridcount(data, X, y=1):
+def gridcount(data, X, y=1, chunksize=2 ** 16):
     '''
     Returns D-dimensional histogram using linear binning.
       
@@ -2915,6 +3014,9 @@ def gridcount(data, X, y=1):
     data = column vectors with D-dimensional data, shape D x Nd 
     X    = row vectors defining discretization, shape D x N
             Must include the range of the data.
+    y    = weights of the data, scalar or vector of length Nd (default 1)
+    chunksize = maximum number of data binned in one step. The data may
+            be a memory mapped array larger than the available memory.
     
     Returns
     -------
@@ -2966,7 +3068,7 @@ def gridcount(data, X, y=1):
     dat = np.atleast_2d(data)
     x = np.atleast_2d(X)
     y = np.atleast_1d(y).ravel()
-    d = dat.shape[0]
+    d, n = dat.shape
     d1, inc = x.shape
     
     if d != d1:
@@ -2976,63 +3078,38 @@ def gridcount(data, X, y=1):
     xlo = x[:, 0]
     xup = x[:, -1]
     
-    datlo = dat.min(axis=1)
-    datup = dat.max(axis=1)
-    if ((datlo < xlo) | (xup < datup)).any():
-        raise ValueError('X does not include whole range of the data!')
-    
-    csiz = np.repeat(inc, d)
-    use_sparse = False
-    if use_sparse:
-        acfun = accumsum # faster than accum
-    else:
-        acfun = accumsum2 #accum
+    # strides of the grid dimensions in c, stored in the same way as meshgrid
+    stride = inc ** np.arange(d - 1, -1, -1)
+    if d > 1:
+        stride[[0, 1]] = stride[[1, 0]]
+    Nc = inc ** d
+    c = np.zeros((Nc,))
+    for ix in xrange(0, n, chunksize):
+        dat1 = np.asarray(dat[:, ix:ix + chunksize], dtype=float)
+        y1 = y if len(y) == 1 else y[ix:ix + chunksize]
+        if ((dat1.min(axis=1) < xlo) | (xup < dat1.max(axis=1))).any():
+            raise ValueError('X does not include whole range of the data!')
       
-    binx = np.asarray(np.floor((dat - xlo[:, newaxis]) / dx), dtype=int)
-    w = dx.prod()
-    abs = np.abs #@ReservedAssignment
-    if  d == 1:
-        x.shape = (-1,)
-        c = np.asarray((acfun(binx, (x[binx + 1] - dat) * y, size=(inc, )) + 
-                            acfun(binx+1, (dat - x[binx]) * y, size=(inc, ))) / w).ravel()
-                            
-#    elif d == 2:
-#        b2 = binx[1]
-#        b1 = binx[0]
-#        c_ = np.c_
-#        stk = np.vstack
-#        c = (acfun(c_[b1, b2] , abs(np.prod(stk([X[0, b1 + 1], X[1, b2 + 1]]) - dat, axis=0)), size=[inc, inc]) + 
-#          acfun(c_[b1 + 1, b2]  , abs(np.prod(stk([X[0, b1], X[1, b2 + 1]]) - dat, axis=0)), size=[inc, inc]) + 
-#          acfun(c_[b1  , b2 + 1], abs(np.prod(stk([X[0, b1 + 1], X[1, b2]]) - dat, axis=0)), size=[inc, inc]) + 
-#          acfun(c_[b1 + 1, b2 + 1], abs(np.prod(stk([X[0, b1], X[1, b2]]) - dat, axis=0)), size=[inc, inc])) / w
-#        c = c.T # make sure c is stored in the same way as meshgrid
-    else: # % d>2
-       
-        Nc = csiz.prod()
-        c = np.zeros((Nc,))
-     
-        fact2 = np.asarray(np.reshape(inc * np.arange(d), (d, -1)), dtype=int)
-        fact1 = np.asarray(np.reshape(csiz.cumprod() / inc, (d, -1)), dtype=int)
-        #fact1 = fact1(ones(n,1),:);
-        bt0 = [0, 0]
-        X1 = X.ravel()
-        for ir in xrange(2 ** (d - 1)):
-            bt0[0] = np.reshape(bitget(ir, np.arange(d)), (d, -1))
-            bt0[1] = 1 - bt0[0]
-            for ix in xrange(2):
-                one = np.mod(ix, 2)
-                two = np.mod(ix + 1, 2)
-                # Convert to linear index 
-                b1 = np.sum((binx + bt0[one]) * fact1, axis=0) #linear index to c
-                bt2 = bt0[two] + fact2
-                b2 = binx + bt2                     # linear index to X
-                c += acfun(b1, abs(np.prod(X1[b2] - dat, axis=0)) * y, size=(Nc,))
-
-        c = np.reshape(c/w , csiz, order='F')
-        
-        T = range(d)
-        T[1], T[0] = T[0], T[1]
-        c = c.transpose(*T) # make sure c is stored in the same way as meshgrid    
+        binx = np.asarray(np.floor((dat1 - xlo[:, newaxis]) / dx), dtype=int)
+        binx = binx.clip(max=inc - 2)
+        # linear binning weights of the grid points below and above the data
+        wlo = np.empty(dat1.shape)
+        for k in xrange(d):
+            wlo[k] = (x[k, binx[k] + 1] - dat1[k]) / dx[k]
+        wup = 1 - wlo
+        b0 = np.dot(stride, binx)
+        for corner in product(*([(0, 1)] * d)):
+            w = y1 * np.ones(dat1.shape[1])
+            b1 = b0.copy()
+            for k, bit in enumerate(corner):
+                if bit:
+                    w *= wup[k]
+                    b1 += stride[k]
+                else:
+                    w *= wlo[k]
+            c += np.bincount(b1, w, minlength=Nc)
+    if d > 1:
+        c.shape = (inc,) * d
     return c
 
 def evar(y):
@@ -5,6 +5,7 @@ from __future__ import division
 
 import sys
 import fractions
+from math import fabs
 import numpy as np
 from numpy import (abs, amax, any, logical_and, arange, linspace, atleast_1d, #atleast_2d,
                    array, asarray, broadcast_arrays, ceil, floor, frexp, hypot,
@@ -30,7 +31,7 @@ __all__ = ['is_numlike', 'JITImport', 'DotDict', 'Bunch', 'printf', 'sub_dict_se
     'findextrema', 'findpeaks', 'findrfc', 'rfcfilter', 'findtp', 'findtc',
     'findoutliers', 'common_shape', 'argsreduce',
     'stirlerr', 'getshipchar', 'betaloge', 'gravity', 'nextpow2',
-    'discretize', 'polar2cart', 'cart2polar', 'meshgrid', 'ndgrid',
+    'parallel_map', 'discretize', 'polar2cart', 'cart2polar', 'meshgrid', 'ndgrid',
     'trangood', 'tranproc', 'plot_histgrm', 'num2pistr', 'test_docstrings']
 
 
@@ -281,8 +282,10 @@ def _findcross(xn):
             xn[0:ix + 1] = -xn[ix + 1]
             iz = iz[ix + 1::]
 
-        for ix in iz.tolist():
-            xn[ix] = xn[ix - 1]
+        # Replace the values on the crossing level with the previous value
+        ix = arange(n)
+        ix[iz] = 0
+        xn = xn[np.maximum.accumulate(ix)]
    
     #% indices to local level crossings ( without turningpoints)
     ind, = (xn[:n - 1] * xn[1:] < 0).nonzero()
@@ -484,6 +487,32 @@ def findpeaks(data, n=2, min_h=None, min_p=0.0):
     
     return ind
     
+def _astm_push(stack, value, rows):
+    '''
+    Add value to the ASTM rainflow stack and the counted cycles to rows
+
+    This is the loop of Nieslony's findrfc3_astm for one turning point.
+    '''
+    stack.append(value)
+    j = len(stack) - 1
+    while j >= 2 and fabs(stack[j - 1] - stack[j - 2]) <= fabs(stack[j] - stack[j - 1]):
+        ampl = fabs(stack[j - 1] - stack[j - 2]) / 2
+        mean = (stack[j - 1] + stack[j - 2]) / 2
+        if j == 2:
+            del stack[0]
+            cycle_type = 0.5
+        else:
+            del stack[j - 2:j]
+            cycle_type = 1.0
+        j = len(stack) - 1
+        if ampl > 0:
+            rows.append((ampl, mean, cycle_type))
+
+def _astm_residual(stack):
+    '''Return the half cycles of the residual ASTM rainflow stack'''
+    rows = [(fabs(a - b) / 2, (a + b) / 2, 0.5) for a, b in zip(stack[:-1], stack[1:])]
+    return [row for row in rows if row[0] > 0]
+
 def findrfc_astm(tp):
     """
     Return rainflow counted cycles
@@ -506,6 +535,11 @@ def findrfc_astm(tp):
     """
     
     y1 = atleast_1d(tp).ravel()
+    if clib is None:
+        stack, rows = [], []
+        for value in y1.tolist():
+            _astm_push(stack, value, rows)
+        return np.array(rows + _astm_residual(stack)).reshape(-1, 3)
     sig_rfc, cnr = clib.findrfc3_astm(y1)
     # the sig_rfc was constructed too big in rainflow.rf3, so
     # reduce the sig_rfc array as done originally by a matlab mex c function
@@ -565,32 +599,35 @@ def findrfc(tp, h=0.0, method='clib'):
     if y1[0] > y1[1]:
         #first is a max, ignore it
         y = y1[1::]
-        NC = floor((n - 1) / 2) - 1
+        NC = floor((n - 1) / 2)
         Tstart = 1
     else:
         y = y1
-        NC = floor(n / 2) - 1
+        NC = floor(n / 2)
         Tstart = 0
 
     if (NC < 1):
         return ind #No RFC cycles*/
 
-    if (y[0] > y[1]) and (y[1] > y[2]):
+    if len(y) < 3:
+        pass
+    elif (y[0] > y[1]) and (y[1] > y[2]):
         warnings.warn('This is not a sequence of turningpoints, exit')
         return ind
-
-    if (y[0] < y[1]) and (y[1] < y[2]):
+    elif (y[0] < y[1]) and (y[1] < y[2]):
         warnings.warn('This is not a sequence of turningpoints, exit')
         return ind
 
-    if clib is None or method not in ('clib'):
+    if clib is None or method not in ('clib',) or len(y) < 3:
         ind = zeros(n, dtype=np.int)
         NC = np.int(NC)
+        ny = len(y)
         for i in xrange(NC):
             Tmi = Tstart + 2 * i
             Tpl = Tstart + 2 * i + 2
             xminus = y[2 * i]
-            xplus = y[2 * i + 2]
+            # the last max has no min to the right if y ends with a max
+            xplus = y[2 * i + 2] if 2 * i + 2 < ny else -inf
 
             if(i != 0):
                 j = i - 1
@@ -611,7 +648,7 @@ def findrfc(tp, h=0.0, method='clib'):
                 while (j < NC):
                     if (y[2 * j + 1] >= y[2 * i + 1]):
                         break #goto L170
-                    if((y[2 * j + 2] <= xplus)):
+                    if (2 * j + 2 < ny) and (y[2 * j + 2] <= xplus):
                         xplus = y[2 * j + 2]
                         Tpl = (Tstart + 2 * j + 2)
                     j += 1
@@ -643,7 +680,7 @@ def findrfc(tp, h=0.0, method='clib'):
             #iy=i
         #  /* for i */
     else:
-        ind, ix = clib.findrfc(y, h)
+        ind, ix = clib.findrfc(y1, h)
     return np.sort(ind[:ix])
 
 def mctp2rfc(fmM, fMm=None):
@@ -1062,36 +1099,43 @@ def findtc(x_in, v=None, kind=None):
     else:
         n_tc = int((n_c - 2) / 2)
 
-    #% allocate variables before the loop increases the speed
     ind = zeros(n_c - 1, dtype=np.int)
 
+    # The troughs and crests are the minima and maxima between the crossings
     first_is_down_crossing = (x[v_ind[0]] > x[v_ind[0] + 1])
-    if first_is_down_crossing: 
-        for i in xrange(n_tc):
-            #% trough
-            j = 2 * i
-            ind[j] = x[v_ind[j] + 1:v_ind[j + 1] + 1].argmin()
-            #% crest
-            ind[j + 1] = x[v_ind[j + 1] + 1:v_ind[j + 2] + 1].argmax()
-
-        if (2 * n_tc + 1 < n_c) and (kind in (None, 'tw')):
-            #% trough
-            ind[n_c - 2] = x[v_ind[n_c - 2] + 1:v_ind[n_c - 1]].argmin()
-
-    else: # %%%% the first is a up-crossing
-        for i in xrange(n_tc):
-            #% trough
-            j = 2 * i
-            ind[j] = x[v_ind[j] + 1:v_ind[j + 1] + 1].argmax()
-            #% crest
-            ind[j + 1] = x[v_ind[j + 1] + 1:v_ind[j + 2] + 1].argmin()
-
-        if (2 * n_tc + 1 < n_c) and (kind in (None, 'cw')):
-            #% trough
-            ind[n_c - 2] = x[v_ind[n_c - 2] + 1:v_ind[n_c - 1]].argmax()
+    n_w = 2 * n_tc
+    starts = v_ind[:n_w] + 1
+    stops = v_ind[1:n_w + 1] + 1
+    last_kind = 'tw' if first_is_down_crossing else 'cw'
+    if ((2 * n_tc + 1 < n_c) and (kind in (None, last_kind)) and
+        v_ind[n_c - 1] > v_ind[n_c - 2] + 1):
+        # the last trough (crest) is before the last crossing
+        starts = r_[starts, v_ind[n_c - 2] + 1]
+        stops = r_[stops, v_ind[n_c - 1]]
+    ind[:starts.size] = _argextrema(x.ravel(), starts, stops,
+                                    first_is_down_crossing) - starts
 
     return v_ind[:n_c - 1] + ind + 1, v_ind
 
+def _argextrema(x, starts, stops, first_is_min=True):
+    '''
+    Return indices to alternating minima and maxima of x[starts[i]:stops[i]]
+
+    The slices must be consecutive, i.e., stops[i] == starts[i+1], and not
+    empty. All the extrema are found in one pass over x by reduceat.
+    '''
+    n = starts.size
+    if n == 0:
+        return zeros(0, dtype=np.int)
+    lengths = stops - starts
+    sgn = 1 - 2 * (arange(n) % 2 if first_is_min else 1 - arange(n) % 2)
+    y = x[starts[0]:stops[-1]] * np.repeat(sgn, lengths)
+    ymin = np.minimum.reduceat(y, starts - starts[0])
+    is_min, = (y == np.repeat(ymin, lengths)).nonzero()
+    segment = np.repeat(arange(n), lengths)[is_min]
+    first = r_[True, diff(segment) > 0]
+    return is_min[first] + starts[0]
+
 def findoutliers(x, zcrit=0.0, dcrit=None, ddcrit=None, verbose=False):
     """
     Return indices to spurious points of data
@@ -1662,6 +1706,54 @@ def nextpow2(x):
         n = n - 1
     return n
 
+def parallel_map(fun, tasks, num_workers=1, initializer=None, initargs=()):
+    '''
+    Return iterator over fun(task) for each task, optionally in parallel
+
+    Parameters
+    ----------
+    fun : callable
+        function of one argument. Must be picklable, i.e., defined at module
+        level, if num_workers > 1.
+    tasks : iterable
+        arguments to fun.
+    num_workers : scalar integer
+        number of worker processes. If num_workers <= 1 the tasks are
+        evaluated in the calling process.
+    initializer, initargs : callable and tuple
+        if given, initializer(*initargs) is called once in each worker
+        process (or once in the calling process if num_workers <= 1) before
+        any task is evaluated. Use it to hand large read-only inputs, e.g.,
+        shared memory buffers, to the workers instead of pickling them with
+        every task.
+
+    Returns
+    -------
+    results : iterator
+        fun(task) in the same order as tasks regardless of num_workers.
+
+    Example
+    -------
+    >>> import wafo.misc as wm
+    >>> list(wm.parallel_map(abs, [-1, 2, -3]))
+    [1, 2, 3]
+    >>> list(wm.parallel_map(abs, [-1, 2, -3], num_workers=2))
+    [1, 2, 3]
+    '''
+    if num_workers > 1:
+        import multiprocessing
+        pool = multiprocessing.Pool(num_workers, initializer, initargs)
+        try:
+            for result in pool.imap(fun, tasks):
+                yield result
+        finally:
+            pool.terminate()
+    else:
+        if initializer is not None:
+            initializer(*initargs)
+        for task in tasks:
+            yield fun(task)
+
 def discretize(fun, a, b, tol=0.005, n=5, method='linear'):
     '''
     Automatic discretization of function
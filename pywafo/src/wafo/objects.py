@@ -17,7 +17,8 @@ from wafo.transform.core import TrData
 from wafo.transform.models import TrHermite, TrOchi, TrLinear
 from wafo.stats import edf, distributions
 from wafo.misc import (nextpow2, findtp, findrfc, findtc, findcross,
-                       ecross, JITImport, DotDict, gravity, findrfc_astm)
+                       ecross, JITImport, DotDict, gravity, findrfc_astm,
+                       mctp2rfc, _astm_push, _astm_residual, parallel_map)
 from wafodata import PlotData
 from wafo.interpolate import SmoothSpline
 from scipy.interpolate.interpolate import interp1d
@@ -51,7 +52,8 @@ _wafocov = JITImport('wafo.covariance')
 _wafospec = JITImport('wafo.spectrum')
 
 __all__ = ['TimeSeries', 'LevelCrossings', 'CyclePairs', 'TurningPoints',
-    'sensortypeid', 'sensortype']
+    'RainflowCounter', 'CycleMatrix', 'WelchSpectrum', 'TrDataHistogram',
+    'wave_parameters_batch', 'sensortypeid', 'sensortype']
 
 def _invchi2(q, df):
     return special.chdtri(df, q)
@@ -780,15 +782,6 @@ class CyclePairs(PlotData):
         LevelCrossings
         """
 
-        if isinstance(kind, str):
-            t = dict(u=0, uM=1, umM=2, um=3)
-            defnr = t.get(kind, 1)
-        else:
-            defnr = kind
-
-        if ((defnr < 0) or (defnr > 3)):
-            raise ValueError('kind must be one of (1,2,3,4).')
-
         index, = nonzero(self.args <= self.data)
         if index.size == 0:
             index, = nonzero(self.args >= self.data)
@@ -802,42 +795,47 @@ class CyclePairs(PlotData):
 #  error('Error in input cc.')
 #end
         ncc = len(m)
-        
-        minima = vstack((m, ones(ncc), zeros(ncc), ones(ncc)))
-        maxima = vstack((M, -ones(ncc), ones(ncc), zeros(ncc)))
 
-        extremes = hstack((maxima, minima))
-        index = extremes[0].argsort()
-        extremes = extremes[:, index]
+        # Merge extremes at equal levels by summing their counts
+        levels, index = np.unique(hstack((M, m)), return_inverse=True)
+        nx = levels.size
+        num_max = np.bincount(index[:ncc], minlength=nx)
+        num_min = np.bincount(index[ncc:], minlength=nx)
+        return _extremes2lc(levels, num_min, num_max, kind, intensity,
+                            self.time, mean=self.mean, sigma=self.sigma)
 
-        ii = 0
-        n = extremes.shape[1]
-        extr = zeros((4, n))
-        extr[:, 0] = extremes[:, 0]
-        for i in xrange(1, n):
-            if extremes[0, i] == extr[0, ii]:
-                extr[1:4, ii] = extr[1:4, ii] + extremes[1:4, i]
-            else:
-                ii += 1
-                extr[:, ii] = extremes[:, i]
-
-        #[xx nx]=max(extr(:,1))
-        nx = extr[0].argmax() + 1
-        levels = extr[0, 0:nx]
-        if defnr == 2: ## This are upcrossings + maxima
-            dcount = cumsum(extr[1, 0:nx]) + extr[2, 0:nx] - extr[3, 0:nx]
-        elif defnr == 4: # # This are upcrossings + minima
-            dcount = cumsum(extr[1, 0:nx])
-            dcount[nx - 1] = dcount[nx - 2]
-        elif defnr == 1: ## This are only upcrossings
-            dcount = cumsum(extr[1, 0:nx]) - extr[3, 0:nx]
-        elif defnr == 3: ## This are upcrossings + minima + maxima
-            dcount = cumsum(extr[1, 0:nx]) + extr[2, 0:nx]
-        ylab = 'Count'
-        if intensity:
-            dcount = dcount / self.time
-            ylab = 'Intensity [count/sec]'
-        return LevelCrossings(dcount, levels, mean=self.mean, sigma=self.sigma, ylab=ylab, intensity=intensity)
+def _extremes2lc(levels, num_min, num_max, kind='uM', intensity=False, time=1,
+                 **kwds):
+    '''
+    Return level crossings given the number of minima and maxima of cycles 
+
+    See CyclePairs.level_crossings
+    '''
+    if isinstance(kind, str):
+        t = dict(u=0, uM=1, umM=2, um=3)
+        defnr = t.get(kind, 1)
+    else:
+        defnr = kind
+
+    if ((defnr < 0) or (defnr > 3)):
+        raise ValueError('kind must be one of (1,2,3,4).')
+
+    nx = levels.size
+    extr = vstack((num_min - num_max, num_max, num_min))
+    if defnr == 2: ## This are upcrossings + maxima
+        dcount = cumsum(extr[0, 0:nx]) + extr[1, 0:nx] - extr[2, 0:nx]
+    elif defnr == 4: # # This are upcrossings + minima
+        dcount = cumsum(extr[0, 0:nx])
+        dcount[nx - 1] = dcount[nx - 2]
+    elif defnr == 1: ## This are only upcrossings
+        dcount = cumsum(extr[0, 0:nx]) - extr[2, 0:nx]
+    elif defnr == 3: ## This are upcrossings + minima + maxima
+        dcount = cumsum(extr[0, 0:nx]) + extr[1, 0:nx]
+    ylab = 'Count'
+    if intensity:
+        dcount = dcount / time
+        ylab = 'Intensity [count/sec]'
+    return LevelCrossings(dcount, levels, ylab=ylab, intensity=intensity, **kwds)
 
 class TurningPoints(PlotData):
     '''
@@ -1022,6 +1020,406 @@ class TurningPoints(PlotData):
         return findrfc_astm(self.data)
 
 
+class RainflowCounter(object):
+    '''
+    Incremental rainflow counting of a load given in consecutive chunks
+
+    Parameters
+    ----------
+    h : real scalar
+        rainflow threshold. If h>0, then all rainflow cycles with height
+        smaller than h are removed.
+    dt : real scalar
+        sampling period of the load (default 1).
+
+    Member variables
+    ----------------
+    num_data : scalar integer
+        number of load values given.
+
+    Notes
+    -----
+    The load values are reduced to turning points as they arrive. Each 
+    turning point is counted by a stack of the maxima not yet closed by a 
+    higher maximum together with the smallest minima between them, i.e., the
+    residual. The turning points are pushed and popped at most once, so the
+    time is O(n) and the memory only depends on the residual and the number
+    of closed cycles. The result is identical to findrfc(tp, h) and 
+    findrfc_astm(tp) of the turning points of the whole load, tp, 
+    and the indices are positions in the whole load.
+
+    Example
+    -------
+    >>> import wafo.data
+    >>> import wafo.misc as wm
+    >>> import wafo.objects as wo
+    >>> x = wafo.data.sea()
+    >>> tp = x[wm.findtp(x[:, 1]), 1]
+    >>> rfc = wo.RainflowCounter(h=0.3)
+    >>> for ix in range(0, len(tp), 500):
+    ...     rfc = rfc.update(tp[ix:ix + 500])
+    >>> np.all(rfc.indices() == wm.findrfc(tp, 0.3))
+    True
+    >>> np.allclose(rfc.cycle_astm(), wm.findrfc_astm(tp))
+    True
+    >>> mM = rfc.cycle_pairs()
+
+    See also
+    --------
+    findrfc, findrfc_astm, TurningPoints.cycle_pairs
+    '''
+    def __init__(self, h=0.0, dt=1):
+        self.h = h
+        self.dt = dt
+        self.num_data = 0
+        # last final and last tentative turning point (value and index)
+        self._tail = zeros(0)
+        self._tail_index = zeros(0, dtype=int)
+        self._num_tp = 0
+        self._first = None
+        self._first_is_min = True
+        # stack of maxima with the smallest minimum to the left and the
+        # smallest minimum after it, all as (value, index)
+        self._maxima = [(inf, -1)]
+        self._left_min = [(inf, -1)]
+        self._right_min = [(inf, -1)]
+        self._cycles = []
+        self._astm = []
+        self._astm_rows = []
+
+    def update(self, x):
+        '''
+        Count the rainflow cycles closed by x
+
+        Parameters
+        ----------
+        x : vector
+            load or turning points following the values given in the 
+            previous calls.
+        '''
+        x = np.ravel(x).astype(float)
+        if x.size == 0:
+            return self
+        index = hstack((self._tail_index, arange(x.size) + self.num_data))
+        x = hstack((self._tail, x))
+        self.num_data += x.size - self._tail.size
+        # keep the last of equal values, as findextrema, but the first value
+        lead = (x != x[0]).argmax() or x.size
+        keep = hstack((diff(x) != 0, True))
+        keep[:lead] = False
+        keep[0] = True
+        x, index = x[keep], index[keep]
+        dx = diff(x)
+        is_tp = np.ones(x.size, dtype=bool)
+        is_tp[1:-1] = dx[:-1] * dx[1:] < 0
+        x, index = x[is_tp], index[is_tp]
+        # The last turning point may be replaced by the next values
+        start = min(self._tail.size, 1)
+        stop = max(x.size - 1, 1 - start)
+        for value, ix in zip(x[start:stop].tolist(), index[start:stop].tolist()):
+            self._add(value, ix)
+        self._tail, self._tail_index = x[-2:], index[-2:]
+        return self
+
+    def _add(self, value, ix):
+        '''Count final turning point'''
+        _astm_push(self._astm, value, self._astm_rows)
+        self._add_turning_point(value, ix)
+
+    def _add_turning_point(self, value, ix):
+        self._num_tp += 1
+        if self._num_tp == 1:
+            self._first = (value, ix)
+            return
+        if self._num_tp == 2:
+            # the first turning point is ignored if it is a max
+            self._first_is_min = self._first[0] < value
+            if self._first_is_min:
+                self._add_min(self._first)
+        if (self._num_tp % 2 == 0) == self._first_is_min:
+            self._add_max((value, ix))
+        else:
+            self._add_min((value, ix))
+
+    def _add_min(self, vmin):
+        if vmin[0] <= self._right_min[-1][0]:
+            self._right_min[-1] = vmin
+
+    def _add_max(self, vmax):
+        '''Close maxima lower than vmax and push vmax on the stack'''
+        h = self.h
+        maxima, left_min, right_min = self._maxima, self._left_min, self._right_min
+        while maxima[-1][0] <= vmax[0]:
+            imax = maxima.pop()
+            lmin, rmin = left_min.pop(), right_min.pop()
+            vmin = lmin if rmin[0] <= lmin[0] else rmin
+            if imax[0] - vmin[0] >= h:
+                self._cycles.append((vmin[0], imax[0], vmin[1], imax[1]))
+            if rmin[0] <= right_min[-1][0]:
+                right_min[-1] = rmin
+        maxima.append(vmax)
+        left_min.append(right_min[-1])
+        right_min.append((inf, -1))
+
+    def _final_cycles(self):
+        '''Return closed and residual cycles as if the load ended here'''
+        num_cycles = len(self._cycles)
+        state = (self._num_tp, self._first, self._first_is_min, self._maxima,
+                 self._left_min, self._right_min)
+        self._maxima = list(self._maxima)
+        self._left_min = list(self._left_min)
+        self._right_min = list(self._right_min)
+        try:
+            if self._tail.size > 1:
+                self._add_turning_point(self._tail[-1], self._tail_index[-1])
+            cycles = self._cycles[:]
+            h = self.h
+            for imax, lmin in zip(self._maxima[1:], self._left_min[1:]):
+                if imax[0] - lmin[0] >= h:
+                    cycles.append((lmin[0], imax[0], lmin[1], imax[1]))
+        finally:
+            (self._num_tp, self._first, self._first_is_min, self._maxima,
+             self._left_min, self._right_min) = state
+            del self._cycles[num_cycles:]
+        cycles.sort(key=lambda cycle: cycle[3])
+        return np.array(cycles, dtype=float).reshape(-1, 4)
+
+    def pop_cycles(self):
+        '''
+        Return and remove the rainflow cycles closed so far as CyclePairs
+
+        The cycles are only closed cycles, i.e., the residual is not included,
+        so the sum of the cycles returned from repeated calls to pop_cycles 
+        and the cycles from cycle_pairs at the end are all the cycles.
+        '''
+        cycles = np.array(sorted(self._cycles, key=lambda cycle: cycle[3]),
+                          dtype=float).reshape(-1, 4)
+        del self._cycles[:]
+        return CyclePairs(cycles[:, 1], cycles[:, 0], kind='min2max', time=0)
+
+    def indices(self):
+        '''
+        Return indices to the rainflow cycles of the load, see findrfc
+        '''
+        cycles = self._final_cycles()
+        return np.sort(cycles[:, 2:].ravel()).astype(int)
+
+    def cycle_pairs(self, kind='min2max'):
+        '''
+        Return rainflow cycles of the load as CyclePairs object
+
+        Parameters
+        ----------
+        kind : string
+            type of cycles, 'min2max' or 'max2min'. As for TurningPoints,
+            the min and max values are the same, only the labels differ. 
+        '''
+        cycles = self._final_cycles()
+        time = max(self.num_data - 1, 0) * self.dt
+        return CyclePairs(cycles[:, 1], cycles[:, 0], kind=kind, time=time)
+
+    def cycle_astm(self):
+        '''
+        Return rainflow counted cycles according to ASTM, see findrfc_astm
+
+        Returns
+        -------
+        sig_rfc : array-like
+            array of shape (n,3) with:
+            sig_rfc[:,0] Cycles amplitude
+            sig_rfc[:,1] Cycles mean value
+            sig_rfc[:,2] Cycle type, half (=0.5) or full (=1.0)
+        '''
+        stack, rows = list(self._astm), list(self._astm_rows)
+        if self._tail.size > 1:
+            _astm_push(stack, self._tail[-1], rows)
+        return np.array(rows + _astm_residual(stack), dtype=float).reshape(-1, 3)
+
+class CycleMatrix(object):
+    '''
+    Cycle matrix, i.e., histogram of cycle pairs counted on a grid of levels
+
+    Parameters
+    ----------
+    param : vector
+        defines the discretization of the levels, [a, b, n], i.e., the
+        levels are linspace(a, b, n).
+    kind : string
+        type of cycles, e.g., 'rainflow', 'min2max' or 'max2min'.
+
+    Member variables
+    ----------------
+    levels : vector
+        levels, u, defined by param.
+    data : n x n array
+        number of cycles with min closest to u[i] and max closest to u[j] 
+        in data[i, j]. Cycles outside [a, b] are counted at the end levels. 
+    time : real scalar
+        duration of the counted load.
+
+    Notes
+    -----
+    The counts are accumulated by update, and counts of different parts of
+    a load or of different loads are added by merge, so that cycle pairs 
+    only need to be kept for one part at the time. The matrix is stored by
+    save and read by load. The damage, level crossings and the rainflow 
+    matrix of a Markov chain of turning points only depend on the counts,
+    and are thus computed in O(n**2) irrespective of the number of cycles.
+    The price is the discretization of the cycles, which makes the damage 
+    and the level crossings accurate to about (b-a)/(n-1).
+
+    Example
+    -------
+    >>> import wafo.data
+    >>> import wafo.objects as wo
+    >>> ts = wo.mat2timeseries(wafo.data.sea())
+    >>> mM = ts.turning_points().cycle_pairs()
+    >>> F = wo.CycleMatrix([-3, 3, 61], kind='min2max').update(mM)
+    >>> int(F.data.sum())
+    1086
+    >>> D = F.damage(beta=range(3, 9))
+    >>> np.allclose(D, mM.damage(beta=range(3, 9)), rtol=0.05)
+    True
+    >>> lc = F.level_crossings()
+
+    # Rainflow matrix of the Markov chain with same min2max matrix 
+    >>> Frfc = F.mctp2rfc()
+
+    See also
+    --------
+    CyclePairs, RainflowCounter, wafo.misc.mctp2rfc
+    '''
+    def __init__(self, param, kind='rainflow'):
+        self.param = np.asarray(param, dtype=float).ravel()
+        self.levels = linspace(self.param[0], self.param[1], int(self.param[2]))
+        n = self.levels.size
+        self.data = zeros((n, n))
+        self.kind = kind
+        self.time = 0
+
+    def _index(self, x):
+        '''Return index to the level closest to x'''
+        a, b, n = self.param
+        ix = np.round((np.asarray(x, dtype=float) - a) * ((n - 1) / (b - a)))
+        return np.clip(ix, 0, n - 1).astype(int)
+
+    def update(self, m, M=None, time=None):
+        '''
+        Add cycles to the counts
+
+        Parameters
+        ----------
+        m, M : vectors
+            min and max values of the cycles, respectively. Alternatively m
+            is a CyclePairs object and M is not given.
+        time : real scalar
+            duration of the load. (default CyclePairs.time, if m is a 
+            CyclePairs object, otherwise 0)
+        '''
+        if M is None:
+            if time is None:
+                time = m.time
+            m, M = m.args, m.data
+        n = self.levels.size
+        index = self._index(ravel(m)) * n + self._index(ravel(M))
+        self.data += np.bincount(index, minlength=n * n).reshape(n, n)
+        self.time += 0 if time is None else time
+        return self
+
+    def merge(self, other):
+        '''Add the counts of other CycleMatrix object'''
+        if not np.allclose(self.param, other.param):
+            raise ValueError('Can only merge cycle matrices with equal levels!')
+        self.data = self.data + other.data
+        self.time += other.time
+        return self
+
+    def save(self, filename):
+        '''Save counts to .npz file'''
+        np.savez(filename, param=self.param, data=self.data, kind=self.kind,
+                 time=self.time)
+
+    @classmethod
+    def load(cls, filename):
+        '''Return CycleMatrix object saved to filename'''
+        fdata = np.load(filename)
+        self = cls(fdata['param'], kind=str(fdata['kind']))
+        self.data = fdata['data']
+        self.time = float(fdata['time'])
+        return self
+
+    def amplitudes(self):
+        '''Return amplitudes, (u[j]-u[i])/2, of the cycles in data[i, j]'''
+        u = self.levels
+        return (u[None, :] - u[:, None]) / 2.
+
+    def damage(self, beta, K=1):
+        """
+        Return the total Palmgren-Miner damage of the cycles
+
+        Parameters
+        ----------
+        beta : array-like, size m
+            Beta-values, material parameter.                   
+        K : scalar, optional
+            K-value, material parameter.
+
+        Returns
+        -------
+        D : ndarray, size m
+            Damage, i.e., D[i] = sum ( K * a**beta[i] ),  with  a = (max-min)/2
+
+        See also
+        --------
+        CyclePairs.damage
+        """
+        n = self.levels.size
+        # Cycles with equal difference in level index have equal amplitude
+        diag = np.arange(n)[None, :] - np.arange(n)[:, None]
+        ndiag = np.bincount((diag + n - 1).ravel(), weights=self.data.ravel(),
+                            minlength=2 * n - 1)
+        amp = np.abs(arange(1 - n, n)) * ((self.param[1] - self.param[0]) /
+                                           (2 * (n - 1)))
+        beta = atleast_1d(beta).astype(float)
+        return K * np.dot(ndiag, amp[:, None] ** beta[None, :])
+
+    def level_crossings(self, kind='uM', intensity=False):
+        """
+        Return level crossing spectrum from the cycle counts
+
+        Parameters
+        ----------
+        kind : int or string
+            defining crossing type, see CyclePairs.level_crossings
+        intensity : bool
+            True if level crossing intensity spectrum
+            False if level crossing count spectrum
+        """
+        num_min, num_max = self.data.sum(axis=1), self.data.sum(axis=0)
+        ix = (num_min + num_max) > 0
+        return _extremes2lc(self.levels[ix], num_min[ix], num_max[ix], kind,
+                            intensity, self.time)
+
+    def mctp2rfc(self, fMm=None):
+        '''
+        Return rainflow matrix of Markov chain of turning points
+
+        The cycle matrix is the min2max Markov matrix and fMm the max2min 
+        Markov matrix with min and max as in data[i, j] (default fMm=self).
+
+        See also
+        --------
+        wafo.misc.mctp2rfc
+        '''
+        # mctp2rfc uses reversed max levels, i.e., fMm[i, n - 1 - j]
+        fmM = np.fliplr(self.data)
+        if fMm is not None:
+            fMm = np.fliplr(getattr(fMm, 'data', fMm))
+        frfc = CycleMatrix(self.param, kind='rainflow')
+        frfc.data = np.fliplr(mctp2rfc(fmM, fMm))
+        frfc.time = self.time
+        return frfc
+
 def mat2timeseries(x):
     """
     Convert 2D arrays to TimeSeries object
@@ -1029,6 +1427,512 @@ def mat2timeseries(x):
     """
     return TimeSeries(x[:, 1::], x[:, 0].ravel())
 
+def _autocov_blocks(data, lag, blocksize=2 ** 16):
+    '''
+    Return biased auto covariance up to lag and number of non-NaN data.
+
+    The data are read in blocks of blocksize values, so data may be a memory
+    mapped array. NaNs are treated as missing values, i.e., they are set to
+    the mean before the sums are computed.
+    '''
+    x = data.ravel()
+    n = len(x)
+    total = 0.0
+    Ncens = 0
+    for ix in xrange(0, n, blocksize):
+        xb = np.asarray(x[ix:ix + blocksize], dtype=float)
+        ok = ~isnan(xb)
+        total += xb[ok].sum()
+        Ncens += ok.sum()
+    mean = total / Ncens
+
+    nb = max(blocksize, lag + 1)
+    nfft = 2 ** nextpow2(nb + lag)
+    R = zeros(lag + 1)
+    for ix in xrange(0, n, nb):
+        xb = np.asarray(x[ix:ix + nb + lag], dtype=float) - mean
+        xb[isnan(xb)] = 0.
+        # sum of xb[i] * xb[i + k] for i < nb and k <= lag
+        R += np.fft.irfft(np.fft.rfft(xb[:nb], nfft).conj() *
+                          np.fft.rfft(xb, nfft), nfft)[:lag + 1]
+    return R / Ncens, Ncens
+
+def _k_smallest(a, k):
+    '''Return the k smallest values of a in increasing order'''
+    if a.size > k:
+        a = np.partition(a, k - 1)[:k]
+    return np.sort(a)
+
+def _k_largest(a, k):
+    '''Return the k largest values of a in increasing order'''
+    return -_k_smallest(-a, k)[::-1]
+
+class TrDataHistogram(object):
+    '''
+    Streaming level upcrossing and value counts for estimating transformation
+
+    Parameters
+    ----------
+    levels : vector
+        increasing levels where the number of upcrossings and the empirical
+        CDF are counted.
+    ne : scalar integer
+        maximum number of extremes to remove from the estimation of the 
+        transformation, see TimeSeries.trdata (default 7).
+
+    Member variables
+    ----------------
+    crossings : vector
+        number of upcrossings of each level, i.e., x[i] < level < x[i+1].
+    counts : vector of length len(levels)+1
+        number of data in (levels[j-1], levels[j]].
+    num_data : scalar integer
+        number of data.
+
+    Notes
+    -----
+    The data are given in consecutive chunks to update, which only keeps the
+    counts, the ne+1 smallest and largest values and turning points, the 
+    first and last two values and the mean and sum of squares. Thus memory 
+    and time per value do not depend on the record length. Counts of
+    consecutive parts of a record, e.g., computed by different processes, are
+    combined by merge. The crossing intensity and CDF are only smoothed when
+    the transformation is estimated by trdata. Compared to TimeSeries.trdata 
+    they are evaluated on the levels, and at the extremes removed, instead 
+    of at all the turning points or data, so the levels should be dense 
+    (e.g. 4097 levels).
+
+    Example
+    -------
+    >>> import wafo.data
+    >>> import wafo.objects as wo
+    >>> x = wafo.data.sea()
+    >>> est = wo.TrDataHistogram(np.linspace(-2, 2, 1025))
+    >>> for ix in range(0, len(x), 1000):
+    ...     est = est.update(x[ix:ix + 1000, 1])
+    >>> est.num_data
+    9524
+    >>> g, gemp = est.trdata()
+    >>> g2, gemp2 = est.trdata(method='mnonlinear')
+
+    See also
+    --------
+    TimeSeries.trdata, LevelCrossings.trdata
+    '''
+    def __init__(self, levels, ne=7):
+        self.levels = np.asarray(levels, dtype=float).ravel()
+        self.ne = ne
+        nl = self.levels.size
+        self.crossings = zeros(nl, dtype=int)
+        self.counts = zeros(nl + 1, dtype=int)
+        self.num_data = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._values = [zeros(0), zeros(0)] # smallest and largest values
+        self._extremes = [zeros(0), zeros(0)] # smallest and largest turning points
+        self._first = self._last = zeros(0)
+
+    def _add_moments(self, n, mean, m2):
+        num_data = self.num_data + n
+        delta = mean - self._mean
+        self._m2 += m2 + delta ** 2 * self.num_data * n / num_data
+        self._mean += delta * n / num_data
+        self.num_data = num_data
+
+    @staticmethod
+    def _add_tails(tails, x, k):
+        tails[0] = _k_smallest(hstack((tails[0], x)), k)
+        tails[1] = _k_largest(hstack((tails[1], x)), k)
+
+    def _add_crossings(self, x):
+        '''Count upcrossings between consecutive values of x'''
+        levels = self.levels
+        nl = levels.size
+        lo, hi = x[:-1], x[1:]
+        up = lo < hi
+        start = levels.searchsorted(lo[up], side='right')
+        stop = levels.searchsorted(hi[up], side='left')
+        dcount = (np.bincount(start, minlength=nl + 1) -
+                  np.bincount(stop, minlength=nl + 1))
+        self.crossings += cumsum(dcount)[:nl]
+
+    def _add_extremes(self, x):
+        '''Add turning points in x[1:-1]'''
+        dx = diff(x)
+        self._add_tails(self._extremes, x[1:-1][dx[:-1] * dx[1:] < 0], self.ne + 1)
+
+    def update(self, x):
+        '''
+        Add the upcrossings and values of x to the counts
+
+        Parameters
+        ----------
+        x : vector
+            data following the data given in the previous calls.
+        '''
+        x = np.ravel(x).astype(float)
+        if x.size == 0:
+            return self
+        mean = x.mean()
+        self._add_moments(x.size, mean, ((x - mean) ** 2).sum())
+        self._add_tails(self._values, x, self.ne + 1)
+        self.counts += np.bincount(self.levels.searchsorted(x, side='left'),
+                                   minlength=self.levels.size + 1)
+        if self._first.size < 2:
+            self._first = hstack((self._first, x))[:2]
+        x = hstack((self._last, x))
+        self._add_crossings(x[max(self._last.size - 1, 0):])
+        self._add_extremes(x)
+        self._last = x[-2:]
+        return self
+
+    def merge(self, other):
+        '''
+        Add the counts of other TrDataHistogram object
+
+        The data of other are assumed to follow the data of self, so that the
+        upcrossings between the last value of self and the first value of
+        other are counted as well.
+        '''
+        if not (self.levels.shape == other.levels.shape and 
+                np.allclose(self.levels, other.levels)):
+            raise ValueError('Can only merge counts with equal levels!')
+        if other.num_data == 0:
+            return self
+        if self.num_data > 0:
+            x = hstack((self._last, other._first))
+            n = self._last.size
+            self._add_crossings(x[n - 1:n + 1])
+            self._add_extremes(x)
+        self._first = hstack((self._first, other._first))[:2]
+        self._last = hstack((self._last, other._last))[-2:]
+        self.crossings = self.crossings + other.crossings
+        self.counts = self.counts + other.counts
+        k = self.ne + 1
+        for tails, other_tails in [(self._values, other._values),
+                                   (self._extremes, other._extremes)]:
+            self._add_tails(tails, hstack(other_tails), k)
+        self._add_moments(other.num_data, other._mean, other._m2)
+        return self
+
+    def mean(self):
+        return self._mean
+
+    def std(self):
+        return sqrt(self._m2 / self.num_data)
+
+    def _tail_levels(self, tails, ne):
+        '''Return ne+1 lowest tails, levels in between and ne+1 highest tails'''
+        lo, hi = tails[0][:ne + 1], tails[1][::-1][:ne + 1][::-1]
+        levels = self.levels
+        inner = levels[(lo[-1] < levels) & (levels < hi[0])]
+        return lo, inner, hi
+
+    def level_crossings(self, ne=None):
+        '''
+        Return level crossing spectrum, i.e., number of upcrossings vs levels
+
+        The levels are the ne+1 lowest turning points, the levels in between 
+        and the ne+1 highest turning points. 
+        '''
+        ne = self.ne if ne is None else min(ne, self.ne)
+        args = np.unique(hstack(self._tail_levels(self._extremes, ne)))
+        data = interp(args, self.levels, self.crossings)
+        return LevelCrossings(data, args, mean=self.mean(), sigma=self.std())
+
+    def edf(self, ne=None):
+        '''
+        Return empirical distribution function
+
+        The CDF is evaluated at the ne+1 smallest values, the levels in 
+        between and the ne+1 largest values.
+        '''
+        ne = self.ne if ne is None else min(ne, self.ne)
+        n = self.num_data
+        lo, inner, hi = self._tail_levels(self._values, ne)
+        F = hstack((arange(1, lo.size + 1), 
+                    cumsum(self.counts)[self.levels.searchsorted(inner)],
+                    arange(n - hi.size + 1, n + 1))) / n
+        cdf = PlotData(F, hstack((lo, inner, hi)), xlab='x', ylab='F(x)')
+        cdf.setplotter('step')
+        return cdf
+
+    def trdata(self, method='nonlinear', **options):
+        '''
+        Estimate transformation, g, from the counts.
+
+        Parameters
+        ----------
+        method : string
+            'nonlinear' : transform based on smoothed crossing intensity (default)
+            'mnonlinear': transform based on smoothed marginal distribution
+        options :
+            see TimeSeries.trdata
+
+        Returns
+        -------
+        tr, tr_emp : TrData objects
+            with the smoothed and empirical transformation, respectively.
+        '''
+        if self.num_data == 0:
+            raise ValueError('No data given yet!')
+        opt = DotDict(chkder=True, plotflag=False, csm=.95, gsm=.05,
+            param=[-5, 5, 513], delay=2, ntr=1000, linextrap=True, ne=7, cvar=1, gvar=1,
+            multip=False)
+        opt.update(**options)
+        opt.ne = min(opt.ne, self.ne)
+        mean, sigma = self.mean(), self.std()
+        if method[0] == 'n':
+            lc = self.level_crossings(opt.ne)
+            return lc.trdata(mean=mean, sigma=sigma, **opt)
+        elif method[0] == 'm':
+            return _cdf2trdata(self.edf(opt.ne), mean, sigma, **opt)
+        raise ValueError('Unknown method: %s' % method)
+
+class WelchSpectrum(object):
+    '''
+    Streaming Welch estimator of the one-sided spectral density
+
+    Parameters
+    ----------
+    nfft : scalar integer
+        length of the segments.
+    dt : real scalar
+        sampling period of the data.
+    window : vector of length nfft or function
+        To create window vectors see numpy.blackman, numpy.hamming,
+        numpy.bartlett, scipy.signal, scipy.signal.get_window etc.
+        (default numpy.hanning)
+    noverlap : scalar integer
+        length of the overlap between segments. (default nfft//2)
+    detrend : function
+        detrending performed on each segment. (default detrend_mean)
+    tr : transformation object
+        the transformation assuming that the data is a sample of a transformed
+        Gaussian process. If tr is None the data is assumed Gaussian. (Default)
+
+    Member variables
+    ----------------
+    pxx : vector of length nfft//2+1
+        sum of squared absolute value of the FFT of the windowed segments.
+    num_segments : scalar integer
+        number of segments in pxx.
+
+    Notes
+    -----
+    The data are given in consecutive chunks to update, which only keeps
+    the data not yet part of a whole segment between the calls. Estimates
+    computed on different parts of a record, e.g., by different processes,
+    are combined by merge. Then the segments spanning the borders between
+    the parts are lost.
+
+    Example
+    -------
+    >>> import wafo.data
+    >>> import wafo.objects as wo
+    >>> x = wafo.data.sea()
+    >>> dt = x[1, 0] - x[0, 0]
+    >>> est = wo.WelchSpectrum(nfft=256, dt=dt)
+    >>> for ix in range(0, len(x), 1000):
+    ...     est = est.update(x[ix:ix + 1000, 1])
+    >>> est.num_segments
+    73
+    >>> S = est.tospecdata(alpha=0.05)
+    >>> h = S.plot()
+
+    Reference
+    ---------
+    Percival, D.B. and Walden, A.T. (1993)
+    'Spectral analysis for physical applications'
+    Cambridge University Press, pp 289--295
+    '''
+    def __init__(self, nfft=256, dt=1.0, window=np.hanning, noverlap=None,
+                 detrend=detrend_mean, tr=None):
+        self.nfft = nfft
+        self.dt = dt
+        if hasattr(window, '__call__'):
+            window = window(nfft)
+        self.window = np.asarray(window, dtype=float)
+        if noverlap is None:
+            noverlap = nfft // 2
+        self.noverlap = noverlap
+        self.detrend = detrend
+        self.tr = tr
+        self.pxx = zeros(nfft // 2 + 1)
+        self.num_segments = 0
+        self._buffer = zeros(0)
+
+    def update(self, x):
+        '''
+        Add the periodograms of all whole segments in x to the estimate
+
+        Parameters
+        ----------
+        x : vector
+            data following the data given in the previous calls.
+        '''
+        x = np.ravel(x)
+        if self.tr is not None:
+            x = self.tr.dat2gauss(x)
+        buf = hstack((self._buffer, x))
+        nfft = self.nfft
+        step = nfft - self.noverlap
+        nseg = (len(buf) - self.noverlap) // step if len(buf) >= nfft else 0
+        if nseg > 0:
+            seg = buf[arange(nseg)[:, np.newaxis] * step + arange(nfft)]
+            if self.detrend is not None:
+                seg = np.vstack([self.detrend(segi) for segi in seg])
+            fseg = np.fft.rfft(seg * self.window, axis=1)
+            self.pxx += (np.abs(fseg) ** 2).sum(axis=0)
+            self.num_segments += nseg
+            buf = buf[nseg * step:]
+        self._buffer = buf
+        return self
+
+    def merge(self, other):
+        '''
+        Add the periodograms accumulated in other WelchSpectrum object
+        '''
+        if (self.nfft != other.nfft or self.dt != other.dt or
+            self.noverlap != other.noverlap or
+            not np.allclose(self.window, other.window)):
+            raise ValueError('Can only merge estimates with equal nfft, dt, noverlap and window!')
+        self.pxx = self.pxx + other.pxx
+        self.num_segments += other.num_segments
+        return self
+
+    def bandwidth(self):
+        '''
+        Return equivalent bandwidth of the estimate (rad/sec)
+        '''
+        win = self.window
+        return 2 * pi * (win ** 2).sum() / (win.sum() ** 2 * self.dt)
+
+    def dof(self):
+        '''
+        Return equivalent degrees of freedom of the estimate
+
+        The correlation between overlapping segments is taken into account.
+        '''
+        win = self.window
+        nfft = self.nfft
+        step = nfft - self.noverlap
+        K = self.num_segments
+        w2 = (win ** 2).sum()
+        corr = 0.0
+        for m in xrange(1, min(K, -(-nfft // step))):
+            rho = (win[m * step:] * win[:nfft - m * step]).sum() ** 2 / w2 ** 2
+            corr += (1. - m / K) * rho
+        return 2. * K / (1 + 2 * corr)
+
+    def tospecdata(self, alpha=None, ftype='w'):
+        '''
+        Return spectral density estimated from the segments so far
+
+        Parameters
+        ----------
+        alpha : real scalar
+            confidence level. If given the confidence interval factors of
+            the spectral density are returned in spec.CI.
+        ftype : character
+            defining frequency type of the bandwidth, spec.Bw: 'w' or 'f'
+            (default 'w')
+
+        Returns
+        -------
+        spec : SpecData1D  object
+        '''
+        if self.num_segments == 0:
+            raise ValueError('No whole segment of data given yet!')
+        nfft = self.nfft
+        win = self.window
+        S = self.pxx / (self.num_segments * (win ** 2).sum()) * self.dt
+        if nfft % 2 == 0:
+            S[1:-1] *= 2
+        else:
+            S[1:] *= 2
+        fact = 2.0 * pi
+        w = fact * arange(nfft // 2 + 1) / (nfft * self.dt)
+        spec = _wafospec.SpecData1D(S / fact, w)
+        spec.Bw = self.bandwidth()
+        if ftype == 'f':
+            spec.Bw = spec.Bw / (2 * pi) # bandwidth in Hz
+        if alpha is not None:
+            v = self.dof()
+            spec.CI = [v / _invchi2(1 - alpha / 2, v), v / _invchi2(alpha / 2, v)]
+        spec.tr = self.tr
+        spec.L = nfft
+        spec.norm = False
+        spec.note = 'method=welch'
+        return spec
+
+def _cdf2trdata(cdf, mean, sigma, **options):
+    '''
+    Return smoothed and empirical transformation, g, from marginal CDF
+
+    Parameters
+    ----------
+    cdf : PlotData object
+        empirical CDF, cdf.data, evaluated at increasing levels, cdf.args.
+    mean, sigma : real scalars
+        mean and standard deviation of the process.
+    options :
+        see TimeSeries._trdata_cdf
+    '''
+    opt = DotDict(chkder=True, plotflag=False, gsm=0.05, param=[-5, 5, 513],
+               delay=2, linextrap=True, ntr=1000, ne=7, gvar=1)
+    opt.update(options)
+    Ne = opt.ne
+    nd = len(cdf.data) 
+    if nd > opt.ntr and opt.ntr > 0:
+        x0 = linspace(cdf.args[Ne], cdf.args[nd - 1 - Ne], opt.ntr)
+        cdf.data = interp(x0, cdf.args, cdf.data)
+        cdf.args = x0
+        Ne = 0
+    uu = linspace(*opt.param)
+    
+    ncr = len(cdf.data);
+    ng = len(np.atleast_1d(opt.gvar))
+    if ng == 1:
+        gvar = opt.gvar * ones(ncr)
+    else:
+        opt.gvar = np.atleast_1d(opt.gvar)
+        gvar = interp(linspace(0, 1, ncr), linspace(0, 1, ng), opt.gvar.ravel())  
+    
+     
+    ind = np.flatnonzero(diff(cdf.args) > 0) # remove equal points
+    nd = len(ind)
+    ind1 = ind[Ne:nd - Ne]  
+    tmp = invnorm(cdf.data[ind])
+    
+    x = sigma * uu + mean
+    pp_tr = SmoothSpline(cdf.args[ind1], tmp[Ne:nd - Ne], p=opt.gsm, lin_extrap=opt.linextrap, var=gvar[ind1])
+    #g(:,2) = smooth(Fx(ind1,1),tmp(Ne+1:end-Ne),opt.gsm,g(:,1),def,gvar);
+    tr = TrData(pp_tr(x) , x, mean=mean, sigma=sigma)
+    tr_emp = TrData(tmp, cdf.args[ind], mean=mean, sigma=sigma)
+    tr_emp.setplotter('step')
+    
+    if opt.chkder:
+        for ix in xrange(5):
+            dy = diff(tr.data)
+            if (dy <= 0).any():
+                dy[dy > 0] = floatinfo.eps
+                gvar = -(np.hstack((dy, 0)) + np.hstack((0, dy))) / 2 + floatinfo.eps
+                pp_tr = SmoothSpline(cdf.args[ind1], tmp[Ne:nd - Ne], p=1, lin_extrap=opt.linextrap, var=ix * gvar)
+                tr = TrData(pp_tr(x) , x, mean=mean, sigma=sigma)
+            else: 
+                break
+        else:
+            msg = '''The empirical distribution is not sufficiently smoothed.
+                    The estimated transfer function, g, is not 
+                    a strictly increasing function.'''
+            warnings.warn(msg) 
+      
+    if opt.plotflag > 0:
+        tr.plot()
+        tr_emp.plot()
+    return tr, tr_emp
+
 class TimeSeries(PlotData):
     '''
     Container class for 1D TimeSeries data objects in WAFO
@@ -1143,27 +2047,32 @@ class TimeSeries(PlotData):
         if not lag:
             lag = n - 1
 
-        x = self.data.flatten()
-        indnan = isnan(x)
-        if any(indnan):
-            x = x - x[1 - indnan].mean() # remove the mean pab 09.10.2000
-            #indnan = find(indnan)
-            Ncens = n - sum(indnan)
-            x[indnan] = 0. # pab 09.10.2000 much faster for censored samples
+        if 8 * (lag + 1) < n:
+            # only a few lags needed: sum over blocks of the data
+            R, Ncens = _autocov_blocks(self.data, lag)
         else:
-            indnan = None
-            Ncens = n
-            x = x - x.mean()
+            x = self.data.flatten()
+            indnan = isnan(x)
+            if any(indnan):
+                x = x - x[~indnan].mean() # remove the mean pab 09.10.2000
+                #indnan = find(indnan)
+                Ncens = n - sum(indnan)
+                x[indnan] = 0. # pab 09.10.2000 much faster for censored samples
+            else:
+                indnan = None
+                Ncens = n
+                x = x - x.mean()
 
-        #fft = np.fft.fft
-        nfft = 2 ** nextpow2(n)
-        Rper = abs(fft(x, nfft)) ** 2 / Ncens # Raw periodogram
+            #fft = np.fft.fft
+            nfft = 2 ** nextpow2(n)
+            Rper = abs(fft(x, nfft)) ** 2 / Ncens # Raw periodogram
 
-        R = np.real(fft(Rper)) / nfft # %ifft=fft/nfft since Rper is real!
+            R = np.real(fft(Rper)) / nfft # %ifft=fft/nfft since Rper is real!
         lags = range(0, lag + 1)
+        R = R[lags]
         if flag.startswith('unbiased'):
             # unbiased result, i.e. divide by n-abs(lag)
-            R = R[lags] * Ncens / arange(Ncens, Ncens - lag, -1)
+            R = R * Ncens / arange(Ncens, Ncens - lag - 1, -1)
         #else  % biased result, i.e. divide by n
         #  r=r(1:L+1)*Ncens/Ncens
 
@@ -1175,7 +2084,7 @@ class TimeSeries(PlotData):
             dt = self.sampling_period()
         t = linspace(0, lag * dt, lag + 1)
         #cumsum = np.cumsum
-        acf = _wafocov.CovData1D(R[lags], t)
+        acf = _wafocov.CovData1D(R, t)
         acf.sigma = sqrt(r_[ 0, r0 ** 2 , r0 ** 2 + 2 * cumsum(R[1:] ** 2)] / Ncens)
         acf.children = [PlotData(-2. * acf.sigma[lags], t), PlotData(2. * acf.sigma[lags], t)]
         acf.plot_args_children = ['r:']
@@ -1247,6 +2156,8 @@ class TimeSeries(PlotData):
             'cov' :  Frequency smoothing using a parzen window function
                     on the estimated autocovariance function.  (default)
             'psd' : Welch's averaged periodogram method with no overlapping batches
+            'welch' : Welch's averaged periodogram method computed by
+                    WelchSpectrum with segments of length 2**nextpow2(L)
         detrend : function
             defining detrending performed on the signal before estimation.
             (default detrend_mean)   
@@ -1334,7 +2245,13 @@ class TimeSeries(PlotData):
             v = None
             Be = None
               
-        if method == 'psd':
+        if method == 'welch':
+            est = WelchSpectrum(2 ** nextpow2(L), dt, window, noverlap,
+                                detrend=detrend)
+            spec = est.update(yy).tospecdata()
+            Be = est.bandwidth()
+            v = est.dof()
+        elif method == 'psd':
             nfft = 2 ** nextpow2(L) 
             pad_to = rate * nfft #  Interpolate the spectrum with rate 
             S, f = psd(yy, Fs=1. / dt, NFFT=nfft, detrend=detrend, window=window(nfft),
@@ -1403,60 +2320,8 @@ class TimeSeries(PlotData):
         mean = self.data.mean()
         sigma = self.data.std()
         cdf = edf(self.data.ravel())
-        
-        opt = DotDict(chkder=True, plotflag=False, gsm=0.05, param=[-5, 5, 513],
-                   delay=2, linextrap=True, ntr=1000, ne=7, gvar=1)
-        opt.update(options)
-        Ne = opt.ne
-        nd = len(cdf.data) 
-        if nd > opt.ntr and opt.ntr > 0:
-            x0 = linspace(cdf.args[Ne], cdf.args[nd - 1 - Ne], opt.ntr)
-            cdf.data = interp(x0, cdf.args, cdf.data)
-            cdf.args = x0
-            Ne = 0
-        uu = linspace(*opt.param)
-        
-        ncr = len(cdf.data);
-        ng = len(np.atleast_1d(opt.gvar))
-        if ng == 1:
-            gvar = opt.gvar * ones(ncr)
-        else:
-            opt.gvar = np.atleast_1d(opt.gvar)
-            gvar = interp(linspace(0, 1, ncr), linspace(0, 1, ng), opt.gvar.ravel())  
-        
-         
-        ind = np.flatnonzero(diff(cdf.args) > 0) # remove equal points
-        nd = len(ind)
-        ind1 = ind[Ne:nd - Ne]  
-        tmp = invnorm(cdf.data[ind])
-        
-        x = sigma * uu + mean
-        pp_tr = SmoothSpline(cdf.args[ind1], tmp[Ne:nd - Ne], p=opt.gsm, lin_extrap=opt.linextrap, var=gvar[ind1])
-        #g(:,2) = smooth(Fx(ind1,1),tmp(Ne+1:end-Ne),opt.gsm,g(:,1),def,gvar);
-        tr = TrData(pp_tr(x) , x, mean=mean, sigma=sigma)
-        tr_emp = TrData(tmp, cdf.args[ind], mean=mean, sigma=sigma)
-        tr_emp.setplotter('step')
-        
-        if opt.chkder:
-            for ix in xrange(5):
-                dy = diff(tr.data)
-                if (dy <= 0).any():
-                    dy[dy > 0] = floatinfo.eps
-                    gvar = -(np.hstack((dy, 0)) + np.hstack((0, dy))) / 2 + floatinfo.eps
-                    pp_tr = SmoothSpline(cdf.args[ind1], tmp[Ne:nd - Ne], p=1, lin_extrap=opt.linextrap, var=ix * gvar)
-                    tr = TrData(pp_tr(x) , x, mean=mean, sigma=sigma)
-                else: 
-                    break
-            else:
-                msg = '''The empirical distribution is not sufficiently smoothed.
-                        The estimated transfer function, g, is not 
-                        a strictly increasing function.'''
-                warnings.warn(msg) 
-          
-        if opt.plotflag > 0:
-            tr.plot()
-            tr_emp.plot()
-        return tr, tr_emp
+        return _cdf2trdata(cdf, mean, sigma, **options)
+
 
     def trdata(self, method='nonlinear', **options):
         '''
@@ -1497,6 +2362,13 @@ class TimeSeries(PlotData):
                     estimation for long time series without loosing any
                     accuracy. NTR should be chosen greater than
                     PARAM(3). (default 1000)
+           stream - if True the crossing intensity or CDF is counted on 
+                    nlevels levels block by block with TrDataHistogram 
+                    instead of from the turning points or sorted data. 
+                    This is faster for long time series. (default False)
+          nlevels - number of levels used when stream is True (default 4097)
+        blocksize - number of data in each block when stream is True 
+                    (default 2**16)
  
         Returns
         -------
@@ -1543,10 +2415,11 @@ class TimeSeries(PlotData):
         66
         >>> int(g2.dist2gauss()*100)
         84
+        >>> g3, g3emp = ts.trdata(stream=True) # Count on a grid of levels
          
         See also
         --------
-        LevelCrossings.trdata 
+        LevelCrossings.trdata, TrDataHistogram
         wafo.transform.models
            
         References
@@ -1570,9 +2443,17 @@ class TimeSeries(PlotData):
         
         opt = DotDict(chkder=True, plotflag=False, csm=.95, gsm=.05,
             param=[-5, 5, 513], delay=2, ntr=1000, linextrap=True, ne=7, cvar=1, gvar=1,
-            multip=False, crossdef='uM')
+            multip=False, crossdef='uM', stream=False, nlevels=4097,
+            blocksize=2 ** 16)
         opt.update(**options)
         
+        if opt.stream and method[0] in 'nm':
+            x = self.data.ravel()
+            est = TrDataHistogram(linspace(x.min(), x.max(), opt.nlevels), opt.ne)
+            for ix in xrange(0, len(x), opt.blocksize):
+                est.update(x[ix:ix + opt.blocksize])
+            return est.trdata(method, **opt)
+
         ma = self.data.mean()
         sa = self.data.std()
 
@@ -1672,7 +2553,7 @@ class TimeSeries(PlotData):
         tc : TurningPoints object
             with trough and crest turningpoints
         """
-        ind = findtc(self.data, v, wavetype)[0]
+        ind = self._trough_crest_scan(v, wavetype)[2]
         try:
             t = self.args[ind]
         except:
@@ -1680,6 +2561,64 @@ class TimeSeries(PlotData):
         mean = self.data.mean()
         sigma = self.data.std()
         return TurningPoints(self.data[ind], t, mean=mean, sigma=sigma)
+
+    def _resample(self, rate=1, kind='cubic'):
+        '''
+        Return times and data, interpolated if rate is greater than one
+
+        kind is 'cubic' for a cubic spline or 'stineman' for
+        stineman_interp.
+        '''
+        if rate > 1:
+            t0, tn = self.args[0], self.args[-1]
+            if kind == 'stineman':
+                ti = linspace(t0, tn, ceil(self.data.size * rate))
+                xi = stineman_interp(ti, self.args, self.data.ravel())
+            else:
+                ti = linspace(t0, tn, int(rate * len(self.args)))
+                xi = interp1d(self.args , self.data.ravel(), kind='cubic')(ti)  
+        else:
+            ti, xi = self.args, self.data.ravel()
+        return ti, xi
+
+    def _trough_crest_scan(self, v=0, wavetype='tw', rate=1, kind='cubic'):
+        '''
+        Return times, data, trough/crest indices and level v crossing indices
+
+        The trough and crest indices, tc_ind, and the crossing indices,
+        v_ind, are found by findtc in one scan of the (resampled) data.
+        The scans are cached per (v, wavetype, rate, kind) as long as
+        self.data and self.args are unchanged, so that trough_crest,
+        wave_periods, wave_parameters and wave_height_steepness share them.
+        '''
+        if rate <= 1:
+            rate, kind = 1, None
+        cache = self.__dict__.get('_tc_scans')
+        if (cache is None or not np.array_equal(cache[0], self.data) or
+                not np.array_equal(cache[1], self.args)):
+            cache = self._tc_scans = (np.array(self.data),
+                                      np.array(self.args), {})
+        key = (v, wavetype, rate, kind)
+        if key not in cache[2]:
+            ti, xi = self._resample(rate, kind)
+            tc_ind, v_ind = findtc(xi, v, wavetype)
+            cache[2][key] = ti, xi, tc_ind, v_ind
+        return cache[2][key]
+
+    def _trough_crest_waves(self, rate=1):
+        '''
+        Return sampling period, times, data, troughs/crests and crossing times
+
+        The trough and crest indices, tc_ind, and the times of the zero 
+        crossings, tz, of the 'tw' waves are found in one scan of the data.
+        '''
+        dT = self.sampling_period() 
+        if rate > 1:
+            dT = dT / rate
+        ti, xi, tc_ind, z_ind = self._trough_crest_scan(0, 'tw', rate)
+        tz = ecross(ti, xi, z_ind, v=0)
+        return dT, ti, xi, tc_ind, tz
+
     def wave_parameters(self, rate=1):
         '''
         Returns several wave parameters from data.
@@ -1729,27 +2668,16 @@ class TimeSeries(PlotData):
         --------
         wafo.definitions
         '''
-        dT = self.sampling_period() 
-        if rate > 1:
-            dT = dT / rate
-            t0, tn = self.args[0], self.args[-1]
-            n = len(self.args)
-            ti = linspace(t0, tn, int(rate * n))
-            xi = interp1d(self.args , self.data.ravel(), kind='cubic')(ti)  
-            
-        else:
-            ti, xi = self.args, self.data.ravel()
-             
-        tc_ind, z_ind = findtc(xi, v=0, kind='tw')
+        dT, ti, xi, tc_ind, tz = self._trough_crest_waves(rate)
         tc_a = xi[tc_ind]
         tc_t = ti[tc_ind]
         Ac = tc_a[1::2] # crest amplitude
         At = -tc_a[0::2] # trough  amplitude
         Hu = Ac + At[1:]
         Hd = Ac + At[:-1]
-        tu = ecross(ti, xi, z_ind[1::2], v=0)
+        tu = tz[1::2]
         Tu = diff(tu)# Period zero-upcrossing waves
-        td = ecross(ti, xi , z_ind[::2], v=0)
+        td = tz[::2]
         Td = diff(td)# Period zero-downcrossing waves
         Tcf = tc_t[1::2] - tu[:-1]
         Tcf[(Tcf == 0)] = dT # avoiding division by zero
@@ -1820,21 +2748,10 @@ class TimeSeries(PlotData):
         wafo.definitions
         '''
   
-        dT = self.sampling_period() 
         if g is None:
             g = gravity()  #% acceleration of gravity
           
-        if rate > 1:
-            dT = dT / rate
-            t0, tn = self.args[0], self.args[-1]
-            n = len(self.args)
-            ti = linspace(t0, tn, int(rate * n))
-            xi = interp1d(self.args , self.data.ravel(), kind='cubic')(ti)  
-            
-        else:
-            ti, xi = self.args, self.data.ravel()
-        
-        tc_ind, z_ind = findtc(xi, v=0, kind='tw')
+        dT, ti, xi, tc_ind, tz = self._trough_crest_waves(rate)
         tc_a = xi[tc_ind]
         tc_t = ti[tc_ind]
         Ac = tc_a[1::2] # crest amplitude
@@ -1842,12 +2759,12 @@ class TimeSeries(PlotData):
     
         if (0 <= method and method <= 2):
             # time between zero-upcrossing and  crest  [s]
-            tu = ecross(ti, xi, z_ind[1:-1:2], v=0)
+            tu = tz[1:-1:2]
             Tcf = tc_t[1::2] - tu
             Tcf[(Tcf == 0)] = dT # avoiding division by zero
         if (0 >= method and method >= -2): 
             # time between  crest and zero-downcrossing [s]
-            td = ecross(ti, xi, z_ind[2::2], v=0)
+            td = tz[2::2]
             Tcb = td - tc_t[1::2] 
             Tcb[(Tcb == 0)] = dT;  #% avoiding division by zero
       
@@ -1868,21 +2785,21 @@ class TimeSeries(PlotData):
             S = Ac / Tcb
         elif method == 2: #crest front steepness in S and the wave height Hd in H.
             H = Ac + At[:-1] #Hd
-            Td = diff(ecross(ti, xi, z_ind[::2], v=0))
+            Td = diff(tz[::2])
             S = 2 * pi * Ac / Td / Tcf / g
         elif method == -2: # crest back steepness in S and the wave height Hu in H.
             H = Ac + At[1:]
-            Tu = diff(ecross(ti, xi, z_ind[1::2], v=0))
+            Tu = diff(tz[1::2])
             S = 2 * pi * Ac / Tu / Tcb / g
         elif method == 3: # total steepness in S and the wave height Hd in H
             # for zero-doewncrossing waves.
             H = Ac + At[:-1]
-            Td = diff(ecross(ti, xi , z_ind[::2], v=0))# Period zero-downcrossing waves
+            Td = diff(tz[::2])# Period zero-downcrossing waves
             S = 2 * pi * H / Td ** 2 / g
         elif method == -3: # total steepness in S and the wave height Hu in H for
             # zero-upcrossing waves.
             H = Ac + At[1:] 
-            Tu = diff(ecross(ti, xi, z_ind[1::2], v=0))# Period zero-upcrossing waves
+            Tu = diff(tz[1::2])# Period zero-upcrossing waves
             S = 2 * pi * H / Tu ** 2 / g 
          
         return S, H
@@ -1976,14 +2893,7 @@ class TimeSeries(PlotData):
 ##%            Tt2u=T(4:4:nn)
 ##%        end
 
-        if rate > 1: #% interpolate with spline
-            n = ceil(self.data.size * rate)
-            ti = linspace(self.args[0], self.args[-1], n)
-            x = stineman_interp(ti, self.args, self.data.ravel())
-        else:
-            x = self.data
-            ti = self.args
-
+        ti, x = self._resample(rate, kind='stineman') #% interpolate with spline
 
         if vh is None:
             if pdef[0] in ('m', 'M'):
@@ -2000,9 +2910,11 @@ class TimeSeries(PlotData):
             elif pdef in ('u2u', 'u2d', 'd2u', 'd2d'):
                 index = findcross(x, vh, wdef)
             elif pdef in ('t2t', 't2c', 'c2t', 'c2c'):
-                index = findtc(x, vh, wdef)[0]
+                index = self._trough_crest_scan(vh, wdef, rate,
+                                                'stineman')[2].copy()
             elif pdef in ('d2t', 't2u', 'u2c', 'c2d', 'all'):
-                index, v_ind = findtc(x, vh, wdef)
+                index, v_ind = self._trough_crest_scan(vh, wdef, rate,
+                                                       'stineman')[2:]
                 index = sort(r_[index, v_ind]) #% sorting crossings and tp in sequence
             else:
                 raise ValueError('Unknown pdef option!')
@@ -2049,12 +2961,12 @@ class TimeSeries(PlotData):
         if pdef[0] in ('u', 'd'):
             t0 = ecross(ti, x, index[start:(nn - dist):step], vh)
         else: # % min, Max, trough, crest or all crossings wanted
-            t0 = x[index[start:(nn - dist):step]]
+            t0 = ti[index[start:(nn - dist):step]]
 
         if pdef[2] in ('u', 'd'):
             t1 = ecross(ti, x, index[(start + dist):nn:step], vh)
         else: # % min, Max, trough, crest or all crossings wanted
-            t1 = x[index[(start + dist):nn:step]]
+            t1 = ti[index[(start + dist):nn:step]]
 
         T = t1 - t0
         return T, index
@@ -2244,6 +3156,123 @@ class TimeSeries(PlotData):
             #wafostamp
         return figs
 
+_SHARED_RECORDS = {}
+
+def _init_shared_records(buf):
+    _SHARED_RECORDS['data'] = np.frombuffer(buf, dtype=float)
+
+def _record_wave_parameters(x, dt, rate, g):
+    '''
+    Return wave parameters, total steepness, Hs and Tz of one record
+    '''
+    ts = TimeSeries(x, arange(len(x)) * dt)
+    wp = ts.wave_parameters(rate)
+    wp['At'] = wp['At'][:-1]  # trough in front of each crest
+    wp['S'] = 2 * pi * wp['Hd'] / wp['Td'] ** 2 / g
+    Tu = wp['Tu']
+    Tz = Tu.mean() if len(Tu) else nan
+    return wp, 4 * x.std(), Tz
+
+def _shared_record_wave_parameters(task):
+    start, stop, dt, rate, g = task
+    x = _SHARED_RECORDS['data'][start:stop]
+    return _record_wave_parameters(x, dt, rate, g)
+
+def wave_parameters_batch(records, dt=1.0, rate=1, g=None, num_workers=1):
+    '''
+    Return wave parameters of many records in columnar form
+
+    Parameters
+    ----------
+    records : 2D array or iterable
+        one record per row, or an iterable of 1D arrays or TimeSeries objects
+        of possibly different lengths.
+    dt : real scalar
+        sampling period of the array records. TimeSeries records use their
+        own sampling period.
+    rate : scalar integer
+        interpolation rate. Interpolates with spline if greater than one.
+    g : real scalar
+        acceleration of gravity (default gravity()).
+    num_workers : scalar integer
+        number of worker processes. The records are copied once into a
+        shared memory buffer which the workers read from, so only the
+        offsets of each record are sent with the tasks.
+
+    Returns
+    -------
+    parameters : dict
+        with one entry per wave:
+            record : index of the record the wave belongs to
+            Ac, At : crest amplitude and trough amplitude in front of the crest
+            Hu, Hd, Tu, Td, Tcf, Tcb : as in TimeSeries.wave_parameters
+            S : total steepness of the zero-downcrossing wave, 2*pi*Hd/Td**2/g
+        and with one entry per record:
+            Hs : significant wave height, 4*std(x)
+            Tz : mean zero-upcrossing period
+
+    Example
+    -------
+    >>> import wafo.data as wd
+    >>> import wafo.objects as wo
+    >>> x = wd.sea()
+    >>> wp = wo.wave_parameters_batch([x[:5000, 1], x[5000:, 1]], dt=0.25)
+    >>> wp['Hs']
+    array([ 1.94515953,  1.82787865])
+    >>> np.bincount(wp['record'])
+    array([284, 247])
+
+    See also
+    --------
+    TimeSeries.wave_parameters
+    '''
+    if g is None:
+        g = gravity()
+    if isinstance(records, np.ndarray) and records.ndim == 2:
+        records = list(records)
+    data, dts = [], []
+    for record in records:
+        if isinstance(record, TimeSeries):
+            dts.append(record.sampling_period())
+            record = record.data
+        else:
+            dts.append(dt)
+        data.append(np.asarray(record, dtype=float).ravel())
+    stops = cumsum([len(x) for x in data]).tolist()
+    starts = [0] + stops[:-1]
+    tasks = [(start, stop, dti, rate, g)
+             for start, stop, dti in zip(starts, stops, dts)]
+
+    if num_workers > 1:
+        from multiprocessing.sharedctypes import RawArray
+        buf = RawArray('d', stops[-1] if stops else 0)
+        shared = np.frombuffer(buf, dtype=float)
+        for start, x in zip(starts, data):
+            shared[start:start + len(x)] = x
+        del data
+        results = parallel_map(_shared_record_wave_parameters, tasks,
+                               num_workers, _init_shared_records, (buf,))
+    else:
+        results = (_record_wave_parameters(x, dti, rate, g)
+                   for x, dti in zip(data, dts))
+
+    names = ['Ac', 'At', 'Hu', 'Hd', 'Tu', 'Td', 'Tcf', 'Tcb', 'S']
+    columns = dict((name, []) for name in names)
+    record_id, Hs, Tz = [], [], []
+    for ix, (wp, hs, tz) in enumerate(results):
+        for name in names:
+            columns[name].append(wp[name])
+        record_id.append(np.repeat(ix, len(wp['Hd'])))
+        Hs.append(hs)
+        Tz.append(tz)
+    parameters = dict((name, hstack(columns[name]) if columns[name] else
+                       zeros(0)) for name in names)
+    parameters['record'] = (hstack(record_id) if record_id else
+                            zeros(0, dtype=int))
+    parameters['Hs'] = array(Hs, dtype=float)
+    parameters['Tz'] = array(Tz, dtype=float)
+    return parameters
+
 #def hyperbolic_ratio(a, b, sa, sb):
 #    '''
 #    Return ratio of hyperbolic functions
@@ -2,6 +2,7 @@ from __future__ import division
 from wafo.misc import meshgrid, gravity, cart2polar, polar2cart
 from wafo.objects import  TimeSeries #mat2timeseries,
 import warnings
+import time
 
 import numpy as np
 from numpy import (pi, inf, zeros, ones, where, nonzero, #@UnresolvedImport
@@ -14,12 +15,15 @@ from numpy.fft import fft
 from scipy.integrate import simps, trapz
 from scipy.special import erf
 from scipy.linalg import toeplitz
+from scipy.ndimage import map_coordinates
 import scipy.interpolate as interpolate
 from wafo.interpolate import stineman_interp
 
-from wafo.wave_theory.dispersion_relation import w2k #, k2w
+from wafo.wave_theory.dispersion_relation import w2k, k2w
+from wafo.wave_theory.core import TransferFunction
 from wafo.wafodata import PlotData, now
-from wafo.misc import sub_dict_select, nextpow2, discretize, JITImport, findpeaks #, tranproc
+from wafo.misc import (sub_dict_select, nextpow2, discretize, JITImport,
+                       findpeaks, parallel_map) #, tranproc
 from wafo.graphutil import cltext
 from wafo.kdetools import qlevels
 from wafo import wafodata
@@ -59,6 +63,21 @@ def _set_seed(iseed):
         except:
             random.seed(iseed)
 
+def _random_state(iseed):
+    '''Return random generator started at iseed
+
+    A private RandomState is returned if iseed is given, otherwise the
+    global generator in numpy.random.
+    '''
+    if iseed is None:
+        return random
+    state = random.RandomState()
+    try:
+        state.set_state(iseed)
+    except:
+        state.seed(iseed)
+    return state
+
 def qtf(w, h=inf, g=9.81):
     """
     Return Quadratic Transfer Function
@@ -156,6 +175,179 @@ def qtf(w, h=inf, g=9.81):
 
     return h_s, h_d , h_dii
 
+def _disufq(amp, w, kw, h, g, nmin, nmax, num_threads=1):
+    """
+    Return sum and difference frequency effects for all cases in one go
+
+    Parameters
+    ----------
+    amp : array-like, shape (ns, cases)
+        complex amplitudes of the linear components, one column per case.
+    w, kw : array-like, shape (ns/2+1,)
+        angular frequencies and corresponding wave numbers.
+    h, g : scalars
+        water depth and acceleration of gravity.
+    nmin, nmax : integers
+        index range of the frequencies included in the 2'nd order effects.
+    num_threads : integer
+        number of threads to spread the cases over.
+
+    Returns
+    -------
+    svec : ndarray, shape (ns, cases)
+        complex sum of the sum and difference frequency effects. The 2'nd
+        order component of case i is given by real(fft(svec[:, i])).
+
+    Notes
+    -----
+    c_library.disufq stores the amplitudes frequency by frequency, i.e.,
+    the real and imaginary parts of amp are passed in C-order. The GIL is
+    released during the call, so chunks of cases are solved concurrently
+    when num_threads > 1.
+    """
+    ns, cases = amp.shape
+    num_threads = max(min(int(num_threads), cases), 1)
+    if num_threads > 1:
+        from multiprocessing.pool import ThreadPool
+        chunks = np.array_split(arange(cases), num_threads)
+        pool = ThreadPool(num_threads)
+        try:
+            svecs = pool.map(lambda ix: _disufq(amp[:, ix], w, kw, h, g,
+                                                nmin, nmax), chunks)
+        finally:
+            pool.close()
+        return hstack(svecs)
+    r_amp = np.ascontiguousarray(amp.real).ravel()
+    i_amp = np.ascontiguousarray(amp.imag).ravel()
+    rvec, ivec = c_library.disufq(r_amp, i_amp, w, kw, h, g, nmin, nmax,
+                                  cases, ns)
+    svec = rvec + 1J * ivec
+    svec.shape = (ns, cases)
+    return svec
+
+def _sim_blocks(sqrt_s, ns, cases, d_t, blocksize, reltol=1e-6, tr=None,
+                random_state=random):
+    """
+    Generate a Gaussian process block by block from a moving average filter
+
+    Parameters
+    ----------
+    sqrt_s : array-like, shape (nfft,)
+        square root of the two-sided discrete spectrum times nfft, i.e.,
+        the variance of the process is sum(sqrt_s**2)/nfft.
+    ns : scalar
+        total number of simulated points.
+    cases : scalar
+        number of replicates.
+    d_t : scalar
+        sampling period.
+    blocksize : scalar
+        number of points in each block.
+    reltol : scalar
+        relative part of the filter energy that may be truncated.
+    tr : transformation object or None
+        if given the blocks are transformed with tr.gauss2dat.
+    random_state : RandomState or numpy.random
+        generator of the white noise.
+
+    Yields
+    ------
+    xs : array, shape (nb, cases+1)
+        consecutive blocks of the simulated process ( t,X1(t) X2(t) ...).
+
+    Notes
+    -----
+    The process is obtained by convolving a white noise sequence with the
+    zero-phase filter h = real(ifft(sqrt_s)), truncated to the shortest
+    length holding (1-reltol) of its energy. The convolution is done
+    block by block with the overlap-save method, keeping only the last
+    len(h)-1 noise samples between blocks. Thus the blocks are seamless
+    and, for a given seed, independent of blocksize.
+    """
+    nfft = sqrt_s.size
+    h = np.fft.fftshift(np.fft.ifft(sqrt_s).real)
+    energy = (h ** 2).cumsum()
+    total = energy[-1]
+    mid = nfft // 2
+    half = arange(mid + 1)
+    lo = mid - half
+    hi = np.minimum(mid + half, nfft - 1)
+    kept = energy[hi] - energy[lo] + h[lo] ** 2
+    m = flatnonzero(kept >= (1 - reltol) * total)[0]
+    h = h[mid - m:mid + m + 1] * sqrt(total / kept[m])
+    nh = h.size
+
+    blocksize = int(min(blocksize, ns))
+    nfft = 2 ** nextpow2(blocksize + nh - 1)
+    h_f = np.fft.fft(h, nfft)[:, newaxis]
+
+    noise = random_state.randn(nh - 1, cases)
+    for ix in range(0, ns, blocksize):
+        nb = min(blocksize, ns - ix)
+        noise = vstack((noise, random_state.randn(nb, cases)))
+        y = np.fft.ifft(np.fft.fft(noise, nfft, axis=0) * h_f, axis=0).real
+        x = zeros((nb, cases + 1))
+        x[:, 0] = arange(ix, ix + nb) * d_t
+        x[:, 1::] = y[nh - 1:nh - 1 + nb]
+        noise = noise[nb::]
+        if tr is not None:
+            for i in range(cases):
+                x[:, i + 1] = tr.gauss2dat(x[:, i + 1])
+        yield x
+
+def _closed_dir_grid(theta, S):
+    """
+    Return direction grid covering [theta[0], theta[0]+2*pi], S and weights
+
+    Parameters
+    ----------
+    theta : array-like, shape (nt,)
+        increasing directions [rad] spanning at most 2*pi.
+    S : array-like, shape (nt, nf)
+        directional spectrum values.
+
+    Returns
+    -------
+    theta, S : arrays
+        with the first direction repeated at theta[0]+2*pi if missing.
+    d_theta : array
+        trapezoidal integration weights of the closed grid, which sum to 2*pi.
+    """
+    theta0 = theta[0]
+    if theta[-1] - theta0 < 2 * pi * (1 - 1e-8):
+        theta = hstack((theta, theta0 + 2 * pi))
+        S = vstack((S, S[:1]))
+    d = diff(theta)
+    d_theta = (hstack((d, 0)) + hstack((0, d))) / 2
+    return theta, S, d_theta
+
+def _interp_dir_spectrum(w, theta, S, wi, thetai):
+    """
+    Return S(wi, thetai) by bilinear interpolation of a directional spectrum
+
+    The spectrum is periodic in direction and zero outside [w[0], w[-1]].
+    theta and S must be a closed grid, see _closed_dir_grid.
+    """
+    wi, thetai = np.broadcast_arrays(wi, thetai)
+    Si = zeros(wi.shape)
+    mask = (w[0] <= wi) & (wi <= w[-1])
+    thetai = mod(thetai[mask] - theta[0], 2 * pi) + theta[0]
+    coordinates = [interp(thetai, theta, arange(theta.size)),
+                   interp(wi[mask], w, arange(w.size))]
+    Si[mask] = map_coordinates(S, coordinates, order=1)
+    return Si
+
+def _testgaussian_chunk(args):
+    '''Return e(g(u)-u) for cases simulated from acf, see SpecData1D.testgaussian'''
+    acf, ns, cases, iseed, method, opt = args
+    xs = acf.sim(ns=ns, cases=cases, iseed=iseed)
+    test1 = []
+    for iy in range(1, xs.shape[-1]):
+        ts = TimeSeries(xs[:, iy], xs[:, 0].ravel())
+        g, unused_g_emp = ts.trdata(method, **opt)
+        test1.append(g.dist2gauss())
+    return test1
+
 def plotspec(specdata, linetype='b-', flag=1):
     pass
 #    '''
@@ -1250,6 +1442,9 @@ class SpecData1D(PlotData):
             T=5 and using 51 equidistant points in the interval [0,5].
         options : optional parameters
             controlling the performance of the integration. See Rind for details.
+            The option num_workers gives the number of processes used to
+            evaluate the density at the different times (default 1). If it
+            is larger than one, the times are evaluated by Rind.map.
 
         Notes
         -----
@@ -1285,6 +1480,7 @@ class SpecData1D(PlotData):
 
         opts = dict(speed=9)
         opts.update(options)
+        num_workers = opts.pop('num_workers', 1)
         if kind[0] in ('l', 'L'):
             if self.type != 'k1d':
                 raise ValueError('Must be spectrum of type: k1d')
@@ -1361,6 +1557,7 @@ class SpecData1D(PlotData):
         err = zeros(Ntime, dtype=float)
         
         rind = Rind(**opts)
+        problems = []
         #h11 = fwaitbar(0,[],sprintf('Please wait ...(start at: %s)',datestr(now)))
         for pt in xrange(Nstart, Ntime):
             Nt = pt - Nd + 1
@@ -1372,13 +1569,17 @@ class SpecData1D(PlotData):
             
             #% positive wave period  
             BIG = self._covinput_t_pdf(pt, R) 
-          
+            if num_workers > 1:
+                problems.append((BIG, ex[:Ntdc], B_lo, B_up, indI.copy(), xc, Nt))
+                continue
             tmp = rind(BIG, ex[:Ntdc], B_lo, B_up, indI, xc, Nt)
             f[pt], err[pt] = tmp[:2]
             #fwaitbar(pt/Ntime,h11,sprintf('%s Ready: %d of %d',datestr(now),pt,Ntime))
         #end
         #close(h11)
-        
+        if num_workers > 1:
+            for pt, tmp in zip(xrange(Nstart, Ntime), rind.map(problems, num_workers)):
+                f[pt], err[pt] = tmp[:2]
         
         titledict = dict(tc='Density of Tc', tt='Density of Tt', lc='Density of Lc', lt='Density of Lt')
         Htxt = titledict.get(kind.lower())
@@ -1995,9 +2196,101 @@ class SpecData1D(PlotData):
         else:
             return x
 
+    def sim_iter(self, ns=None, cases=1, dt=None, iseed=None,
+                 blocksize=2 ** 14, reltol=1e-6):
+        ''' Simulates a Gaussian process from spectrum block by block
+
+        Parameters
+        ----------
+        ns : scalar
+            total number of simulated points.  (default length(spec)-1=n-1).
+        cases : scalar
+            number of replicates (default=1)
+        dt : scalar
+            step in grid (default dt is defined by the Nyquist freq)
+        iseed : int or state
+            starting state/seed number for a private random number generator
+            (default the global generator in numpy.random is used)
+        blocksize : scalar
+            number of points in each block (default 2**14)
+        reltol : scalar
+            relative part of the filter energy that may be truncated.
+
+        Returns
+        -------
+        xs : generator
+            yielding consecutive blocks of the simulation as
+            blocksize x cases+1 matrices ( t,X1(t) X2(t) ...).
+
+        Details
+        -------
+        The process is simulated by filtering white noise with the square
+        root of the spectrum. Only one block and a filter length of noise is
+        kept in memory, so long records can be simulated and analysed piece
+        by piece. The blocks are seamless, i.e., concatenating them gives a
+        single realization of the process, and for a given iseed the
+        realization does not depend on blocksize.
+
+        If the spectrum has a non-empty field .tr, then the transformation is
+        applied to the simulated data.
+
+        Example:
+        >>> import numpy as np
+        >>> import wafo.spectrum.models as sm
+        >>> from wafo.objects import mat2timeseries
+        >>> Sj = sm.Jonswap();S = Sj.tospecdata()
+        >>> x = np.vstack(S.sim_iter(ns=10000, iseed=1, blocksize=1000))
+        >>> x1 = np.vstack(S.sim_iter(ns=10000, iseed=1, blocksize=4096))
+        >>> np.allclose(x, x1)
+        True
+        >>> for xi in S.sim_iter(ns=10000, blocksize=5000):
+        ...     ts = mat2timeseries(xi)
+        ...     tp = ts.turning_points()
+
+        See also
+        --------
+        sim, CovData1D.sim_iter
+        '''
+        spec = self.copy()
+        if dt is not None:
+            spec.resample(dt)
+
+        ftype = spec.freqtype
+        freq = spec.args
+
+        d_t = spec.sampling_period()
+        Nt = freq.size
+
+        if ns is None:
+            ns = Nt - 1
+
+        nfft = 2 ** nextpow2(2 * (Nt - 1))
+
+        f_i = freq[1:-1]
+        s_i = spec.data[1:-1]
+        if ftype in ('w', 'k'):
+            fact = 2. * pi
+            s_i = s_i * fact
+            f_i = f_i / fact
+
+        d_f = 1 / (nfft * d_t)
+
+        # interpolate for freq.  [1:(N/2)-1]*d_f and create 2-sided, uncentered spectra
+        f = arange(1, nfft / 2.) * d_f
+
+        f_u = hstack((0., f_i, d_f * nfft / 2.))
+        s_u = hstack((0., abs(s_i) / 2., 0.))
+
+        s_i = interp(f, f_u, s_u)
+        s_u = hstack((0., s_i, 0, s_i[nfft // 2 - 2::-1]))
+
+        sqrt_s = sqrt(nfft * s_u * d_f)
+        return _sim_blocks(sqrt_s, ns, cases, d_t, blocksize, reltol, spec.tr,
+                           _random_state(iseed))
+
 # function [x2,x,svec,dvec,amp]=spec2nlsdat(spec,np,dt,iseed,method,truncationLimit)
     def sim_nl(self, ns=None, cases=1, dt=None, iseed=None, method='random',
-        fnlimit=1.4142, reltol=1e-3, g=9.81, verbose=False):
+        fnlimit=1.4142, reltol=1e-3, g=9.81, verbose=False, num_threads=1):
         """ 
         Simulates a Randomized 2nd order non-linear wave X(t)
 
@@ -2028,6 +2321,9 @@ class SpecData1D(PlotData):
         reltol : scalar
             relative tolerance defining where to truncate spectrum for the
             sum and difference frequency effects
+        num_threads : integer
+            number of threads used to compute the sum and difference
+            frequency effects of the cases (default 1).
 
 
         Returns
@@ -2263,22 +2559,8 @@ class SpecData1D(PlotData):
 ##        % 1'st order + 2'nd order component.
 ##        x2(:,2:end) =x(:,2:end)+ real(x2s(1:np,:))+real(x2d(1:np,:))
 ##        else
-        if False:
-            # TODO: disufq does not work for cases>1
-            amp = np.array(amp.T).ravel()
-            rvec, ivec = c_library.disufq(amp.real, amp.imag, w, kw, water_depth,
-                                      g, nmin, nmax, cases, ns)
-            svec = rvec + 1J * ivec
-        else:
-            amp = amp.T
-            svec = []
-            for i in range(cases):
-                rvec, ivec = c_library.disufq(amp[i].real, amp[i].imag, w, kw, water_depth,
-                                      g, nmin, nmax, 1, ns)
-                svec.append(rvec + 1J * ivec)
-            svec = np.hstack(svec)
-        svec.shape = (cases, ns)
-        x2o = fft(svec, axis=1).T # 2'nd order component
+        svec = _disufq(amp, w, kw, water_depth, g, nmin, nmax, num_threads)
+        x2o = fft(svec, axis=0) # 2'nd order component
 
 
         # 1'st order + 2'nd order component.
@@ -2460,7 +2742,9 @@ class SpecData1D(PlotData):
 ##            skew = sum((6*C2+8*E2).*E)/sa^3   % skewness
 ##            kurt = 3+48*sum((C2+E2).*E2)/sa^4 % kurtosis
         return output
-    def testgaussian(self, ns, test0=None, cases=100, method='nonlinear', verbose=False, **opt):
+    def testgaussian(self, ns, test0=None, cases=100, method='nonlinear',
+                     verbose=False, iseed=None, num_workers=1, maxsize=200000,
+                     **opt):
         '''
         TESTGAUSSIAN Test if a stochastic process is Gaussian.
         
@@ -2476,6 +2760,13 @@ class SpecData1D(PlotData):
         
            def    = 'nonlinear' : transform based on smoothed crossing intensity (default)
                     'mnonlinear': transform based on smoothed marginal distribution
+          verbose = if true report progress and elapsed time per chunk
+            iseed = starting state/seed number for the random number generator
+                    (default none is set)
+      num_workers = # of worker processes the chunks are distributed over
+                    (default 1)
+          maxsize = maximum # of points simulated in one chunk 
+                    (default 200000)
           options = options structure defining how the estimation of the
                     transformation is done. (default troptset('dat2tr'))
         
@@ -2483,6 +2774,13 @@ class SpecData1D(PlotData):
          given the spectral density, S. The result is plotted if test0 is given.
          This is useful for testing if the process X(t) is Gaussian.
          If 95% of TEST1 is less than TEST0 then X(t) is not Gaussian at a 5% level.
+         
+         The simulations are divided into chunks of at most maxsize points.
+         Each chunk is simulated with its own seed drawn from iseed, hence the
+         result is reproducible and independent of num_workers.
+         The transformation is estimated for one simulated case at a time,
+         since each case needs its own smoothing spline fit. Use num_workers
+         to estimate the cases of different chunks in parallel.
         
         Example:
         -------
@@ -2526,39 +2824,36 @@ class SpecData1D(PlotData):
 #         changed name from mctest to mctrtest
 #         by pab 11.11.98
         
-        maxsize = 200000 # must divide the computations due to limited memory
 #        if nargin<5||isempty(opt):
 #            opt = troptset('dat2tr');
 #        
 #        opt = troptset(opt,'multip',1)
         
         plotflag = False if test0 is None else True
-        if cases > 50:
+        if cases > 50 and num_workers <= 1:
             print('  ... be patient this may take a while')
         
-       
-        rep = int(ns * cases / maxsize) + 1
+        # must divide the computations due to limited memory
+        nstep = max(int(maxsize / ns), 1)
+        chunks = [min(nstep, cases - ix) for ix in range(0, cases, nstep)]
         
-        Nstep = int(cases / rep)
+        # Each chunk has its own seed, so that the result does not depend on
+        # the number of workers
+        _set_seed(iseed)
+        seeds = random.randint(2 ** 31 - 1, size=len(chunks))
         
         acf = self.tocovdata()
         #R = spec2cov(S);
+        tasks = [(acf, ns, chunk, seed, method, opt)
+                 for chunk, seed in zip(chunks, seeds)]
         test1 = []
-        for ix in  range(rep):
-            xs = acf.sim(ns=ns, cases=Nstep)
-            for iy in range(1, xs.shape[-1]):
-                ts = TimeSeries(xs[:, iy], xs[:, 0].ravel())
-                g, tmp = ts.trdata(method, **opt)
-                test1.append(g.dist2gauss())
+        t_0 = time.time()
+        for ix, test in enumerate(parallel_map(_testgaussian_chunk, tasks,
+                                               num_workers)):
+            test1.extend(test)
             if verbose:
-                print('finished %d of %d ' % (ix + 1, rep))
-        
-        if rep > 1:
-            xs = acf.sim(ns=ns, cases=np.remainder(cases, rep))
-            for iy in range(1, xs.shape[-1]):
-                ts = TimeSeries(xs[:, iy], xs[:, 0].ravel())
-                g, tmp = ts.trdata(method, **opt)
-                test1.append(g.dist2gauss())
+                print('finished %d of %d (%g sec)' % (ix + 1, len(tasks),
+                                                     time.time() - t_0))
                 
         if plotflag: 
             plotbackend.plot(test1, 'o')
@@ -3253,8 +3548,230 @@ class SpecData2D(PlotData):
         pass
     def tospecdata(self, type=None):
         pass
-    def sim(self):
-        pass
+
+    def _get_dir_spectrum(self):
+        '''
+        Return w [rad/s], theta [rad] and S(theta,w) of a directional spectrum
+
+        The directions are relative to the x-axis, i.e., theta-phi.
+        '''
+        if not self.type.endswith('dir'):
+            raise ValueError('Can only simulate directional spectra (type "dir")!')
+        w = ravel(self.args[0]).astype(float)
+        theta = ravel(self.args[1]).astype(float)
+        S = np.asarray(self.data, dtype=float)
+        if self.freqtype.startswith('f'):
+            w = 2 * pi * w
+            S = S / (2 * pi)
+        if self.angletype.startswith('d'):
+            theta = theta * pi / 180
+            S = S * 180 / pi
+        return w, theta - self.phi, S
+
+    def sim_iter(self, ns=None, dt=None, x=None, y=None, iseed=None,
+                 blocksize=64):
+        '''
+        Simulates a Gaussian sea surface, eta(x,y,t), block by block in time
+
+        Parameters
+        ----------
+        ns : scalar
+            number of simulated time steps (default length(w)-1).
+        dt : scalar
+            time step (default dt is defined by the Nyquist freq)
+        x, y : array-like
+            equidistant coordinates [m] of the grid (default 64 points spaced
+            by the Nyquist wave length of the highest frequency).
+        iseed : int or state
+            starting state/seed number for the random number generator
+            (default none is set)
+        blocksize : scalar
+            number of time steps in each block (default 64)
+
+        Returns
+        -------
+        blocks : generator
+            yielding consecutive blocks (t, eta) of times, t, and simulated
+            surface, eta, of shape (len(t), len(y), len(x)).
+
+        Details
+        -------
+        The directional spectrum is interpolated to the wave numbers,
+        (k1,k2), of the 2D FFT of the grid and the surface is the sum of
+        random waves
+
+            eta(x,y,t) = Re(sum A(k1,k2)*exp(i*(k1*x+k2*y-w(k)*t)))
+
+        where w(k) is given by the dispersion relation and A are independent
+        complex Gaussian amplitudes with E|A|**2 = 2*S(k1,k2)*dk1*dk2. Each
+        time step is one inverse 2D FFT so the memory used is proportional
+        to the grid size times blocksize. The surface is periodic in x and y
+        with periods len(x)*dx and len(y)*dy, respectively. For a given
+        iseed the surface does not depend on blocksize.
+
+        If the spectrum has a non-empty field .tr, then the transformation is
+        applied to the simulated surface.
+
+        Example
+        -------
+        >>> import numpy as np
+        >>> import wafo.spectrum.models as sm
+        >>> D = sm.Spreading()
+        >>> SD = D.tospecdata2d(sm.Jonswap().tospecdata(),nt=101)
+        >>> x = np.arange(64)*5.
+        >>> etas = [eta for t, eta in SD.sim_iter(ns=100, dt=0.5, x=x, y=x)]
+        >>> [eta.shape for eta in etas]
+        [(64, 64, 64), (36, 64, 64)]
+
+        See also
+        --------
+        sim, SpecData1D.sim_iter
+        '''
+        w, theta, S = self._get_dir_spectrum()
+        theta, S, unused_d_theta = _closed_dir_grid(theta, S)
+        g = np.atleast_1d(self.__dict__.get('g', gravity()))[0]
+        h = self.h
+
+        if dt is None:
+            dt = pi / w[-1]
+        if ns is None:
+            ns = w.size - 1
+        if x is None or y is None:
+            d_x = pi / w2k(w[-1], 0, h, g)[0]
+            x = arange(64) * d_x if x is None else x
+            y = arange(64) * d_x if y is None else y
+        x, y = np.atleast_1d(x, y)
+        nx, ny = x.size, y.size
+        d_x = x[1] - x[0] if nx > 1 else 1.
+        d_y = y[1] - y[0] if ny > 1 else 1.
+
+        k1, k2 = meshgrid(2 * pi * np.fft.fftfreq(nx, d_x),
+                          2 * pi * np.fft.fftfreq(ny, d_y))
+        k = np.hypot(k1, k2)
+        k[0, 0] = 1 # avoid division by zero, S_k[0, 0] is set to zero below
+        w_k = k2w(k, 0, h, g)[0]
+        theta_k = arctan2(k2, k1)
+        # Jacobian: S(w,theta)*dw*dtheta = S(k1,k2)*dk1*dk2 where
+        # dk1*dk2 = k*dk*dtheta
+        if h == inf:
+            dwdk = g / (2 * w_k)
+        else:
+            kh = k * h
+            dwdk = g * (tanh(kh) + kh / cosh(kh) ** 2) / (2 * w_k)
+        S_k = _interp_dir_spectrum(w, theta, S, w_k, theta_k) * dwdk / k
+        S_k[0, 0] = 0
+        d_k = (2 * pi) ** 2 / (nx * d_x * ny * d_y)
+
+        state = _random_state(iseed)
+        amp = (sqrt(S_k * d_k) * (state.randn(ny, nx) + 1j * state.randn(ny, nx)) *
+               exp(1j * (k1 * x[0] + k2 * y[0])) * (nx * ny))
+        tr = self.tr
+        for ix in range(0, ns, blocksize):
+            nb = min(blocksize, ns - ix)
+            t = arange(ix, ix + nb) * dt
+            eta = np.fft.ifft2(amp[newaxis] * 
+                               exp(-1j * w_k[newaxis] * t[:, newaxis, newaxis])).real
+            if tr is not None:
+                eta = tr.gauss2dat(eta.ravel()).reshape(eta.shape)
+            yield t, eta
+
+    def sim(self, ns=None, dt=None, x=None, y=None, pos=None, sensortype='n',
+            iseed=None, blocksize=64):
+        '''
+        Simulates a Gaussian sea surface or sensor outputs from spectrum
+
+        Parameters
+        ----------
+        ns : scalar
+            number of simulated time steps (default length(w)-1).
+        dt : scalar
+            time step (default dt is defined by the Nyquist freq)
+        x, y : array-like
+            equidistant coordinates [m] of the grid, see sim_iter.
+        pos : array-like, shape (npos, 3)
+            sensor positions [x,y,z]. If given, sensor outputs are simulated
+            instead of the surface on the grid.
+        sensortype : string or list of strings
+            sensor type(s), see TransferFunction (default 'n', i.e., surface
+            elevation).
+        iseed : int or state
+            starting state/seed number for the random number generator
+            (default none is set)
+        blocksize : scalar
+            number of time steps simulated at a time on the grid.
+
+        Returns
+        -------
+        If pos is None:
+            t, eta : arrays
+                times and simulated surface of shape (ns, len(y), len(x)).
+        otherwise:
+            xs : array
+                a npos+1 column matrix ( t,Y1(t) Y2(t) ...).
+
+        Details
+        -------
+        The surface is simulated with sim_iter. The sensor outputs are
+        simulated by the random phase and amplitude method where the
+        directional spectrum is interpolated to the frequencies of a FFT of
+        length 2**nextpow2(ns) and the transfer functions of the sensors
+        are obtained from TransferFunction. The sensor outputs are
+        simulated jointly, i.e., they share the same random amplitudes.
+
+        Example
+        -------
+        >>> import numpy as np
+        >>> import wafo.spectrum.models as sm
+        >>> D = sm.Spreading()
+        >>> SD = D.tospecdata2d(sm.Jonswap().tospecdata(),nt=101)
+        >>> t, eta = SD.sim(ns=20, dt=0.5, x=np.arange(32)*5., y=np.arange(16)*5.)
+        >>> eta.shape
+        (20, 16, 32)
+        >>> pos = [(0, 0, 0), (0, 0, 0), (10, 0, 0)]
+        >>> xs = SD.sim(ns=1000, dt=0.5, pos=pos, sensortype=['n', 'n_x', 'n'])
+        >>> xs.shape
+        (1000, 4)
+
+        See also
+        --------
+        sim_iter, TransferFunction, SpecData1D.sim
+        '''
+        if pos is None:
+            blocks = list(self.sim_iter(ns, dt, x, y, iseed, blocksize))
+            return hstack([t for t, eta in blocks]), vstack([eta for t, eta in blocks])
+
+        pos = np.atleast_2d(pos)
+        npos = pos.shape[0]
+        if isinstance(sensortype, str):
+            sensortype = [sensortype] * npos
+
+        w, theta, S = self._get_dir_spectrum()
+        theta, S, d_theta = _closed_dir_grid(theta, S)
+        g = np.atleast_1d(self.__dict__.get('g', gravity()))[0]
+        if dt is None:
+            dt = pi / w[-1]
+        if ns is None:
+            ns = w.size - 1
+
+        nfft = 2 ** nextpow2(max(ns, 2 * (w.size - 1)))
+        d_w = 2 * pi / (nfft * dt)
+        w_f = arange(1, nfft // 2) * d_w
+        S_f = _interp_dir_spectrum(w, theta, S, w_f[newaxis, :], theta[:, newaxis])
+        kw = w2k(w_f, 0, self.h, g)[0]
+
+        state = _random_state(iseed)
+        amp = (sqrt(S_f * d_w * d_theta[:, newaxis]) *
+               (state.randn(*S_f.shape) + 1j * state.randn(*S_f.shape)))
+        xs = zeros((ns, npos + 1))
+        xs[:, 0] = arange(ns) * dt
+        z = zeros(nfft, dtype=complex)
+        for i in range(npos):
+            tf = TransferFunction(pos=pos[i], sensortype=sensortype[i],
+                                  h=self.h, g=g)
+            Hw, Gwt = tf.tran(w_f, theta, kw)
+            z[1:nfft // 2] = ravel(Hw) * (amp * Gwt).sum(axis=0)
+            xs[:, i + 1] = fft(z)[:ns].real
+        return xs
     def sim_nl(self):
         pass
     def rotate(self, phi=0, rotateGrid=False, method='linear'):
@@ -41,6 +41,13 @@ def test_to_t_pdf():
     >>> ['%2.4f' % val for val in f.err[:10]]  
     ['0.0000', '0.0003', '0.0003', '0.0004', '0.0006', '0.0009', '0.0016', '0.0019', '0.0020', '0.0021']
     '''
+def test_to_t_pdf_workers():
+    S = sm.Jonswap().tospecdata()
+    f = S.to_t_pdf(pdef='Tc', paramt=(0, 10, 21), speed=7, seed=100)
+    f2 = S.to_t_pdf(pdef='Tc', paramt=(0, 10, 21), speed=7, seed=100,
+                    num_workers=2)
+    assert((np.abs(f.data - f2.data) <= 3 * (f.err + f2.err) + 1e-4).all())
+
 @slow
 def test_sim():
     
@@ -59,7 +66,30 @@ def test_sim():
         sa = res.std()
         #trueval, m, sa
         assert(np.abs(m-trueval)<sa)
-@slow   
+
+def test_sim_iter():
+    Sj = sm.Jonswap();S = Sj.tospecdata()
+    x = np.vstack(S.sim_iter(ns=50000, cases=2, iseed=1, blocksize=4000))
+    x1 = np.vstack(S.sim_iter(ns=50000, cases=2, iseed=1, blocksize=2 ** 14))
+    assert(x.shape == (50000, 3))
+    assert(np.allclose(x, x1))
+    assert(np.allclose(np.diff(x[:, 0]), S.sampling_period()))
+    m0 = S.moment(1)[0][0]
+    assert((np.abs(x[:, 1::].var(axis=0) - m0) < 0.1 * m0).all())
+
+    R = S.tocovdata()
+    xr = np.vstack(R.sim_iter(ns=50000, iseed=1, blocksize=4000))
+    assert(np.abs(xr[:, 1].var() - R.data[0]) < 0.1 * R.data[0])
+
+    # the realization does not depend on the use of the global generator
+    # between creating and consuming the iterators
+    blocks = S.sim_iter(ns=50000, cases=2, iseed=1, blocksize=4000)
+    blocks_r = R.sim_iter(ns=50000, iseed=1, blocksize=4000)
+    np.random.randn(100)
+    assert(np.all(np.vstack(blocks) == x))
+    assert(np.all(np.vstack(blocks_r) == xr))
+
+@slow
 def test_sim_nl():
     
     Sj = sm.Jonswap();S = Sj.tospecdata()
@@ -82,8 +112,30 @@ def test_sim_nl():
         sa = res.std()
         #trueval, m, sa
         assert(np.abs(m-trueval)<2*sa)
-    
-    
+
+def test_disufq_cases():
+    from wafo.spectrum.core import _disufq
+    from wafo.wave_theory.dispersion_relation import w2k
+    ns, cases = 256, 5
+    np.random.seed(1)
+    amp = np.random.randn(ns, cases) + 1j * np.random.randn(ns, cases)
+    w = np.linspace(0, 3, ns // 2 + 1)
+    for h in [20., 1e30]:
+        kw = w2k(w, 0., h)[0]
+        svec = _disufq(amp, w, kw, h, 9.81, 5, 100)
+        svec_t = _disufq(amp, w, kw, h, 9.81, 5, 100, num_threads=3)
+        for i in range(cases):
+            svec_i = _disufq(amp[:, i:i + 1], w, kw, h, 9.81, 5, 100)
+            assert(np.allclose(svec[:, i:i + 1], svec_i))
+        assert(np.allclose(svec, svec_t))
+
+def test_sim_nl_threads():
+    Sj = sm.Jonswap();S = Sj.tospecdata()
+    x2, x1 = S.sim_nl(ns=1000, cases=4, iseed=1)
+    x2t, x1t = S.sim_nl(ns=1000, cases=4, iseed=1, num_threads=2)
+    assert(np.allclose(x1, x1t))
+    assert(np.allclose(x2, x2t))
+
 def test_stats_nl():
       
     Hs = 7.
@@ -116,6 +168,15 @@ def test_testgaussian():
     >>> sum(t1>t0)<5
     True
     '''
+
+def test_testgaussian_workers():
+    Sj = sm.Jonswap(Hm0=7)
+    S = Sj.tospecdata()
+    t1 = S.testgaussian(ns=2**12, cases=6, iseed=1, maxsize=2**13)
+    t2 = S.testgaussian(ns=2**12, cases=6, iseed=1, maxsize=2**13,
+                        num_workers=2)
+    assert(len(t1) == 6)
+    assert(np.allclose(t1, t2))
     
 def test_moment():   
     Sj = sm.Jonswap(Hm0=5)
@@ -200,4 +261,4 @@ if __name__ == '__main__':
     #test_tocovdata()
     #test_tocovmatrix()
     #test_sim()
-    #test_bandwidth()
\ No newline at end of file
+    #test_bandwidth()
@@ -0,0 +1,56 @@
+import wafo.spectrum.models as sm
+import numpy as np
+
+
+def _dir_spectrum():
+    D = sm.Spreading()
+    return D.tospecdata2d(sm.Jonswap().tospecdata(), nt=101)
+
+
+def test_sim():
+    SD = _dir_spectrum()
+    m0 = SD.moment(nr=0)[0][0]
+    x = np.arange(256) * 8.
+    t, eta = SD.sim(ns=10, dt=0.5, x=x, y=x[:128], iseed=1, blocksize=3)
+    t1, eta1 = SD.sim(ns=10, dt=0.5, x=x, y=x[:128], iseed=1)
+    assert(eta.shape == (10, 128, 256))
+    assert(np.allclose(t, np.arange(10) * 0.5))
+    assert(np.allclose(eta, eta1))
+    assert(np.abs(eta.var() - m0) < 0.2 * m0)
+
+    # waves travel in the positive x-direction
+    eta_x = np.diff(eta, axis=2)[1:-1, :, :]
+    eta_t = (eta[2:] - eta[:-2])[:, :, 1:]
+    assert(np.corrcoef(eta_x.ravel(), eta_t.ravel())[0, 1] < -0.5)
+
+
+def test_sim_iter_random_state():
+    SD = _dir_spectrum()
+    x = np.arange(64) * 8.
+    blocks = SD.sim_iter(ns=6, dt=0.5, x=x, y=x, iseed=1, blocksize=3)
+    np.random.seed(0)
+    state = np.random.get_state()
+    # the realization does not depend on the use of the global generator
+    # between creating and consuming the iterator
+    eta = np.vstack([eta_b for unused_t, eta_b in blocks])
+    eta1 = SD.sim(ns=6, dt=0.5, x=x, y=x, iseed=1)[1]
+    assert(np.all(eta == eta1))
+    # and the global generator is not reseeded
+    assert(np.all(np.random.get_state()[1] == state[1]))
+
+
+def test_sim_sensors():
+    SD = _dir_spectrum()
+    m0 = SD.moment(nr=0)[0][0]
+    pos = [(0, 0, 0), (0, 0, 0), (0, 0, 0), (200, 0, 0)]
+    xs = SD.sim(ns=20000, dt=0.5, pos=pos, sensortype=['n', 'n_x', 'n_t', 'n'],
+                iseed=2)
+    assert(xs.shape == (20000, 5))
+    assert((np.abs(xs[:, [1, 4]].var(axis=0) - m0) < 0.1 * m0).all())
+    assert(np.corrcoef(xs[:, 2], xs[:, 3])[0, 1] < -0.5)
+    assert(np.abs(np.corrcoef(xs[:, 1], xs[:, 4])[0, 1]) < 0.5)
+
+
+if __name__ == '__main__':
+    import nose
+    nose.run()
@@ -1,16 +1,16 @@
 from __future__ import division
 import warnings
 from wafo.wafodata import PlotData
-from wafo.misc import findextrema
 from scipy import special
 import numpy as np
 from numpy import inf
 from numpy import atleast_1d, nan, ndarray, sqrt, vstack, ones, where, zeros
 from numpy import arange, floor, linspace, asarray #, reshape, repeat, product
 from time import gmtime, strftime
+from bisect import bisect_left
 
 
-__all__ = ['edf', 'edfcnd','reslife', 'dispersion_idx','decluster','findpot', 
+__all__ = ['edf', 'edfcnd','reslife', 'dispersion_idx', 'ExceedanceIndex','decluster','findpot', 
            'declustering_time','interexceedance_times', 'extremal_idx']
 
 arr = asarray
@@ -130,7 +130,7 @@ def reslife(data, u=None, umin=None, umax=None, nu=None, nmin=3, alpha=0.05, plo
     
     Parameters
     ---------
-    data : array_like
+    data : array_like or ExceedanceIndex object
         vector of data of length N. 
     u :  array-like
         threshold values (default linspace(umin, umax, nu))
@@ -173,38 +173,17 @@ def reslife(data, u=None, umin=None, umax=None, nu=None, nmin=3, alpha=0.05, plo
       
     See also
     ---------
-    genpareto
+    genpareto, ExceedanceIndex
     fitgenparrange, disprsnidx
     '''
+    index = _exceedance_index(data)
     if u is None:
-        sd = np.sort(data)
-        n = len(data)
-        
-        nmin = max(nmin, 0)
-        if 2 * nmin > n:
-            warnings.warn('nmin possibly too large!')
-        
-        sdmax, sdmin = sd[-nmin], sd[0]
-        umax = sdmax if umax is None else min(umax, sdmax)
-        umin = sdmin if umin is None else max(umin, sdmin)
-        
-        if nu is None:
-            nu = min(n - nmin, 100)
-        
-        u = linspace(umin, umax, nu)
-    
+        u, umin, umax = index.thresholds(umin, umax, nu, nmin)
     
+    u = arr(u, dtype=float)
     nu = len(u)
     
-    #mrl1 = valarray(nu) 
-    #srl = valarray(nu)
-    #num = valarray(nu)
-    
-    mean_and_std = lambda data1 : (data1.mean(), data1.std(), data1.size)
-    dat = arr(data)
-    tmp = arr([mean_and_std(dat[dat > tresh] - tresh) for tresh in u.tolist()])
-    
-    mrl, srl, num = tmp.T
+    mrl, srl, num = index.excess_stats(u)
     p = 1 - alpha
     alpha2 = alpha / 2
     
@@ -232,7 +211,8 @@ def dispersion_idx(data, t=None, u=None, umin=None, umax=None, nu=None, nmin=10,
     Parameters
     ----------
     data, ti : array_like
-        data values and sampled times, respectively.
+        data values and sampled times, respectively. data may also be an
+        ExceedanceIndex object.
     u :  array-like
         threshold values (default linspace(umin, umax, nu))
     umin, umax : real scalars
@@ -317,7 +297,8 @@ def dispersion_idx(data, t=None, u=None, umin=None, umax=None, nu=None, nmin=10,
     
     
     
-    n = len(data)
+    index = _exceedance_index(data)
+    n = index.n
     if t is None:
         ti = arange(n)
     else:
@@ -328,42 +309,20 @@ def dispersion_idx(data, t=None, u=None, umin=None, umax=None, nu=None, nmin=10,
     
     
     if u is None:
-        sd = np.sort(data)
-       
-        
-        nmin = max(nmin, 0)
-        if 2 * nmin > n:
-            warnings.warn('nmin possibly too large!')
-        
-        sdmax, sdmin = sd[-nmin], sd[0]
-        umax = sdmax if umax is None else min(umax, sdmax)
-        umin = sdmin if umin is None else max(umin, sdmin)
-        
-        if nu is None:
-            nu = min(n - nmin, 100)
-        
-        u = linspace(umin, umax, nu)
-    
-   
+        u = index.thresholds(umin, umax, nu, nmin)[0]
     
+    u = arr(u, dtype=float)
     nu = len(u)
-   
-    di = np.zeros(nu)
-    
-    d = arr(data)
     
     mint = int(min(t1)) #; % mint should be 0.
     maxt = int(max(t1))
     M = maxt - mint + 1;
-    occ = np.zeros(M);
     
-    for ix, tresh in enumerate(u.tolist()):
-        excess = (d > tresh)
-        lambda_ = excess.sum() / M
-        for block in  range(M):
-            occ[block] = sum(excess[t1 == block])
-      
-        di[ix] = occ.var() / lambda_
+    # number of exceedances and sum of squared number of exceedances in 
+    # each block for all thresholds.
+    num, num2 = index.block_exceedances(t1 - mint, u, M)
+    # di = occ.var() / lambda_ where lambda_ = num / M
+    di = (num2 * M - num ** 2) / (M * num)
     
     p = 1 - alpha
    
@@ -392,6 +351,141 @@ def dispersion_idx(data, t=None, u=None, umin=None, umax=None, nu=None, nmin=10,
         res.plot(di)
     return res, b_u, ok_u
 
+class ExceedanceIndex(object):
+    '''
+    Sorted data with cumulative sums for sweeping many thresholds at once
+    
+    Parameters
+    ----------
+    data : array-like
+        vector of data of length N, e.g., peaks over threshold.
+    
+    Notes
+    -----
+    The data are sorted once, which costs O(N log N). Thereafter the number,
+    mean and standard deviation of the excesses over nu thresholds are found
+    by binary search in O(nu log N). The same object may be given to reslife
+    and dispersion_idx instead of the data in order to reuse the sorting.
+    
+    Example
+    -------
+    >>> index = ExceedanceIndex(np.arange(10.))
+    >>> index.count([2.5, 8])
+    array([7, 1])
+    >>> mrl, srl, num = index.excess_stats([2.5, 8])
+    >>> mrl
+    array([ 3.5,  1. ])
+    >>> srl
+    array([ 2.,  0.])
+    
+    See also
+    --------
+    reslife, dispersion_idx
+    '''
+    def __init__(self, data):
+        data = arr(data).ravel()
+        self.n = n = len(data)
+        self.order = np.argsort(data, kind='mergesort')
+        self.data = data[self.order]
+        # Subtract the median to reduce cancellation in the sum of squares
+        self.shift = self.data[n // 2] if n > 0 else 0.0
+        x = self.data[::-1] - self.shift
+        self._cumsum = np.hstack((0, np.cumsum(x)))
+        self._cumsum2 = np.hstack((0, np.cumsum(x * x)))
+        
+    def thresholds(self, umin=None, umax=None, nu=None, nmin=3):
+        '''
+        Return default thresholds, linspace(umin, umax, nu), umin and umax
+        
+        umin, umax are limited to the range of the data and such that at
+        least nmin extremes are above umax. nu defaults to min(N-nmin,100).
+        '''
+        n = self.n
+        nmin = max(nmin, 0)
+        if 2 * nmin > n:
+            warnings.warn('nmin possibly too large!')
+        
+        sdmax, sdmin = self.data[-nmin], self.data[0]
+        umax = sdmax if umax is None else min(umax, sdmax)
+        umin = sdmin if umin is None else max(umin, sdmin)
+        
+        if nu is None:
+            nu = min(n - nmin, 100)
+        
+        return linspace(umin, umax, nu), umin, umax
+    
+    def count(self, u):
+        '''Return number of data above the thresholds, u.'''
+        return self.n - np.searchsorted(self.data, u, side='right')
+    
+    def excess_stats(self, u):
+        '''
+        Return mean, standard deviation and number of excesses over u
+        
+        Returns
+        -------
+        mrl, srl : arrays
+            mean and standard deviation of data[data>u]-u (NaN if empty).
+        num : array of integers
+            number of data above u.
+        '''
+        u = arr(u, dtype=float)
+        num = self.count(u)
+        olderr = np.seterr(divide='ignore', invalid='ignore')
+        try:
+            mean = self._cumsum[num] / num
+            var = self._cumsum2[num] / num - mean ** 2
+        finally:
+            np.seterr(**olderr)
+        mrl = mean - (u - self.shift)
+        srl = sqrt(np.maximum(var, 0)) # var<0 due to round off
+        return mrl, srl, num
+    
+    def block_exceedances(self, blocks, u, M=None):
+        '''
+        Return number of exceedances and sum of squared block counts of exceedances
+        
+        Parameters
+        ----------
+        blocks : array-like of integers
+            block number (0,1,...,M-1) of each data value (in original order).
+        u : array-like
+            threshold values.
+        M : scalar integer
+            number of blocks (default max(blocks)+1).
+        
+        Returns
+        -------
+        num : array of integers
+            number of data above each threshold, i.e., sum(occ)
+        num2 : array of integers
+            sum(occ**2) for each threshold, where occ is the number of data
+            above the threshold in each block.
+        
+        Notes
+        -----
+        If the k'th largest value in a block is above the threshold it adds 
+        2*k-1 to num2, i.e., the increment from (k-1)**2 to k**2.
+        '''
+        n = self.n
+        dblocks = arr(blocks, dtype=int).ravel()[self.order[::-1]]
+        if M is None:
+            M = dblocks.max() + 1 if n > 0 else 0
+        # rank of each value within its block in decreasing order
+        iblocks = np.argsort(dblocks, kind='mergesort')
+        counts = np.bincount(dblocks, minlength=M)
+        rank = np.empty(n, dtype=int)
+        rank[iblocks] = (arange(1, n + 1) - 
+                         np.repeat(np.cumsum(counts) - counts, counts))
+        cum_num2 = np.hstack((0, np.cumsum(2 * rank - 1)))
+        num = self.count(u)
+        return num, cum_num2[num]
+
+def _exceedance_index(data):
+    if isinstance(data, ExceedanceIndex):
+        return data
+    return ExceedanceIndex(data)
+
 def decluster(data, t=None, thresh=None, tmin=1):   
     '''
     Return declustered peaks over threshold values
@@ -500,17 +594,10 @@ def findpot(data, t=None, thresh=None, tmin=1):
     if np.any(isTooSmall):
         isTooClose = np.hstack((isTooSmall[0], isTooSmall[:-1] | isTooSmall[1:], isTooSmall[-1]))
      
-        #Find opening (NO) and closing (NC) index for data beeing to close:
-        iy = findextrema(np.hstack([0, 0, isTooSmall, 0]))
-    
-        NO = iy[::2] - 1 
-        NC = iy[1::2] 
-      
-        for no, nc in zip(NO, NC):
-            iz = slice(no, nc)
-            iOK = _find_ok_peaks(Ye[iz], Te[iz], tmin)
-            if len(iOK):
-                isTooClose[no + iOK] = 0
+        # Runs of data being too close are more than tmin apart from each
+        # other, so all runs are declustered together in one pass.
+        iz, = where(isTooClose)
+        isTooClose[iz[_find_ok_peaks(Ye[iz], Te[iz], tmin)]] = 0
         # Remove data which is too close to other data.        
         if isTooClose.any():
             #len(tooClose)>0:
@@ -524,27 +611,23 @@ def _find_ok_peaks(Ye, Te, Tmin):
     '''
     Return indices to the largest maxima that are at least Tmin
     distance apart.
+
+    The maxima are visited in descending order (the first of equal maxima
+    first) and accepted if no accepted maximum is within Tmin distance. The
+    accepted times are kept sorted so that only the nearest accepted
+    neighbours need to be checked, i.e., O(Ny*log(Ny)) operations.
     '''
-    Ny = len(Ye)
-    
-    I = np.argsort(-Ye) #  sort in descending order
-    
-    Te1 = Te[I]
-    oOrder = zeros(Ny, dtype=int)
-    oOrder[I] = range(Ny) #indices to the variables original location
-    
-    isTooClose = zeros(Ny, dtype=bool)
-      
-    pool = zeros((Ny, 2))
-    T_range = np.hstack([-Tmin, Tmin])
-    K = 0
-    for i, ti in enumerate(Te1):
-        isTooClose[i] = np.any((pool[:K, 0] <= ti) & (ti <= pool[:K, 1]))
-        if not isTooClose[i]:
-            pool[K] = ti + T_range
-            K += 1
-      
-    iOK, = where(1 - isTooClose[oOrder])
+    I = np.argsort(-Ye, kind='mergesort') #  sort in descending order
+    isOK = zeros(len(Ye), dtype=bool)
+    pool = [] # sorted times of accepted maxima
+    for i, ti in zip(I.tolist(), Te[I].tolist()):
+        k = bisect_left(pool, ti)
+        if ((k > 0 and ti <= pool[k - 1] + Tmin) or
+            (k < len(pool) and pool[k] - Tmin <= ti)):
+            continue
+        pool.insert(k, ti)
+        isOK[i] = True
+    iOK, = where(isOK)
     return iOK
 
 def declustering_time(t):
@@ -2204,123 +2204,246 @@ class rv_continuous(rv_generic):
         N = len(x)
         return self._nnlf(x, *args) + N*log(scale) + Nbad * 100.0 * loginf
     
-    def hessian_nlogps(self, theta, data, eps=None):
-        ''' approximate hessian of nlogps where theta are the parameters (including loc and scale)
+    def _nnlf_vec(self, theta, x, return_nbad=False):
+        ''' Return nnlf(theta[:, j], x[j]) for each column j of theta
+
+        theta : array of shape (numpar, m)
+            distribution parameters (including loc and scale).
+        x : array of shape (n,) or (m, n)
+            data, possibly padded with NaNs.
+        return_nbad : bool
+            if True also return the number of data outside the support.
+
+        Only valid if the distribution methods broadcast their shape
+        arguments.
         '''
-        #Nd = len(x)
-        np = len(theta)
-        # pab 07.01.2001: Always choose the stepsize h so that
-        # it is an exactly representable number.
-        # This is important when calculating numerical derivatives and is
-        #  accomplished by the following.
+        theta = asarray(theta, dtype=float)
+        loc, scale = theta[-2][:, newaxis], theta[-1][:, newaxis]
+        args = tuple(theta[:-2][:, :, newaxis])
+        a, b = self.a, self.b
+        try:
+            with np.errstate(all='ignore'):
+                isok = ravel(self._argcheck(*args) & (scale > 0))
+                z = (x - loc) / scale
+                valid = numpy.isfinite(x)
+                good = valid & (self.a < z) & (z < self.b)
+                Nbad = sum(valid & ~good, axis=-1)
+                Ngood = sum(good, axis=-1)
+                loginf = -log(floatinfo.machar.xmin)
+                logpdf = self._logpdf(where(good, z, 0.5), *args)
+                logpdf = where(good, logpdf.clip(min=-100 * loginf), 0)
+                T = (-sum(logpdf, axis=-1) + Ngood * log(theta[-1]) +
+                     Nbad * 100.0 * log(floatinfo.machar.xmax))
+        finally:
+            self.a, self.b = a, b
+        if return_nbad:
+            return where(isok, T, inf), Nbad
+        return where(isok, T, inf)
+
+    def _nlogps_vec(self, theta, x, return_nbad=False):
+        ''' Return nlogps(theta[:, j], x) for each column j of theta
+
+        theta : array of shape (numpar, m)
+            distribution parameters (including loc and scale).
+        x : array of shape (n,)
+            sorted data.
+        return_nbad : bool
+            if True also return the number of data outside the support and
+            spacings which are zero.
+
+        Only valid if the distribution methods broadcast their shape
+        arguments.
+        '''
+        theta = asarray(theta, dtype=float)
+        loc, scale = theta[-2][:, newaxis], theta[-1][:, newaxis]
+        args = tuple(theta[:-2][:, :, newaxis])
+        a, b = self.a, self.b
+        try:
+            with np.errstate(all='ignore'):
+                isok = ravel(self._argcheck(*args) & (scale > 0))
+                z = (x - loc) / scale
+                below = z <= self.a
+                above = self.b <= z
+                good = ~(below | above)
+                cdf = where(below, 0.0, where(above, 1.0, self._cdf(z, *args)))
+                m = len(cdf)
+                prb = numpy.hstack((zeros((m, 1)), cdf, ones((m, 1))))
+                logD = log(numpy.diff(prb, axis=-1))
+                tie = (z[:, 1:] == z[:, :-1]) & good[:, 1:] & good[:, :-1]
+                if any(tie):
+                    logpdf = log(self._pdf(z[:, :-1], *args)) - log(scale)
+                    logD[:, 1:-1] = where(tie, logpdf, logD[:, 1:-1])
+                finiteD = numpy.isfinite(logD)
+                Nbad = sum(~finiteD, axis=-1)
+                realmax = floatinfo.machar.xmax
+                T = (-sum(where(finiteD, logD, 0), axis=-1) +
+                     100.0 * log(realmax) * Nbad)
+        finally:
+            self.a, self.b = a, b
+        if return_nbad:
+            return where(isok, T, inf), Nbad
+        return where(isok, T, inf)
+
+    def _logpdf_derivatives(self, x, *args):
+        ''' Return derivatives of _logpdf(x, *args)
+
+        Returns a tuple (dx, dargs, dx2, dxdargs, dargs2) with the first
+        and second derivatives with respect to x and the shape parameters,
+        where dargs and dxdargs are lists with one item for each shape
+        parameter and dargs2 is a nested list, or None if no closed form
+        is implemented for the distribution.
+        '''
+        return None
+
+    def _loglike_derivatives(self, theta, x):
+        ''' Return gradient and hessian of log(pdf(x, theta)) for each x
 
+        Returns arrays of shape (numpar, n) and (numpar, numpar, n), or None
+        if the distribution has no closed form derivatives or if any x is
+        outside the support.
+        '''
+        theta = asarray(theta, dtype=float)
+        loc, scale = theta[-2], theta[-1]
+        args = tuple(theta[:-2])
+        if not self._argcheck(*args) or scale <= 0:
+            return None
+        z = asarray((x - loc) / scale)
+        if any((z <= self.a) | (self.b <= z)):
+            return None
+        derivatives = self._logpdf_derivatives(z, *args)
+        if derivatives is None:
+            return None
+        dz, dargs, dz2, dzdargs, dargs2 = derivatives
+        nargs = len(args)
+        np = nargs + 2
+        grad = zeros((np,) + z.shape)
+        H = zeros((np, np) + z.shape)
+        # chain rule for log(pdf(x)) = _logpdf(z) - log(scale),
+        # where z = (x - loc) / scale
+        for i in range(nargs):
+            grad[i] = dargs[i]
+            H[i, -2] = H[-2, i] = -dzdargs[i] / scale
+            H[i, -1] = H[-1, i] = -z * dzdargs[i] / scale
+            for j in range(nargs):
+                H[i, j] = dargs2[i][j]
+        grad[-2] = -dz / scale
+        grad[-1] = -(z * dz + 1) / scale
+        H[-2, -2] = dz2 / scale ** 2
+        H[-2, -1] = H[-1, -2] = (dz + z * dz2) / scale ** 2
+        H[-1, -1] = (2 * z * dz + z ** 2 * dz2 + 1) / scale ** 2
+        return grad, H
+
+    def _approx_gradient(self, fun, vecfun, theta, data, eps=None):
+        ''' Central difference approximation to the gradient of fun
+
+        All the perturbed parameters are evaluated in one call to vecfun if
+        it reproduces fun, otherwise fun is called for each of them.
+        '''
+        np = len(theta)
         if eps == None:
-            eps = (floatinfo.machar.eps) ** 0.4
-        #xmin = floatinfo.machar.xmin
-        #myfun = lambda y: max(y,100.0*log(xmin)) #% trick to avoid log of zero
+            eps = (floatinfo.machar.eps) ** (1. / 3)
         delta = (eps + 2.0) - 2.0
-        delta2 = delta ** 2.0
-        #    % Approximate 1/(nE( (d L(x|theta)/dtheta)^2)) with
-        #    %             1/(d^2 L(theta|x)/dtheta^2)
-        #    %  using central differences
-
-        LL = self.nlogps(theta, data)
-        H = zeros((np, np))   #%% Hessian matrix
-        theta = tuple(theta)
-        for ix in xrange(np):
-            sparam = list(theta)
-            sparam[ix] = theta[ix] + delta
-            fp = self.nlogps(sparam, data)
-            #fp = sum(myfun(x))
-
-            sparam[ix] = theta[ix] - delta
-            fm = self.nlogps(sparam, data)
-            #fm = sum(myfun(x))
-
-            H[ix, ix] = (fp - 2 * LL + fm) / delta2
-            for iy in range(ix + 1, np):
-                sparam[ix] = theta[ix] + delta
-                sparam[iy] = theta[iy] + delta
-                fpp = self.nlogps(sparam, data)
-                #fpp = sum(myfun(x))
-
-                sparam[iy] = theta[iy] - delta
-                fpm = self.nlogps(sparam, data)
-                #fpm = sum(myfun(x))
-
-                sparam[ix] = theta[ix] - delta
-                fmm = self.nlogps(sparam, data)
-                #fmm = sum(myfun(x));
-
-                sparam[iy] = theta[iy] + delta
-                fmp = self.nlogps(sparam, data)
-                #fmp = sum(myfun(x))
-                H[ix, iy] = ((fpp + fmm) - (fmp + fpm)) / (4. * delta2)
-                H[iy, ix] = H[ix, iy]
-                sparam[iy] = theta[iy];
-
-        # invert the Hessian matrix (i.e. invert the observed information number)
-        #pcov = -pinv(H);
-        return - H    
-    def hessian_nnlf(self, theta, data, eps=None):
-        ''' approximate hessian of nnlf where theta are the parameters (including loc and scale)
+        theta = asarray(theta, dtype=float)
+        steps = numpy.vstack((zeros(np), numpy.eye(np), -numpy.eye(np)))
+        thetas = theta + delta * steps
+        T = self._eval_vec(fun, vecfun, thetas, data)
+        return (T[1:np + 1] - T[np + 1:]) / (2.0 * delta)
+
+    def _approx_hessian(self, fun, vecfun, theta, data, eps=None):
+        ''' Central difference approximation to the hessian of -fun
         '''
-        #Nd = len(x)
         np = len(theta)
         # pab 07.01.2001: Always choose the stepsize h so that
         # it is an exactly representable number.
         # This is important when calculating numerical derivatives and is
         #  accomplished by the following.
-
         if eps == None:
             eps = (floatinfo.machar.eps) ** 0.4
-        #xmin = floatinfo.machar.xmin
-        #myfun = lambda y: max(y,100.0*log(xmin)) #% trick to avoid log of zero
         delta = (eps + 2.0) - 2.0
         delta2 = delta ** 2.0
         # Approximate 1/(nE( (d L(x|theta)/dtheta)^2)) with
         #              1/(d^2 L(theta|x)/dtheta^2)
         # using central differences
-
-        LL = self.nnlf(theta, data)
+        theta = asarray(theta, dtype=float)
+        eye = numpy.eye(np)
+        steps = [zeros(np)]
+        for ix in xrange(np):
+            steps.extend([eye[ix], -eye[ix]])
+        pairs = [(ix, iy) for ix in xrange(np) for iy in xrange(ix + 1, np)]
+        for ix, iy in pairs:
+            steps.extend([eye[ix] + eye[iy], eye[ix] - eye[iy],
+                          -eye[ix] - eye[iy], -eye[ix] + eye[iy]])
+        thetas = theta + delta * numpy.array(steps)
+        T = self._eval_vec(fun, vecfun, thetas, data)
+
+        LL = T[0]
         H = zeros((np, np))   #%% Hessian matrix
-        theta = tuple(theta)
         for ix in xrange(np):
-            sparam = list(theta)
-            sparam[ix] = theta[ix] + delta
-            fp = self.nnlf(sparam, data)
-            #fp = sum(myfun(x))
-
-            sparam[ix] = theta[ix] - delta
-            fm = self.nnlf(sparam, data)
-            #fm = sum(myfun(x))
-
+            fp, fm = T[1 + 2 * ix: 3 + 2 * ix]
             H[ix, ix] = (fp - 2 * LL + fm) / delta2
-            for iy in range(ix + 1, np):
-                sparam[ix] = theta[ix] + delta
-                sparam[iy] = theta[iy] + delta
-                fpp = self.nnlf(sparam, data)
-                #fpp = sum(myfun(x))
-
-                sparam[iy] = theta[iy] - delta
-                fpm = self.nnlf(sparam, data)
-                #fpm = sum(myfun(x))
-
-                sparam[ix] = theta[ix] - delta
-                fmm = self.nnlf(sparam, data)
-                #fmm = sum(myfun(x));
-
-                sparam[iy] = theta[iy] + delta
-                fmp = self.nnlf(sparam, data)
-                #fmp = sum(myfun(x))
-                H[ix, iy] = ((fpp + fmm) - (fmp + fpm)) / (4. * delta2)
-                H[iy, ix] = H[ix, iy]
-                sparam[iy] = theta[iy];
-
+        for k, (ix, iy) in enumerate(pairs):
+            fpp, fpm, fmm, fmp = T[1 + 2 * np + 4 * k: 5 + 2 * np + 4 * k]
+            H[ix, iy] = ((fpp + fmm) - (fmp + fpm)) / (4. * delta2)
+            H[iy, ix] = H[ix, iy]
         # invert the Hessian matrix (i.e. invert the observed information number)
         #pcov = -pinv(H);
         return - H
 
+    def _eval_vec(self, fun, vecfun, thetas, data):
+        ''' Return fun(theta, data) for each row of thetas
+
+        Uses one vectorized call to vecfun if it gives the same value as fun
+        for the first row. Rows with invalid parameters or data outside the
+        support are evaluated with fun.
+        '''
+        T0 = fun(tuple(thetas[0]), data)
+        try:
+            T, Nbad = vecfun(thetas.T, data, return_nbad=True)
+        except Exception:
+            T = None
+        if T is None or T[0] != T0:
+            return numpy.array([T0] + [fun(tuple(theta), data)
+                                       for theta in thetas[1:]])
+        for ix in nonzero((Nbad > 0) | ~numpy.isfinite(T)):
+            T[ix] = fun(tuple(thetas[ix]), data)
+        return T
+
+    def gradient_nnlf(self, theta, data, eps=None):
+        ''' Return gradient of nnlf where theta are the parameters (including loc and scale)
+
+        Closed form derivatives are used when the distribution implements
+        them, otherwise central differences.
+        '''
+        derivatives = self._loglike_derivatives(theta, data)
+        if derivatives is None:
+            return self._approx_gradient(self.nnlf, self._nnlf_vec, theta,
+                                         data, eps)
+        return -sum(derivatives[0], axis=-1)
+
+    def gradient_nlogps(self, theta, data, eps=None):
+        ''' Return approximate gradient of nlogps where theta are the parameters (including loc and scale)
+        '''
+        return self._approx_gradient(self.nlogps, self._nlogps_vec, theta,
+                                     data, eps)
+
+    def hessian_nlogps(self, theta, data, eps=None):
+        ''' approximate hessian of nlogps where theta are the parameters (including loc and scale)
+        '''
+        return self._approx_hessian(self.nlogps, self._nlogps_vec, theta,
+                                    data, eps)
+
+    def hessian_nnlf(self, theta, data, eps=None):
+        ''' hessian of nnlf where theta are the parameters (including loc and scale)
+
+        Closed form derivatives are used when the distribution implements
+        them, otherwise central differences.
+        '''
+        derivatives = self._loglike_derivatives(theta, data)
+        if derivatives is None:
+            return self._approx_hessian(self.nnlf, self._nnlf_vec, theta,
+                                        data, eps)
+        return sum(derivatives[1], axis=-1)
+
     # return starting point for fit (shape arguments + loc + scale)
     def _fitstart(self, data, args=None):
         if args is None:
@@ -3748,6 +3871,12 @@ class frechet_r_gen(rv_continuous):
         return c*pow(x,c-1)*exp(-pow(x,c))
     def _logpdf(self, x, c):
         return log(c) + (c-1)*log(x) - pow(x,c)
+    def _logpdf_derivatives(self, x, c):
+        logx = log(x)
+        xc = pow(x, c)
+        return ((c - 1 - c * xc) / x, [1.0 / c + logx - xc * logx],
+                -(c - 1) * (1 + c * xc) / x ** 2,
+                [(1 - xc - c * xc * logx) / x], [[-1.0 / c ** 2 - xc * logx ** 2]])
     def _cdf(self, x, c):
         return -expm1(-pow(x,c))
     def _ppf(self, q, c):
@@ -3866,6 +3995,22 @@ def log1pxdx(x):
 ##    y[x==inf] = 0.0
 ##    return y
 
+def _log1pxdx_derivatives(x):
+    '''Computes first and second derivative of Log(1+x)/x
+    '''
+    x = asarray(x)
+    small = abs(x) < 0.1
+    xs = where(small, 1.0, x)
+    d1 = (xs / (1 + xs) - log1p(xs)) / xs ** 2
+    d2 = -1.0 / (xs * (1 + xs) ** 2) - 2 * d1 / xs
+    # Taylor series around x=0 to avoid cancellation errors
+    k = arange(20.0)
+    c1 = (-1) ** (k + 1) * (k + 1) / (k + 2)
+    c2 = (-1) ** k * (k + 1) * (k + 2) / (k + 3)
+    d1 = where(small, polyval(c1[::-1], x), d1)
+    d2 = where(small, polyval(c2[::-1], x), d2)
+    return d1, d2
+
 ## Generalized Pareto
 class genpareto_gen(rv_continuous):
     """A generalized Pareto continuous random variable.
@@ -3964,55 +4109,12 @@ class genpareto_gen(rv_continuous):
         scale = m * ((m / s) ** 2 + 1) / 2
         return shape, loc, scale 
 
-    def hessian_nnlf(self, theta, x, eps=None):
-        try:
-            loc = theta[-2]
-            scale = theta[-1]
-            args = tuple(theta[:-2])
-        except IndexError:
-            raise ValueError, "Not enough input arguments."
-        if not self._argcheck(*args) or scale <= 0:
-            return inf
-        x = arr((x - loc) / scale)
-        cond0 = (x <= self.a) | (x >= self.b)
-        if any(cond0):
-            np = self.numargs + 2
-            return valarray((np, np), value=nan)
-        eps = floatinfo.machar.eps
-        c = args[0]
-        n = len(x)
-        if abs(c) > eps:
-            cx = c * x;
-            sumlog1pcx = sum(log1p(cx));
-            #LL = n*log(scale) + (1-1/k)*sumlog1mkxn
-            r = x / (1.0 + cx)
-            sumix = sum(1.0 / (1.0 + cx) ** 2.0)
-
-            sumr = sum(r)
-            sumr2 = sum(r ** 2.0)
-            H11 = -2 * sumlog1pcx / c ** 3 + 2 * sumr / c ** 2 + (1.0 + 1.0 / c) * sumr2
-            H22 = c * (c + 1) * sumix / scale ** 2.0
-            H33 = (n - 2 * (c + 1) * sumr + c * (c + 1) * sumr2) / scale ** 2.0;
-            H12 = -sum((1 - x) / ((1 + cx) ** 2.0)) / scale
-            H23 = -(c + 1) * sumix / scale ** 2.0
-            H13 = -(sumr - (c + 1) * sumr2) / scale;
-
-
-        else: # c == 0
-            sumx = sum(x);
-            #LL = n*log(scale) + sumx;
-
-            sumx2 = sum(x ** 2.0);
-            H11 = -(2 / 3) * sum(x ** 3.0) + sumx2
-            H22 = 0.0
-            H12 = -(n - sum(x)) / scale
-            H23 = -n * 1.0 / scale ** 2.0
-            H33 = (n - 2 * sumx) / scale ** 2.0
-            H13 = -(sumx - sumx2) / scale
-
-        #% Hessian matrix
-        H = [[H11, H12, H13], [H12, H22, H23], [H13, H23, H33]]
-        return asarray(H)
+    def _logpdf_derivatives(self, x, c):
+        cx = c * x
+        d1, d2 = _log1pxdx_derivatives(cx)
+        return (-(1 + c) / (1 + cx), [-x ** 2 * d1 - x / (1 + cx)],
+                c * (1 + c) / (1 + cx) ** 2, [-(1 - x) / (1 + cx) ** 2],
+                [[-x ** 3 * d2 + (x / (1 + cx)) ** 2]])
     def _stats(self, c):
         #return None,None,None,None
         k = -c
@@ -4150,6 +4252,18 @@ class genextreme_gen(rv_continuous):
         logpdf = where((cx==1) | (cx==-inf),-inf,-pex2+logpex2-logex2)
         putmask(logpdf,(c==1) & (x==1),0.0) # logpdf(c==1 & x==1) = 0; % 0^0 situation
         return logpdf
+    def _logpdf_derivatives(self, x, c):
+        # logpdf = -exp(u) + (1-c)*u where u = log(1-c*x)/c
+        q = 1.0 - c * x
+        d1, d2 = _log1pxdx_derivatives(-c * x)
+        u = -x * log1pxdx(-c * x)
+        e = exp(u)
+        uc = x ** 2 * d1
+        ucc = -x ** 3 * d2
+        return ((e - 1 + c) / q, [-u + (1 - c - e) * uc],
+                (c * (e - 1 + c) - e) / q ** 2,
+                [((1 + e * uc) * q + x * (e - 1 + c)) / q ** 2],
+                [[-uc - (1 + e * uc) * uc + (1 - c - e) * ucc]])
 
 
     def _cdf(self, x, c):
@@ -4262,6 +4376,9 @@ class gamma_gen(rv_continuous):
     def _logpdf(self, x, a):
         logx = where((a==1) & (x==0), 0, log(x))
         return (a-1)*logx - x - gamln(a)
+    def _logpdf_derivatives(self, x, a):
+        return ((a - 1) / x - 1, [log(x) - special.digamma(a)],
+                -(a - 1) / x ** 2, [1.0 / x], [[-special.polygamma(1, a)]])
     def _cdf(self, x, a):
         return special.gammainc(a, x)
     def _ppf(self, q, a):
@@ -4434,6 +4551,9 @@ class gumbel_r_gen(rv_continuous):
         return ex*exp(-ex)
     def _logpdf(self, x):
         return -x - exp(-x)
+    def _logpdf_derivatives(self, x):
+        ex = exp(-x)
+        return ex - 1, [], -ex, [], []
     def _cdf(self, x):
         return exp(-exp(-x))
     def _logcdf(self, x):
@@ -5116,6 +5236,11 @@ class lognorm_gen(rv_continuous):
         return exp(self._logpdf(x, s))
     def _logpdf(self, x, s):
         return -log(x)**2 / (2*s**2) + np.where(x==0 , 0, - log(s*x*sqrt(2*pi)))
+    def _logpdf_derivatives(self, x, s):
+        logx = log(x)
+        return (-(1 + logx / s ** 2) / x, [-1.0 / s + logx ** 2 / s ** 3],
+                (1 + (logx - 1) / s ** 2) / x ** 2, [2 * logx / (s ** 3 * x)],
+                [[1.0 / s ** 2 - 3 * logx ** 2 / s ** 4]])
     def _cdf(self, x, s):
         return norm.cdf(log(x)/s)
     def _ppf(self, q, s):
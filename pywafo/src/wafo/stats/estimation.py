@@ -7,9 +7,10 @@ Author:  Per A. Brodtkorb 2008
 '''
 
 from __future__ import division
+import inspect
 import warnings
 from wafo.plotbackend import plotbackend
-from wafo.misc import ecross, findcross
+from wafo.misc import ecross, findcross, parallel_map, Bunch
 
 
 import numdifftools  #@UnresolvedImport
@@ -26,7 +27,7 @@ from numpy import flatnonzero as nonzero
 
 
 __all__ = [
-           'Profile', 'FitDistribution'
+           'Profile', 'FitDistribution', 'fit_batch'
           ]
 
 floatinfo = np.finfo(float)
@@ -34,6 +35,18 @@ floatinfo = np.finfo(float)
 arr = asarray
 all = alltrue #@ReservedAssignment
 
+_PROFILE = {}
+
+def _init_profile(profile):
+    _PROFILE['profile'] = profile
+
+def _profile_task(task):
+    ''' Return result of Profile method and the (possibly corrected) Lmax
+    '''
+    name, args = task
+    profile = _PROFILE['profile']
+    return getattr(profile, name)(*args), profile.Lmax
+
 def chi2isf(p, df):
     return special.chdtri(df, p)
 
@@ -44,6 +57,54 @@ def norm_ppf(q):
     return special.ndtri(q)
 
 
+def _fit_start(dist, data, args, kwds):
+    ''' Return starting values for shape, location and scale parameters
+
+    Parameters not given in args or as loc and scale in kwds are found by
+    dist._fitstart(data).
+    '''
+    Narg = len(args)
+    if Narg > dist.numargs:
+            raise ValueError, "Too many input arguments."
+    start = [None]*2
+    if (Narg < dist.numargs) or not (kwds.has_key('loc') and
+                                     kwds.has_key('scale')):
+        start = dist._fitstart(data)  # get distribution specific starting locations
+        args += tuple(start[Narg:-2])
+    loc = kwds.get('loc', start[-2])
+    scale = kwds.get('scale', start[-1])
+    return args + (loc, scale)
+
+def _par_hessian(dist, method, par, data):
+    ''' Return hessian of the log-likelihood or log product spacing function
+
+    The closed form hessian of the log-likelihood is used for ML estimates if
+    the distribution implements it, otherwise the central difference
+    approximation of the hessian of the log product spacing function.
+    '''
+    if method.startswith('ml'):
+        derivatives = dist._loglike_derivatives(par, data)
+        if derivatives is not None:
+            return sum(derivatives[1], axis=-1)
+    return dist.hessian_nlogps(par, data)
+
+def _par_cov(H, i_notfixed):
+    ''' Return covariance of the parameters from the Hessian, H, of the
+        log-likelihood or log product spacing function.
+
+    The rows and columns of the fixed parameters are zero.
+    '''
+    numpar = len(H)
+    par_cov = zeros((numpar, numpar))
+    if len(i_notfixed) == 0:
+        return par_cov
+    try:
+        pcov = -pinv2(numpy.asarray(H)[i_notfixed, :][:, i_notfixed])
+        par_cov[numpy.ix_(i_notfixed, i_notfixed)] = pcov
+    except:
+        par_cov[:, :] = nan
+    return par_cov
+
 # Frozen RV class
 class rv_frozen(object):
     ''' Frozen continous or discrete 1D Random Variable object (RV)
@@ -153,6 +214,12 @@ class Profile(object):
                 3) x and logSF both are None then self.par[i] is profiled (default)
         alpha : real scalar 
             confidence coefficent (default 0.05)
+        num_workers : scalar integer
+            number of worker processes used to evaluate the lower and upper
+            branch of the profile, and to search for pmin and pmax, in
+            parallel (default 1). The profile is handed to the workers when
+            they are forked, so this requires a platform with fork if the
+            distribution is not picklable.
     Returns
     -------
     Lp : Profile log-likelihood function with parameters phat given
@@ -221,6 +288,7 @@ class Profile(object):
         self.i_fixed, self.N, self.alpha, self.pmin, self.pmax, self.x, self.logSF, self.link = map(kwds.get,
                             ['i', 'N', 'alpha', 'pmin', 'pmax', 'x', 'logSF', 'link'],
                             [i0, 100, 0.05, None, None, None, None, None])
+        self.num_workers = kwds.get('num_workers', 1)
 
         self.ylabel = '%g%s CI' % (100 * (1.0 - self.alpha), '%')
         if fit_dist.method.startswith('ml'):
@@ -299,19 +367,45 @@ class Profile(object):
         self._correct_Lmax(Lmax)
         return Lmax, phatfree
 
+    def _map(self, tasks):
+        ''' Return results of Profile methods, optionally in parallel
+
+        tasks is a list of (method name, arguments). Corrections of Lmax
+        found in the worker processes are applied to self.
+        '''
+        if self.num_workers > 1 and len(tasks) > 1:
+            num_workers = min(self.num_workers, len(tasks))
+            results = list(parallel_map(_profile_task, tasks, num_workers,
+                                        _init_profile, (self,)))
+            for _result, Lmax in results:
+                self._correct_Lmax(Lmax)
+            return [result for result, _Lmax in results]
+        return [getattr(self, name)(*args) for name, args in tasks]
+
+    def _profile_branch(self, phatfree0, pvec):
+        ''' Return profile function along pvec
+
+        Each optimization is started from the solution at the previous point
+        in pvec and the evaluation stops when the profile function is below
+        alpha_cross_level.
+        '''
+        data = numpy.ones_like(pvec) * nan
+        phatfree = phatfree0.copy()
+        for ix, p in enumerate(pvec):
+            Lmax, phatfree = self._profile_optimum(phatfree, p)
+            data[ix] = Lmax
+            if Lmax < self.alpha_cross_level: 
+                break
+        return data
+
     def _set_profile(self, phatfree0, p_opt):
         pvec = self._get_pvec(phatfree0, p_opt)
         
-        self.data = numpy.ones_like(pvec) * nan
         k1 = (pvec >= p_opt).argmax()
-        
-        for size, step in ((-1,-1), (pvec.size, 1)):
-            phatfree = phatfree0.copy()
-            for ix in xrange(k1, size, step):
-                Lmax, phatfree = self._profile_optimum(phatfree, pvec[ix])
-                self.data[ix] = Lmax
-                if self.data[ix] < self.alpha_cross_level: 
-                    break
+        # lower and upper branch starting from the optimum
+        lower, upper = self._map([('_profile_branch', (phatfree0, pvec[k1::-1])),
+                                  ('_profile_branch', (phatfree0, pvec[k1:]))])
+        self.data = numpy.hstack((lower[:0:-1], upper))
         np.putmask(pvec, np.isnan(self.data), nan)
         self.args = pvec
          
@@ -362,12 +456,17 @@ class Profile(object):
                 pvar = max(abs(p_opt)*0.5, 0.5)
                 
             p_crit = -norm_ppf(self.alpha / 2.0) * sqrt(numpy.ravel(pvar)) * 1.5
+            tasks = []
             if self.pmin == None:
-                self.pmin = self._search_pmin(phatfree0, p_opt - 5.0 * p_crit, p_opt)
-            p_crit_low = (p_opt-self.pmin)/5
-                
+                tasks.append(('_search_bound', (phatfree0, -5.0 * p_crit, p_opt)))
             if self.pmax == None:
-                self.pmax = self._search_pmax(phatfree0,p_opt + 5.0 * p_crit, p_opt)
+                tasks.append(('_search_bound', (phatfree0, 5.0 * p_crit, p_opt)))
+            bounds = self._map(tasks)
+            if self.pmin == None:
+                self.pmin = bounds.pop(0)
+            if self.pmax == None:
+                self.pmax = bounds.pop(0)
+            p_crit_low = (p_opt-self.pmin)/5
             p_crit_up = (self.pmax-p_opt)/5
             
             N4 = numpy.floor(self.N / 4.0)
@@ -381,52 +480,47 @@ class Profile(object):
             pvec = linspace(self.pmin, self.pmax, self.N)
         return pvec
     
-    def _search_pmin(self, phatfree0, p_min0, p_opt):
-        phatfree = phatfree0.copy()
-        
-        dp = p_opt-p_min0
-        if dp<1e-2:
-            dp = 0.1
-        p_min_opt = p_min0
-        Lmax, phatfree = self._profile_optimum(phatfree, p_opt)
+    def _search_bound(self, phatfree0, dp, p_opt):
+        ''' Return bound where the profile function is between
+            alpha_cross_level - 2 * alpha_Lrange and alpha_cross_level.
+
+        The search starts at p_opt + dp and moves away from p_opt (towards
+        p_opt if the profile function is NaN) until the level
+        alpha_cross_level - alpha_Lrange is bracketed, which is then crossed
+        by the root finder brentq. Each optimization is started from the
+        previous solution.
+        '''
+        level = self.alpha_cross_level - self.alpha_Lrange
+        warm = [phatfree0.copy()]
+        def fun(p):
+            Lmax, phatfree = self._profile_optimum(warm[0], p)
+            if np.all(np.isfinite(phatfree)):
+                warm[0] = phatfree
+            return Lmax - level
+
+        dp = float(dp)
+        p_opt = float(p_opt)
+        if abs(dp) < 1e-2:
+            dp = 0.1 * np.sign(dp)
+        p_in, p_out = p_opt, p_opt + dp  # fun(p_in) > 0
+        fun(p_opt)
         for _j in range(50):
-            p_min = p_opt - dp
-            Lmax, phatfree = self._profile_optimum(phatfree, p_min)
-            if np.isnan(Lmax):
-                dp *= 0.33
-            elif Lmax < self.alpha_cross_level-self.alpha_Lrange*2:
-                p_min_opt = p_min
-                dp *= 0.33
-            elif Lmax<self.alpha_cross_level:
-                p_min_opt = p_min
-                break
+            f_out = fun(p_out)
+            if np.isnan(f_out):
+                p_out = p_in + (p_out - p_in) * 0.33
+            elif f_out >= 0:
+                p_in, p_out = p_out, p_out + 2 * (p_out - p_in)
             else:
-                dp *= 1.67
-        return p_min_opt
-    
-    def _search_pmax(self, phatfree0, p_max0, p_opt):
-        phatfree = phatfree0.copy()
-        
-        dp = p_max0-p_opt
-        if dp<1e-2:
-            dp = 0.1
-        p_max_opt = p_max0
-        Lmax, phatfree = self._profile_optimum(phatfree, p_opt)
-        for _j in range(50):
-            p_max = p_opt + dp
-            Lmax, phatfree = self._profile_optimum(phatfree, p_max)
-            if np.isnan(Lmax):
-                dp *= 0.33
-            elif Lmax < self.alpha_cross_level-self.alpha_Lrange*2:
-                p_max_opt = p_max
-                dp *= 0.33
-            elif Lmax<self.alpha_cross_level:
-                p_max_opt = p_max
                 break
-            else:
-                dp *= 1.67
-        return p_max_opt
-            
+        else:
+            return p_out
+        if f_out >= -self.alpha_Lrange:
+            return p_out
+        try:
+            return optimize.brentq(fun, p_in, p_out, xtol=abs(p_out - p_in) * 1e-3)
+        except ValueError:
+            return p_out
+    
     def  _myinvfun(self, phatnotfixed):
         mphat = self._par.copy()
         mphat[self.i_notfixed] = phatnotfixed;
@@ -578,7 +672,9 @@ class FitDistribution(rv_frozen):
                      and starting position as the first two arguments,
                      plus args (for extra arguments to pass to the
                      function to be optimized) and disp=0 to suppress
-                     output as keyword arguments.
+                     output as keyword arguments. Gradient based optimizers
+                     (e.g. 'bfgs' or 'ncg') also get the gradient and
+                     hessian of the function as fprime and fhess.
     
     Return
     ------
@@ -693,8 +789,12 @@ class FitDistribution(rv_frozen):
         #self.method, self.alpha, self.par_fix, self.search, self.copydata = map(kwds.get, m_variables, m_defaults)
         if self.method.lower()[:].startswith('mps'):
             self._fitfun = dist.nlogps
+            self._gradfun = dist.gradient_nlogps
+            self._hessfun = dist.hessian_nlogps
         else:
             self._fitfun = dist.nnlf
+            self._gradfun = dist.gradient_nnlf
+            self._hessfun = dist.hessian_nnlf
         
         self.data = ravel(data)
         if self.copydata:
@@ -769,17 +869,7 @@ class FitDistribution(rv_frozen):
         dist = self.dist
         data = self.data
         
-        Narg = len(args)
-        if Narg > dist.numargs:
-                raise ValueError, "Too many input arguments."
-        start = [None]*2
-        if (Narg < dist.numargs) or not (kwds.has_key('loc') and
-                                         kwds.has_key('scale')):
-            start = dist._fitstart(data)  # get distribution specific starting locations
-            args += start[Narg:-2]
-        loc = kwds.get('loc', start[-2])
-        scale = kwds.get('scale', start[-1])
-        args += (loc, scale)
+        args = _fit_start(dist, data, args, kwds)
         x0, func, restore, args, fixedn = self._reduce_func(args, kwds)
         if self.search:
             optimizer = kwds.get('optimizer', optimize.fmin)
@@ -794,7 +884,8 @@ class FitDistribution(rv_frozen):
                 except AttributeError:
                     raise ValueError, "%s is not a valid optimizer" % optimizer
            
-            vals = optimizer(func,x0,args=(ravel(data),),disp=0)
+            opts = self._derivatives(optimizer, args, restore, fixedn)
+            vals = optimizer(func,x0,args=(ravel(data),),disp=0, **opts)
             vals = tuple(vals)
         else:
             vals = tuple(x0)
@@ -802,26 +893,40 @@ class FitDistribution(rv_frozen):
             vals = restore(args, vals)
         return vals, fixedn
     
+    def _derivatives(self, optimizer, args, restore, fixedn):
+        ''' Return gradient and hessian of the function to optimize
+
+        as keyword arguments fprime and fhess if the optimizer takes them.
+        '''
+        try:
+            argnames = inspect.getargspec(optimizer)[0]
+        except TypeError:
+            return {}
+        i_free = [n for n in range(len(args)) if n not in fixedn]
+        if restore is None:
+            restore = lambda args, theta: theta
+
+        def fprime(theta, x):
+            return self._gradfun(restore(args[:], theta), x)[i_free]
+
+        def fhess(theta, x):
+            H = -self._hessfun(restore(args[:], theta), x)
+            return H[i_free, :][:, i_free]
+        opts = dict(fprime=fprime, fhess=fhess)
+        return dict((name, opts[name]) for name in opts if name in argnames)
+
     def _compute_cov(self):
         '''Compute covariance
         '''
         somefixed = (self.par_fix != None) and any(isfinite(self.par_fix))
-        #H1 = numpy.asmatrix(self.dist.hessian_nnlf(self.par, self.data))
-        H = numpy.asmatrix(self.dist.hessian_nlogps(self.par, self.data))
+        H = numpy.asmatrix(_par_hessian(self.dist, self.method.lower(),
+                                        self.par, self.data))
         self.H = H
-        try:
-            if somefixed:
-                allfixed = all(isfinite(self.par_fix))
-                if allfixed:
-                    self.par_cov[:,:]=0
-                else:
-                    pcov = -pinv2(H[self.i_notfixed, :][..., self.i_notfixed])
-                    for row, ix in enumerate(list(self.i_notfixed)):
-                        self.par_cov[ix, self.i_notfixed] = pcov[row, :]
-            else:
-                self.par_cov = -pinv2(H)
-        except:
-            self.par_cov[:, :] = nan
+        if somefixed:
+            i_notfixed = self.i_notfixed
+        else:
+            i_notfixed = arange(len(self.par))
+        self.par_cov = _par_cov(H, i_notfixed)
             
     def fitfun(self, phat):
         return self._fitfun(phat, self.data)
@@ -856,6 +961,8 @@ class FitDistribution(rv_frozen):
                 3) x and logSF both are None then self.par[i] is profiled (default)
         alpha : real scalar 
             confidence coefficent (default 0.05)
+        num_workers : scalar integer
+            number of worker processes (default 1)
         Returns
         -------
         Lp : Profile log-likelihood function with parameters phat given
@@ -1103,6 +1210,268 @@ class FitDistribution(rv_frozen):
 
  
 
+def _fixed_par(numpar, kwds):
+    ''' Return dict with index and value of the fixed parameters
+    '''
+    names = ['f%d' % n for n in range(numpar - 2)] + ['floc', 'fscale']
+    return dict((n, kwds[key]) for n, key in enumerate(names) if key in kwds)
+
+def _pad_samples(samples):
+    ''' Return samples as rows of an array padded with NaNs
+    '''
+    x = numpy.empty((len(samples), max(len(sample) for sample in samples)))
+    x.fill(nan)
+    for j, sample in enumerate(samples):
+        x[j, :len(sample)] = sample
+    return x
+
+def _fmin_batch(func, x0, xtol=1e-4, ftol=1e-4, maxiter=None, maxfun=None):
+    ''' Minimize m functions with the Nelder-Mead simplex algorithm
+
+    Parameters
+    ----------
+    func : callable func(x, index)
+        returning the function values of problems index at the points
+        x[k], i.e., x.shape = (len(index), N).
+    x0 : array of shape (m, N)
+        initial guess of each problem.
+
+    This is the algorithm of scipy.optimize.fmin applied to all problems in
+    lockstep, so that each step evaluates func only once for all problems
+    still running.
+    '''
+    rho, chi, psi, sigma = 1, 2, 0.5, 0.5
+    x0 = numpy.atleast_2d(numpy.asarray(x0, dtype=float))
+    m, N = x0.shape
+    if maxiter is None:
+        maxiter = N * 200
+    if maxfun is None:
+        maxfun = N * 200
+    fcalls = numpy.zeros(m, dtype=int)
+    sim = numpy.empty((m, N + 1, N))
+    sim[:, 0] = x0
+    for k in range(N):
+        y = x0.copy()
+        y[:, k] = numpy.where(y[:, k] != 0, 1.05 * y[:, k], 0.00025)
+        sim[:, k + 1] = y
+    fsim = numpy.array([func(sim[:, k], arange(m))
+                        for k in range(N + 1)]).T
+    fcalls += N + 1
+
+    def sort_simplex(ix):
+        order = numpy.argsort(fsim[ix], axis=1, kind='mergesort')
+        sim[ix] = sim[ix[:, None], order]
+        fsim[ix] = fsim[ix[:, None], order]
+
+    def converged():
+        with np.errstate(invalid='ignore'):
+            dx = numpy.abs(sim[:, 1:] - sim[:, :1]).max(axis=2).max(axis=1)
+            df = numpy.abs(fsim[:, :1] - fsim[:, 1:]).max(axis=1)
+        return (dx <= xtol) & (df <= ftol)
+
+    sort_simplex(arange(m))
+    for _iteration in range(maxiter):
+        ix = nonzero(~converged() & (fcalls < maxfun))
+        if len(ix) == 0:
+            break
+        xbar = numpy.add.reduce(sim[ix, :-1], axis=1) / N
+        xworst = sim[ix, -1]
+        fworst = fsim[ix, -1]
+        xr = (1 + rho) * xbar - rho * xworst
+        fxr = func(xr, ix)
+        fcalls[ix] += 1
+        xnew, fnew = xr.copy(), fxr.copy()
+        shrink = numpy.zeros(len(ix), dtype=bool)
+
+        expand = fxr < fsim[ix, 0]
+        if any(expand):
+            k = nonzero(expand)
+            xe = (1 + rho * chi) * xbar[k] - rho * chi * xworst[k]
+            fxe = func(xe, ix[k])
+            fcalls[ix[k]] += 1
+            better = fxe < fxr[k]
+            xnew[k[better]] = xe[better]
+            fnew[k[better]] = fxe[better]
+
+        contract = ~expand & ~(fxr < fsim[ix, -2])
+        if any(contract):
+            k = nonzero(contract)
+            outside = fxr[k] < fworst[k]
+            # outside or inside contraction
+            c = numpy.where(outside, psi * rho, -psi)[:, None]
+            xc = (1 + c) * xbar[k] - c * xworst[k]
+            fxc = func(xc, ix[k])
+            fcalls[ix[k]] += 1
+            accept = numpy.where(outside, fxc <= fxr[k], fxc < fworst[k])
+            xnew[k[accept]] = xc[accept]
+            fnew[k[accept]] = fxc[accept]
+            shrink[k[~accept]] = True
+
+        keep = nonzero(~shrink)
+        sim[ix[keep], -1] = xnew[keep]
+        fsim[ix[keep], -1] = fnew[keep]
+        if any(shrink):
+            k = ix[shrink]
+            for j in range(1, N + 1):
+                sim[k, j] = sim[k, 0] + sigma * (sim[k, j] - sim[k, 0])
+                fsim[k, j] = func(sim[k, j], k)
+            fcalls[k] += N
+        sort_simplex(ix)
+    return sim[:, 0], fsim[:, 0]
+
+_BATCH = {}
+
+def _init_batch(batch):
+    _BATCH.update(batch)
+
+def _fit_batch_task(index):
+    ''' Return parameters, covariances, LLmax and LPSmax for the samples
+    '''
+    b = Bunch(**_BATCH)
+    dist, samples = b.dist, b.samples
+    i_free = b.i_free
+    theta0 = b.theta0[index]
+    par = theta0.copy()
+    if not b.search or len(i_free) == 0:
+        pass
+    elif b.vectorize:
+        x = _pad_samples([samples[i] for i in index])
+
+        def func(phat_free, ix):
+            theta = theta0[ix].copy()
+            theta[:, i_free] = phat_free
+            return dist._nnlf_vec(theta.T, x[ix])
+
+        par[:, i_free] = _fmin_batch(func, theta0[:, i_free])[0]
+    else:
+        fitfun = dist.nlogps if b.method.startswith('mps') else dist.nnlf
+        def func(phat_free, data, theta):
+            theta = theta.copy()
+            theta[i_free] = phat_free
+            return fitfun(theta, data)
+        for j, i in enumerate(index):
+            par[j, i_free] = b.optimizer(func, theta0[j, i_free],
+                                         args=(samples[i], theta0[j]), disp=0)
+    numpar = par.shape[1]
+    par_cov = numpy.empty((len(index), numpar, numpar))
+    LLmax = numpy.empty(len(index))
+    LPSmax = numpy.empty(len(index))
+    for j, i in enumerate(index):
+        H = _par_hessian(dist, b.method, par[j], samples[i])
+        par_cov[j] = _par_cov(H, i_free)
+        LLmax[j] = -dist.nnlf(par[j], samples[i])
+        LPSmax[j] = -dist.nlogps(par[j], samples[i])
+    return par, par_cov, LLmax, LPSmax
+
+def fit_batch(dist, samples, *args, **kwds):
+    '''
+    Return ML or MPS estimates of distribution parameters for many samples
+
+    Parameters
+    ----------
+    dist : scipy distribution object
+        distribution to fit to the samples
+    samples : 2D array or sequence of array-like
+        the samples, one per row, possibly of different lengths.
+    args, kwds :
+        starting values and fixed parameters as in FitDistribution. The
+        same values are used for all samples. In addition
+        method : 'ml' or 'mps'
+            method of estimation (default 'ml').
+        search : bool
+            If true search for best estimator (default), otherwise return
+            the initial distribution parameters.
+        optimizer : callable or string
+            optimizer used for each sample if the objective function is
+            not vectorized (default optimize.fmin).
+        vectorize : bool
+            If true (default), the ML objective function is evaluated for
+            all samples in one call and the samples are fitted together with
+            a lockstep Nelder-Mead simplex search. This requires that the
+            distribution methods broadcast the shape parameters, which is
+            checked at the starting values. Otherwise the samples are fitted
+            one at a time.
+        num_workers : scalar integer
+            number of worker processes the samples are distributed over
+            (default 1). The samples and distribution are handed to the
+            workers when they are forked.
+
+    Returns
+    -------
+    phat : Bunch object with member variables
+        par : array of shape (m, numpar)
+            distribution parameters (fixed and fitted) of each sample
+        par_cov : array of shape (m, numpar, numpar)
+            covariance of the distribution parameters
+        par_fix : list
+            fixed distribution parameters (nan if not fixed) or None
+        LLmax, LPSmax : arrays of shape (m,)
+            log likelihood and log product spacing function evaluated at par
+        method, nobs : method of estimation and number of data in each
+            sample, respectively.
+
+    Example
+    -------
+    >>> import wafo.stats as ws
+    >>> samples = [ws.genpareto.rvs(0.1, size=n) for n in (50, 80, 120)]
+    >>> phat = fit_batch(ws.genpareto, samples, floc=0)
+    >>> phat.par.shape, phat.par_cov.shape
+    ((3, 3), (3, 3, 3))
+    >>> phat1 = FitDistribution(ws.genpareto, samples[1], floc=0)
+    >>> np.allclose(phat.par[1], phat1.par, rtol=1e-3)
+    True
+
+    See also
+    --------
+    FitDistribution
+    '''
+    method = kwds.get('method', 'ml').lower()
+    search = kwds.get('search', True)
+    num_workers = kwds.get('num_workers', 1)
+    optimizer = kwds.get('optimizer', optimize.fmin)
+    if not callable(optimizer):
+        optimizer = getattr(optimize, optimizer if optimizer.startswith('fmin')
+                            else 'fmin_' + optimizer)
+
+    samples = [numpy.sort(ravel(sample)) for sample in samples]
+    numpar = dist.numargs + 2
+    fixed = _fixed_par(numpar, kwds)
+    if len(fixed) == numpar:
+        raise ValueError, "All parameters fixed. There is nothing to optimize."
+    theta0 = numpy.array([_fit_start(dist, sample.copy(), args, kwds)
+                          for sample in samples], dtype=float)
+    for n, val in fixed.items():
+        theta0[:, n] = val
+    i_free = nonzero(numpy.array([n not in fixed for n in range(numpar)]))
+
+    vectorize = (kwds.get('vectorize', True) and method.startswith('ml')
+                 and search and len(samples) > 1)
+    if vectorize:
+        # check that the distribution broadcasts its shape parameters
+        try:
+            T = dist._nnlf_vec(theta0.T, _pad_samples(samples))
+            T0 = numpy.array([dist.nnlf(theta, sample)
+                              for theta, sample in zip(theta0, samples)])
+            vectorize = numpy.allclose(T, T0, rtol=1e-10, equal_nan=True)
+        except Exception:
+            vectorize = False
+
+    batch = dict(dist=dist, samples=samples, theta0=theta0, i_free=i_free,
+                 method=method, search=search, vectorize=vectorize,
+                 optimizer=optimizer)
+    m = len(samples)
+    chunks = numpy.array_split(arange(m), max(min(num_workers, m), 1))
+    results = list(parallel_map(_fit_batch_task, chunks, num_workers,
+                                _init_batch, (batch,)))
+    _BATCH.clear()
+    par, par_cov, LLmax, LPSmax = [numpy.concatenate(r) for r in zip(*results)]
+    par_fix = None
+    if fixed:
+        par_fix = [fixed.get(n, nan) for n in range(numpar)]
+    return Bunch(par=par, par_cov=par_cov, par_fix=par_fix, LLmax=LLmax,
+                 LPSmax=LPSmax, method=method,
+                 nobs=numpy.array([len(sample) for sample in samples]))
+
 def test_doctstrings():
     import doctest
     doctest.testmod()
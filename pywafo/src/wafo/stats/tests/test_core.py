@@ -0,0 +1,81 @@
+# -*- coding:utf-8 -*-
+""" Test functions for the wafo.stats.core module
+
+"""
+from __future__ import division
+import numpy as np
+from numpy.testing import assert_array_almost_equal
+from wafo.stats.core import (dispersion_idx, reslife, ExceedanceIndex,
+                             findpot, decluster)
+
+
+def test_block_exceedances():
+    np.random.seed(1)
+    data = np.round(np.random.gumbel(size=500), 1)
+    blocks = np.random.randint(0, 7, size=500)
+    u = np.linspace(-2, 5, 30)
+    num, num2 = ExceedanceIndex(data).block_exceedances(blocks, u, 7)
+    for ix, tresh in enumerate(u):
+        occ = np.bincount(blocks[data > tresh], minlength=7)
+        assert num[ix] == occ.sum()
+        assert num2[ix] == (occ ** 2).sum()
+
+
+def test_dispersion_idx():
+    np.random.seed(2)
+    data = np.random.gumbel(size=1000)
+    t = np.arange(1000.)
+    di, u, ok_u = dispersion_idx(data, t, tb=50, nu=20)
+    t1 = np.floor(t / 50).astype(int)
+    true_di = []
+    for tresh in di.args:
+        excess = data > tresh
+        occ = np.bincount(t1[excess], minlength=20)
+        true_di.append(occ.var() / (excess.sum() / 20))
+    assert_array_almost_equal(di.data, true_di)
+
+
+def test_excess_stats():
+    np.random.seed(3)
+    data = np.round(np.random.gumbel(3, 2, size=300), 1) + 100
+    u = np.linspace(95, 115, 41)
+    mrl, srl, num = ExceedanceIndex(data).excess_stats(u)
+    for ix, tresh in enumerate(u):
+        excess = data[data > tresh] - tresh
+        assert num[ix] == excess.size
+        if excess.size:
+            assert_array_almost_equal([mrl[ix], srl[ix]],
+                                      [excess.mean(), excess.std()])
+        else:
+            assert np.isnan(mrl[ix]) and np.isnan(srl[ix])
+
+
+def _findpot_brute(data, t, thresh, tmin):
+    # accept peaks in descending order unless an accepted peak is too close
+    ie, = np.nonzero(data > thresh)
+    accepted = []
+    for i in ie[np.argsort(-data[ie], kind='mergesort')]:
+        if all(abs(t[i] - t[j]) > tmin for j in accepted):
+            accepted.append(i)
+    return np.sort(accepted)
+
+
+def test_findpot():
+    np.random.seed(5)
+    for data in [np.random.randn(400), np.random.randint(0, 6, 400) * 1.]:
+        t = np.sort(np.random.rand(400)) * 100
+        for tmin in [0.1, 0.5, 3]:
+            ie = findpot(data, t, 0.5, tmin)
+            assert np.all(ie == _findpot_brute(data, t, 0.5, tmin))
+            ye, te = decluster(data, t, 0.5, tmin)
+            assert np.all(ye == data[ie]) and np.all(te == t[ie])
+
+
+def test_reslife_index():
+    np.random.seed(4)
+    data = np.random.gumbel(size=500)
+    index = ExceedanceIndex(data)
+    mrl = reslife(data, nu=20)
+    mrl2 = reslife(index, nu=20)
+    assert_array_almost_equal(mrl.data, mrl2.data)
+    assert_array_almost_equal(mrl.args, mrl2.args)
@@ -841,5 +841,42 @@ def test_regression_ticket_1421():
     assert_('pmf(x,' in stats.poisson.__doc__)
 
 
+def test_loglike_derivatives():
+    np.random.seed(1234)
+    cases = [('genpareto', (0.2,)), ('genpareto', (-0.2,)), ('genpareto', (0.0,)),
+             ('genextreme', (0.2,)), ('genextreme', (-0.2,)),
+             ('genextreme', (0.0,)), ('weibull_min', (1.5,)),
+             ('gumbel_r', ()), ('lognorm', (0.6,)), ('gamma', (2.5,))]
+    for name, args in cases:
+        dist = getattr(stats, name)
+        x = np.sort(dist.rvs(*args, loc=1, scale=2, size=100))
+        theta = np.array(args + (0.9, 2.1))
+        if np.isfinite(dist.a):
+            theta[-2] = x.min() - 0.1
+        assert_(dist._loglike_derivatives(theta, x) is not None)
+        grad = dist._approx_gradient(dist.nnlf, dist._nnlf_vec, theta, x)
+        H = dist._approx_hessian(dist.nnlf, dist._nnlf_vec, theta, x)
+        assert_allclose(dist.gradient_nnlf(theta, x), grad, rtol=1e-6,
+                        atol=1e-6 * np.abs(grad).max())
+        assert_allclose(dist.hessian_nnlf(theta, x), H, rtol=1e-2,
+                        atol=1e-2 * np.abs(H).max())
+
+        thetas = np.array([theta, theta * 1.1, theta * 0.9]).T
+        assert_allclose(dist._nnlf_vec(thetas, x),
+                        [dist.nnlf(t, x) for t in thetas.T])
+        assert_allclose(dist._nlogps_vec(thetas, x),
+                        [dist.nlogps(t, x) for t in thetas.T])
+
+        # perturbations crossing the support boundary are evaluated by the
+        # scalar functions
+        if np.isfinite(dist.a):
+            theta[-2] = x.min() - 1e-7
+            for fun, vecfun in [(dist.nnlf, dist._nnlf_vec),
+                                (dist.nlogps, dist._nlogps_vec)]:
+                assert_array_equal(
+                    dist._approx_hessian(fun, vecfun, theta, x),
+                    dist._approx_hessian(fun, None, theta, x))
+
+
 if __name__ == "__main__":
     run_module_suite()
@@ -4,9 +4,10 @@ Created on 19. nov. 2010
 
 @author: pab
 """
+import numpy as np
 from numpy import array, log
 import wafo.stats as ws
-from wafo.stats.estimation import FitDistribution, Profile
+from wafo.stats.estimation import FitDistribution, Profile, fit_batch
 def test_profile():
     '''
     # MLE 
@@ -24,7 +25,7 @@ def test_profile():
     # Better CI for phat.par[i=0]
     >>> Lp = Profile(phat, i=0)
     >>> Lp.get_bounds(alpha=0.1)
-    array([ 1.00225064,  1.8159036 ])
+    array([ 1.00190949,  1.81593261])
     
     >>> SF = 1./990
     >>> x = phat.isf(SF)
@@ -34,15 +35,50 @@ def test_profile():
     # CI for x
     >>> Lx = phat.profile(i=0, x=x, link=phat.dist.link)
     >>> Lx.get_bounds(alpha=0.2)
-    array([ 2.52211661,  4.98664787])
+    array([ 2.52041485,  4.98658505])
     
     # CI for logSF=log(SF)
     >>> logSF = log(SF)
     >>> Lsf = phat.profile(i=0, logSF=logSF, link=phat.dist.link, pmin=logSF-10,pmax=logSF+5)
     >>> Lsf.get_bounds(alpha=0.2)
-    array([-10.87488318,  -4.36225468])
+    array([-10.87488312,  -4.3622547 ])
+
+    # The profile branches and bound searches can be evaluated in parallel
+    >>> Lp2 = Profile(phat, i=0, num_workers=2)
+    >>> Lp2.get_bounds(alpha=0.1)
+    array([ 1.00190949,  1.81593261])
     '''
 
+def test_fit_batch():
+    np.random.seed(1)
+    samples = [ws.genextreme.rvs(-0.1, loc=2, size=n) for n in (40, 75, 130)]
+    for kwds in [dict(), dict(vectorize=False), dict(num_workers=2),
+                 dict(method='mps')]:
+        phat = fit_batch(ws.genextreme, samples, **kwds)
+        for j, sample in enumerate(samples):
+            phat1 = FitDistribution(ws.genextreme, sample,
+                                    method=kwds.get('method', 'ml'))
+            assert np.allclose(phat.par[j], phat1.par)
+            assert np.allclose(phat.par_cov[j], phat1.par_cov)
+            assert np.allclose(phat.LLmax[j], phat1.LLmax)
+            assert np.allclose(phat.LPSmax[j], phat1.LPSmax)
+    phat = fit_batch(ws.genpareto, samples, floc=0)
+    assert np.all(phat.par[:, 1] == 0) and np.all(phat.par_cov[:, 1] == 0)
+    assert phat.par_fix[1] == 0
+def test_fit_gradient():
+    np.random.seed(1)
+    for dist, args in [(ws.genextreme, (-0.1,)), (ws.weibull_min, (1.5,))]:
+        R = dist.rvs(*args, size=300)
+        phat = FitDistribution(dist, R)
+        for optimizer in ['bfgs', 'ncg']:
+            phat1 = FitDistribution(dist, R, optimizer=optimizer)
+            assert np.allclose(phat1.par, phat.par, rtol=1e-3, atol=1e-3)
+            assert phat1.LLmax >= phat.LLmax - 1e-6
+        phat1 = FitDistribution(dist, R, method='mps', optimizer='bfgs')
+        phat = FitDistribution(dist, R, method='mps')
+        assert np.allclose(phat1.par, phat.par, rtol=1e-3, atol=1e-3)
+
+
 if __name__ == '__main__':
     import doctest
     doctest.testmod()
\ No newline at end of file
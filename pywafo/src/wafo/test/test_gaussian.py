@@ -66,6 +66,30 @@ def test_rind():
     array([ 0.00013838])
     array([  1.00000000e-10])
     '''
+def test_rind_map():
+    '''
+    >>> n = 5
+    >>> Sc = (np.ones((n, n)) - np.eye(n)) * 0.3 + np.eye(n)
+    >>> rind = Rind(seed=10)
+    >>> problems = [(Sc[:k, :k], np.zeros(k), -inf, -1.2, [-1, k - 1])
+    ...             for k in range(2, n + 1)]
+    >>> res = rind.map(problems)
+    >>> res2 = rind.map(problems, num_workers=2)
+    >>> np.allclose([r[0] for r in res], [r[0] for r in res2])
+    True
+    >>> np.abs(res[-1][0] - 0.001946) < 3 * res[-1][1] + 1e-5
+    array([ True], dtype=bool)
+
+    The results do not depend on the number of workers
+    >>> n = 12
+    >>> Sc = (np.ones((n, n)) - np.eye(n)) * 0.3 + np.eye(n)
+    >>> problems = [(Sc[:k, :k], np.zeros(k), -inf, -1.2, [-1, k - 1])
+    ...             for k in range(2, n + 1)]
+    >>> val = [r[0] for r in rind.map(problems)]
+    >>> val2 = [r[0] for r in rind.map(problems, num_workers=2)]
+    >>> np.all(np.array(val) == np.array(val2))
+    True
+    '''
 def test_prbnormtndpc():
     '''
     >>> rho2 = np.random.rand(2); 
@@ -227,6 +227,43 @@ def test_smooth_params():
     
    
     '''
+def test_hscv_binned():
+    np.random.seed(1)
+    data = np.random.rayleigh(1, size=(2, 500))
+    gauss = wk.Kernel('gaussian')
+    h_binned = gauss.hscv(data)
+    h_exact = gauss.hscv(data, exact=True)
+    assert(np.allclose(h_binned, h_exact, rtol=1e-2))
+
+def test_eval_points_support():
+    np.random.seed(1)
+    data = np.random.rayleigh(1, size=(2, 500))
+    x = np.random.rayleigh(1, size=(2, 300))
+    for name in ['epanechnikov', 'p1epanechnikov', 'gaussian']:
+        for alpha in [0, 0.5]:
+            kde = wk.KDE(data, kernel=wk.Kernel(name), alpha=alpha)
+            f0 = kde.eval_points(x)
+            f1 = kde.eval_points(x, method='support', tol=1e-12)
+            assert(np.allclose(f0, f1, atol=1e-10))
+            f2 = kde.eval_points(x, blocksize=100)
+            assert(np.allclose(f0, f2))
+    f3 = kde.eval_points(np.zeros((2, 0)), method='support')
+    assert(f3.shape == (0,))
+    assert(list(wk._cell_neighbours(data, np.zeros((2, 0)), 1.0)) == [])
+    assert(list(wk._cell_neighbours(np.zeros((2, 0)), x, 1.0)) == [])
+
+def test_gridcount_chunks():
+    np.random.seed(1)
+    data = np.random.rayleigh(1, size=(3, 1000))
+    y = np.random.rand(1000)
+    X = np.vstack([np.linspace(0, 6, 11)] * 3)
+    c = wk.gridcount(data, X, y=y)
+    c1 = wk.gridcount(data, X, y=y, chunksize=99)
+    assert(np.allclose(c, c1))
+    assert(np.allclose(c.sum(), y.sum()))
+    c2 = wk.gridcount(data[:2], X[:2], y=2)
+    assert(np.allclose(c2.sum(), 2 * 1000))
+
 def test_gridcount_1D():
     '''
     N = 20
@@ -6,6 +6,7 @@ from wafo.misc import (JITImport, Bunch, detrendma, DotDict, findcross, ecross,
                        findrfc, rfcfilter, findtp, findtc, findoutliers,  #@UnusedImport
                        common_shape, argsreduce, stirlerr, getshipchar, betaloge,  #@UnusedImport
                        gravity, nextpow2, discretize,  polar2cart,  #@UnusedImport
+                       parallel_map,  #@UnusedImport
                        cart2polar, meshgrid, tranproc)#@UnusedImport
 
 def test_JITImport():
@@ -198,6 +199,15 @@ def test_findrfc():
             1.07849396, -1.0995006 ,  1.08094452])
     '''
     
+def test_findrfc_methods():
+    # first is a max, i.e., the indices must be shifted by one
+    tp = np.array([6., 0., 5., 1., 3., 2., 4., 3.])
+    for y in [tp, tp[1:], tp[:-1], tp[1:-1]]:
+        ind = findrfc(y, 0)
+        ind1 = findrfc(y, 0, method='python')
+        assert(np.all(ind == ind1))
+    assert(np.all(findrfc(tp, 0) == [1, 2, 3, 4, 5, 6]))
+
 def test_rfcfilter():
     '''
      # 1. Filtered signal y is the turning points of x. 
@@ -261,6 +271,18 @@ def test_findtc():
            112, 127, 137, 143, 154, 166, 180, 185])
     '''
     
+def test_findtc_segments():
+    x = sea()[:, 1]
+    for kind in [None, 'dw', 'uw', 'tw', 'cw']:
+        itc, iv = findtc(x, 0, kind)
+        for i, ix in enumerate(itc):
+            xi = x[iv[i] + 1:iv[i + 1] + 1]
+            is_trough = x[iv[i]] > x[iv[i] + 1]
+            assert(x[ix] == (xi.min() if is_trough else xi.max()))
+    # the last trough is on the sample before the last crossing
+    itc, iv = findtc(np.array([1., -1, 1, -1, 0.5, -0.5, 1]), 0, 'tw')
+    assert(np.all(itc == [1, 2, 3, 4, 5]))
+
 def test_findoutliers():
     '''
     >>> xx = sea()
@@ -364,6 +386,12 @@ def test_nextpow2():
     3
     '''
 
+def test_parallel_map():
+    '''
+    >>> list(parallel_map(abs, [-1, 2, -3], num_workers=2))
+    [1, 2, 3]
+    '''
+
 def test_discretize():
     '''
     >>> x, y = discretize(np.cos,0,np.pi)
@@ -29,6 +29,201 @@ def test_timeseries():
     array([ 0.22368637,  0.20838473,  0.17110733,  0.12237803,  0.07024054,
             0.02064859, -0.02218831, -0.0555993 , -0.07859847, -0.09166187])
     '''
+def test_timeseries_pickle():
+    import pickle
+    import wafo.objects as wo
+    ts = wo.mat2timeseries(wafo.data.sea()[:100])
+    ts2 = pickle.loads(pickle.dumps(ts, pickle.HIGHEST_PROTOCOL))
+    assert(np.all(ts2.data == ts.data))
+    assert(np.all(ts2.args == ts.args))
+    assert(ts2.plotter.plotbackend is ts.plotter.plotbackend)
+
+def test_tocovdata_blocks():
+    import os
+    import tempfile
+    import wafo.objects as wo
+    x = wafo.data.sea()
+    x[100:200, 1] = np.nan
+    ts = wo.mat2timeseries(x)
+    acf = ts.tocovdata(lag=150) # computed blockwise
+    acf1 = ts.tocovdata(lag=2000) # computed by full FFT
+    assert(np.allclose(acf.data, acf1.data[:151]))
+    assert(np.allclose(acf.sigma[:151], acf1.sigma[:151]))
+
+    fid, name = tempfile.mkstemp()
+    y = np.memmap(name, dtype=float, mode='w+', shape=(len(x),))
+    y[:] = x[:, 1]
+    ts2 = wo.TimeSeries(y, x[:, 0])
+    acf2 = ts2.tocovdata(lag=150)
+    assert(np.allclose(acf.data, acf2.data))
+    del y, ts2
+    os.close(fid)
+    os.remove(name)
+
+def test_welchspectrum():
+    from matplotlib.mlab import psd, detrend_mean
+    import wafo.objects as wo
+    x = wafo.data.sea()
+    dt = x[1, 0] - x[0, 0]
+    est = wo.WelchSpectrum(nfft=256, dt=dt)
+    for ix in range(0, len(x), 1000):
+        est.update(x[ix:ix + 1000, 1])
+    S = est.tospecdata()
+    P, unused_f = psd(x[:, 1], NFFT=256, Fs=1. / dt, detrend=detrend_mean,
+                      window=np.hanning(256), noverlap=128, scale_by_freq=True)
+    assert(np.allclose(S.data, P / (2 * np.pi)))
+
+    est1 = wo.WelchSpectrum(nfft=256, dt=dt).update(x[:5000, 1])
+    est2 = wo.WelchSpectrum(nfft=256, dt=dt).update(x[5000:, 1])
+    est1.merge(est2)
+    assert(est1.num_segments == est.num_segments - 1)
+
+def test_rainflowcounter():
+    import wafo.misc as wm
+    import wafo.objects as wo
+    x = wafo.data.sea()[:, 1]
+    tp = x[wm.findtp(x)]
+    for h in [0, 0.3]:
+        rfc = wo.RainflowCounter(h)
+        for ix in range(0, len(tp), 333):
+            rfc.update(tp[ix:ix + 333])
+        assert(np.all(rfc.indices() == wm.findrfc(tp, h)))
+        assert(np.allclose(rfc.cycle_astm(), wm.findrfc_astm(tp)))
+    # the load is reduced to turning points
+    rfc = wo.RainflowCounter(0.3)
+    for ix in range(0, len(x), 1000):
+        rfc.update(x[ix:ix + 1000])
+    assert(np.all(rfc.indices() == wm.findtp(x, 0.3)))
+    mM = rfc.cycle_pairs()
+    assert(np.all(mM.data >= mM.args + 0.3))
+
+def test_cyclematrix():
+    import os
+    import tempfile
+    import wafo.objects as wo
+    ts = wo.mat2timeseries(wafo.data.sea())
+    mM = ts.turning_points().cycle_pairs()
+    F = wo.CycleMatrix([-3, 3, 61], kind='min2max').update(mM)
+    assert(F.data.sum() == len(mM.data))
+
+    # same as for the cycles rounded to the levels
+    u = F.levels
+    mMu = wo.CyclePairs(u[F._index(mM.data)], u[F._index(mM.args)],
+                        time=mM.time)
+    assert(np.allclose(F.damage([3, 4.5]), mMu.damage([3, 4.5])))
+    lc, lc1 = F.level_crossings(), mMu.level_crossings()
+    assert(np.allclose(lc.args, lc1.args))
+    assert(np.allclose(lc.data, lc1.data))
+
+    x = ts.data.ravel()
+    rfc = wo.RainflowCounter()
+    F1 = wo.CycleMatrix([-3, 3, 61])
+    for ix in range(0, len(x), 1000):
+        F1.update(rfc.update(x[ix:ix + 1000]).pop_cycles())
+    F1.update(rfc.cycle_pairs())
+    F2 = wo.CycleMatrix([-3, 3, 61]).update(wo.RainflowCounter().update(x).cycle_pairs())
+    assert(np.all(F1.data == F2.data))
+
+    F3 = wo.CycleMatrix([-3, 3, 61], kind='min2max')
+    F3.update(mM.args[:500], mM.data[:500])
+    F3.merge(wo.CycleMatrix([-3, 3, 61]).update(mM.args[500:], mM.data[500:]))
+    assert(np.all(F3.data == F.data))
+
+    fid, name = tempfile.mkstemp(suffix='.npz')
+    os.close(fid)
+    F1.save(name)
+    F4 = wo.CycleMatrix.load(name)
+    os.remove(name)
+    assert(np.all(F4.data == F1.data))
+    assert(F4.kind == 'rainflow' and F4.time == F1.time)
+
+def test_trdatahistogram():
+    import wafo.objects as wo
+    x = wafo.data.sea()[:, 1]
+    levels = np.linspace(-2, 2, 101)
+    est = wo.TrDataHistogram(levels)
+    for ix in range(0, len(x), 1000):
+        est.update(x[ix:ix + 1000])
+    crossings = [((x[:-1] < u) & (u < x[1:])).sum() for u in levels]
+    assert((est.crossings == crossings).all())
+    assert(est.counts.sum() == len(x))
+    assert(np.allclose([est.mean(), est.std()], [x.mean(), x.std()]))
+
+    tp = wo.mat2timeseries(wafo.data.sea()).turning_points().data
+    assert(np.allclose(est._extremes[0], np.sort(tp)[:8]))
+    assert(np.allclose(est._extremes[1], np.sort(tp)[-8:]))
+
+    est1 = wo.TrDataHistogram(levels).update(x[:5000])
+    est1.merge(wo.TrDataHistogram(levels).update(x[5000:]))
+    assert((est1.crossings == est.crossings).all())
+    assert((est1.counts == est.counts).all())
+    assert(np.allclose(est1.std(), est.std()))
+
+def test_timeseries_trdata_stream():
+    import wafo.spectrum.models as sm
+    import wafo.objects as wo
+    S = sm.Jonswap(Hm0=7).tospecdata()
+    ts = wo.mat2timeseries(S.sim(ns=2**15, iseed=10))
+    for method in ['nonlinear', 'mnonlinear']:
+        g0 = ts.trdata(method=method)[0]
+        g1 = ts.trdata(method=method, stream=True, blocksize=1000)[0]
+        assert(np.abs(g0.dist2gauss() - g1.dist2gauss()) < 0.1)
+        assert(np.abs(g0.data - g1.data).max() < 0.1)
+
+def test_wave_parameters_batch():
+    import wafo.objects as wo
+    x = wafo.data.sea()
+    records = [wo.mat2timeseries(x[:5000]), x[5000:, 1]]
+    wp = wo.wave_parameters_batch(records, dt=0.25)
+    wp2 = wo.wave_parameters_batch(records, dt=0.25, num_workers=2)
+    for name in wp:
+        assert(np.allclose(wp[name], wp2[name]))
+    for ix, x_i in enumerate([x[:5000], x[5000:]]):
+        wp_i = wo.mat2timeseries(x_i).wave_parameters()
+        k = wp['record'] == ix
+        for name in ['Ac', 'Hu', 'Hd', 'Tu', 'Td', 'Tcf', 'Tcb']:
+            assert(np.allclose(wp[name][k], wp_i[name]))
+        assert(np.allclose(wp['Hs'][ix], 4 * x_i[:, 1].std()))
+        assert(np.allclose(wp['Tz'][ix], wp_i['Tu'].mean()))
+
+def test_wave_periods_turning_points():
+    import wafo.objects as wo
+    from wafo.misc import findtc
+    x = wafo.data.sea()[5:2005]  # starts with a trough
+    ts = wo.mat2timeseries(x)
+    tc_ind = findtc(x[:, 1], 0.0, None)[0]
+    t_tc = x[tc_ind, 0]
+    T, index = ts.wave_periods(vh=0.0, pdef='c2c')
+    assert(np.all(index == tc_ind))
+    assert(np.allclose(T, np.diff(t_tc[1::2])))
+    n_tc = len(t_tc) - len(t_tc) % 2
+    T, index = ts.wave_periods(vh=0.0, pdef='t2c')
+    assert(np.allclose(T, t_tc[1:n_tc:2] - t_tc[0:n_tc:2]))
+    assert(np.all(T > 0))
+
+def test_trough_crest_scan_shared():
+    import wafo.objects as wo
+    findtc = wo.findtc
+    calls = []
+    def counting_findtc(*args, **kwds):
+        calls.append(1)
+        return findtc(*args, **kwds)
+    ts = wo.mat2timeseries(wafo.data.sea()[:2000])
+    wo.findtc = counting_findtc
+    try:
+        wp = ts.wave_parameters()
+        S, H = ts.wave_height_steepness()
+        tc = ts.trough_crest(v=0, wavetype='tw')
+        T, index = ts.wave_periods(vh=0, pdef='t2t', wdef='tw')
+        assert(len(calls) == 1)
+        ts.data *= 2
+        wp2 = ts.wave_parameters()
+        assert(len(calls) == 2)
+    finally:
+        wo.findtc = findtc
+    assert(np.allclose(wp2['Ac'], 2 * wp['Ac']))
+    assert(np.all(tc.args == ts.args[index]))
+
 def test_timeseries_trdata():
     '''
     >>> import wafo.spectrum.models as sm
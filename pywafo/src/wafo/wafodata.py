@@ -5,6 +5,7 @@ from time import gmtime, strftime
 import numpy as np
 from scipy.integrate.quadrature import cumtrapz #@UnresolvedImport
 from scipy.interpolate import griddata
+from wafo.interpolate import _grid_interpolator
 from scipy import integrate
 
 __all__ = ['PlotData', 'AxisLabels']
@@ -107,8 +108,25 @@ class PlotData(object):
         tmp2 = self.plotter.plot(self, *main_args, **main_kwds)
         return tmp2, tmp
 
-    def eval_points(self, *args, **kwds):
+    def eval_points(self, *points, **kwds):
         '''
+        Interpolate data at points
+
+        Parameters
+        ----------
+        points : ndarray of float, shape (..., ndim) or ndim arrays
+            Points where to interpolate data at.
+        method : {'linear', 'nearest', 'cubic'}
+            Method of interpolation.
+        fill_value : float, optional
+            Value used for points outside the data (default nan).
+
+        Data on a rectilinear grid, i.e., self.data.shape equal to the shape
+        of meshgrid(*self.args), are interpolated with a RectilinearInterp
+        object. Its grid lookup is reused as long as self.args is not
+        replaced, while self.data is read on each call. Other data are passed
+        on to griddata.
+
         >>> x = np.linspace(0,5,20)
         >>> d = PlotData(np.sin(x),x)
         >>> xi = np.linspace(0,5,60)
@@ -117,6 +135,11 @@ class PlotData(object):
         >>> hi = di.plot()
     
         '''
+        options = dict(method='linear')
+        options.update(**kwds)
+        interpolator = _grid_interpolator(self, **options)
+        if interpolator is not None:
+            return interpolator(*points)
         if isinstance(self.args, (list, tuple)): # Multidimensional data
             ndim = len(self.args)
             if ndim < 2:
@@ -127,16 +150,23 @@ class PlotData(object):
                 Unless you fix this, the plot methods will not work!'''
                 warnings.warn(msg)
             else:
-                return griddata(self.args, self.data.ravel(), *args,**kwds)
+                return griddata(self.args, self.data.ravel(), *points, **options)
         else: #One dimensional data
-            return griddata((self.args,), self.data, *args,**kwds)
+            return griddata((self.args,), self.data, *points, **options)
 
     def integrate(self, a, b, **kwds):
         '''
         >>> x = np.linspace(0,5,60)
         >>> d = PlotData(np.sin(x), x)
         >>> d.integrate(0,np.pi/2)
-        0.99940054759302188
+        0.99940054759302177
+
+        N-D data on a rectilinear grid are integrated over the box [a, b]
+        >>> y = np.linspace(0,2,30)
+        >>> X, Y = np.meshgrid(x, y)
+        >>> d2 = PlotData(np.sin(X)*Y, [x, y])
+        >>> round(d2.integrate([0, 0], [np.pi/2, 2]), 3)
+        1.999
         
         '''
         method = kwds.pop('method','trapz')
@@ -151,7 +181,11 @@ class PlotData(object):
                 Unless you fix this, the plot methods will not work!'''
                 warnings.warn(msg)
             else:
-                return griddata(self.args, self.data.ravel(), **kwds)
+                interpolator = _grid_interpolator(self)
+                if interpolator is None:
+                    raise NotImplementedError('integration for ndim>1 only '
+                                              'implemented for gridded data')
+                return interpolator.integrate(a, b, method, **kwds)
         else: #One dimensional data
             
             x  = self.args
@@ -235,17 +269,20 @@ class Plotter_1d(object):
         step : stair-step plot
         scatter : scatter plot
     """
+    # Class attribute, because modules can not be pickled, e.g., when
+    # sending data to a process pool
+    plotbackend = plotbackend
+
     def __init__(self, plotmethod='plot'):
         self.plotfun = None
         if plotmethod is None:
             plotmethod = 'plot'
         self.plotmethod = plotmethod
-        self.plotbackend = plotbackend
 #        try:
 #            self.plotfun = getattr(plotbackend, plotmethod)
 #        except:
 #            pass
-        
+
     def show(self):
         plotbackend.show()
 
@@ -500,6 +537,32 @@ def test_integrate():
     x = np.linspace(0,5,60)
     d = PlotData(np.sin(x), x)
     print(d.integrate(0,np.pi/2,method='simps'))
+def test_eval_points_grid():
+    x = np.linspace(0, 3, 31)
+    y = np.linspace(-1, 1, 21)
+    X, Y = np.meshgrid(x, y)
+    d = PlotData(X * Y + Y, [x, y])
+    xi, yi = np.random.rand(2, 100) * [[3], [2]] - [[0], [1]]
+    assert np.allclose(d.eval_points(xi, yi), xi * yi + yi)
+    assert _grid_interpolator(d) is _grid_interpolator(d)
+    assert np.allclose(d.eval_points(np.vstack((xi, yi)).T, method='cubic'),
+                       xi * yi + yi)
+    assert np.isnan(d.eval_points(4, 0))
+    d.data = 2 * d.data
+    assert np.allclose(d.eval_points(xi, yi), 2 * (xi * yi + yi))
+    assert np.allclose(d.integrate([0, 0], [3, 1]), 7.5)
+    d.data *= 2
+    assert np.allclose(d.eval_points(xi, yi), 4 * (xi * yi + yi))
+    assert np.allclose(d.eval_points(xi, yi, method='nearest'),
+                       4 * PlotData(X * Y + Y, [x, y]).eval_points(
+                           xi, yi, method='nearest'))
+    d.data[:] = 0
+    assert np.all(d.eval_points(xi, yi) == 0)
+    assert np.all(d.eval_points(xi, yi, method='cubic') == 0)
+    # unsorted grid
+    d = PlotData((X * Y + Y)[::-1, ::-1], [x[::-1], y[::-1]])
+    assert np.allclose(d.eval_points(xi, yi), xi * yi + yi)
+    assert np.allclose(d.eval_points(xi, yi, method='cubic'), xi * yi + yi)
 def test_docstrings():
     import doctest
     doctest.testmod()
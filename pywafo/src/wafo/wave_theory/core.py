@@ -5,9 +5,13 @@ Created on 3. juni 2011
 '''
 import numpy as np
 from numpy import exp, expm1, inf, nan, pi, hstack, where, atleast_1d, cos, sin
-from dispersion_relation import w2k, k2w #@UnusedImport
+from dispersion_relation import w2k, k2w, _LRUCache #@UnusedImport
 
-__all__ =['w2k', 'k2w', 'sensor_typeid', 'sensor_type', 'TransferFunction']
+__all__ =['w2k', 'k2w', 'sensor_typeid', 'sensor_type', 'TransferFunction',
+          'transfer_matrix']
+
+# Transfer matrices keyed on the (w, theta, h) grid and the sensors
+_TRAN_CACHE = _LRUCache(maxsize=8)
 
 def hyperbolic_ratio(a, b, sa, sb):
     '''
@@ -331,7 +335,7 @@ class TransferFunction(object):
         k0 = np.flatnonzero(sgn < 0)
         if len(k0): # make sure Hw>=0 ie. transfer negative signs to Gwt
             Gwt[:, k0] = -Gwt[:, k0]
-            Hw[:, k0] = -Hw[:, k0]
+            Hw[..., k0] = -Hw[..., k0]
           
         if self.igam == 2: 
             #pab 09 Oct.2002: bug fix
@@ -340,7 +344,7 @@ class TransferFunction(object):
         return Hw, Gwt
     __call__ = tran 
 #---Private member methods
-    def _get_ee_cthxy(self, theta, kw):
+    def _get_cthxy(self, theta):
         # convert from angle in degrees to radians
         bet = self.bet
         thxr = self.thetax * pi / 180
@@ -349,10 +353,17 @@ class TransferFunction(object):
         cthx = bet * cos(theta - thxr + pi / 2)
         #cthy = cos(theta-thyr-pi/2)
         cthy = bet * sin(theta - thyr)
+        return cthx, cthy
+    
+    def _get_ee_cthxy(self, theta, kw):
+        cthx, cthy = self._get_cthxy(theta)
         
         # Compute location complex exponential
         x, y, unused_z = list(self.pos)
-        ee = exp((1j * (x * cthx + y * cthy)) * kw) # exp(i*k(w)*(x*cos(theta)+y*sin(theta)) size Nt X Nf
+        if x == 0 and y == 0:
+            ee = np.ones(np.broadcast(cthx, kw).shape, dtype=complex)
+        else:
+            ee = exp((1j * (x * cthx + y * cthy)) * kw) # exp(i*k(w)*(x*cos(theta)+y*sin(theta)) size Nt X Nf
         return ee, cthx, cthy
     
     def _get_zk(self, kw):
@@ -476,6 +487,104 @@ class TransferFunction(object):
         zk = self._get_zk(kw)
         return  hyperbolic_ratio(zk, hk, -1, -1), ee # sinh(zk)./sinh(hk), ee 
 
+def transfer_matrix(w, theta, sensors, h=inf, g=9.81, rho=1028, bet=1, 
+                    igam=1, thetax=90, thetay=0, kw=None, cache=True):
+    '''
+    Return transfer functions of an array of sensors based on linear wave theory
+
+    Parameters
+    ----------
+    w : array-like
+        vector of angular frequencies in Rad/sec. Length Nf
+    theta : array-like
+        vector of directions in radians           Length Nt
+    sensors : sequence of (pos, sensortype) pairs
+        position [x,y,z] and sensortype (name or id) of each sensor.
+    h, g, rho, bet, igam, thetax, thetay :
+        see TransferFunction.
+    kw : array-like
+        vector of wave numbers corresponding to angular frequencies, w. 
+        Length Nf (default calculated with w2k)
+    cache : bool
+        if True the result is looked up in, or stored in, a least recently 
+        used cache keyed on the input (default).
+
+    Returns
+    -------
+    Hwt : ndarray, shape (Ns, Nt, Nf)
+        complete transfer functions Hw*Gwt of each sensor, see 
+        TransferFunction.tran.
+
+    Notes
+    -----
+    The position of a sensor only enters through the factor 
+    exp(i*k(w)*(x*cos(theta)+y*sin(theta))). The remaining part is computed 
+    once for each distinct (sensortype, z) and the position factors of all
+    sensors in one pass.
+
+    Example
+    -------
+    >>> w = np.linspace(0.1, 2, 5); theta = np.linspace(-pi, pi, 7)
+    >>> sensors = [((0, 0, 0), 'n'), ((10, 0, 0), 'n'), ((0, 10, -5), 'p')]
+    >>> Hwt = transfer_matrix(w, theta, sensors, h=20)
+    >>> Hwt.shape
+    (3, 7, 5)
+    >>> tf = TransferFunction(pos=(10, 0, 0), sensortype='n', h=20)
+    >>> Hw, Gwt = tf.tran(w, theta)
+    >>> np.allclose(Hwt[1], Hw * Gwt)
+    True
+
+    See also
+    --------
+    TransferFunction
+    '''
+    w, theta = np.atleast_1d(w, theta)
+    w = w.ravel()
+    theta = theta.ravel()
+    positions = np.zeros((len(sensors), 3))
+    sensortypes = []
+    for i, (pos, sensortype) in enumerate(sensors):
+        positions[i] = pos
+        if not isinstance(sensortype, str):
+            sensortype = sensor_type(sensortype)[0]
+        sensortypes.append(sensortype)
+
+    options = (h, g, rho, bet, igam, thetax, thetay)
+    if cache:
+        kw_key = None if kw is None else np.asarray(kw, dtype=float).tostring()
+        key = (w.astype(float).tostring(), theta.astype(float).tostring(), 
+               kw_key, positions.tostring(), tuple(sensortypes), options)
+        Hwt = _TRAN_CACHE.get(key)
+        if Hwt is not None:
+            return Hwt.copy()
+
+    if kw is None:
+        kw = w2k(w, 0, h, g)[0]
+    kw = np.atleast_1d(kw).ravel()
+
+    tf = TransferFunction(h=h, g=g, rho=rho, bet=bet, igam=igam, 
+                          thetax=thetax, thetay=thetay)
+    cthx, cthy = tf._get_cthxy(theta[:, None])
+    x, y, z = positions.T
+    # exp(i*k(w)*(x*cos(theta)+y*sin(theta)) size Ns x Nt X Nf
+    phase = (x[:, None, None] * cthx + y[:, None, None] * cthy) * kw
+    Hwt = np.empty(phase.shape, dtype=complex)
+    Hwt.real = cos(phase)
+    Hwt.imag = sin(phase)
+    del phase
+
+    groups = {}
+    for i, key0 in enumerate(zip(sensortypes, z)):
+        groups.setdefault(key0, []).append(i)
+    for (sensortype, zi), ix in groups.items():
+        tf.pos = (0, 0, zi)
+        tf.sensortype = sensortype
+        Hw, Gwt = tf.tran(w, theta, kw)
+        Hwt[ix] *= Hw * Gwt
+    if cache:
+        _TRAN_CACHE.set(key, Hwt.copy())
+    return Hwt
+
 #def wave_pressure(z, Hm0, h=10000, g=9.81, rho=1028):
 #    '''
 #    Calculate pressure amplitude due to water waves.
@@ -6,11 +6,44 @@ w2k - Translates from frequency to wave number
 """
 import warnings
 #import numpy as np
+from collections import OrderedDict
 from numpy import (atleast_1d, sqrt, ones_like, zeros_like, arctan2, where, tanh, any, #@UnresolvedImport
-    sin, cos, sign, inf, flatnonzero, finfo, cosh, abs) #@UnresolvedImport
+    sin, cos, sign, inf, flatnonzero, finfo, abs, isinf) #@UnresolvedImport
 
 __all__  = ['k2w', 'w2k']
 
+class _LRUCache(object):
+    '''
+    Least recently used cache with at most maxsize items
+    '''
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        try:
+            value = self._data.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+        self._data[key] = value
+        self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._data.pop(key, None)
+        self._data[key] = value
+        while len(self._data) > max(self.maxsize, 0):
+            self._data.popitem(last=False)
+
+    def clear(self):
+        self._data.clear()
+        self.hits = self.misses = 0
+
+# Wave numbers, k(w), keyed on the frequency grid, depth and gravity
+_W2K_CACHE = _LRUCache(maxsize=32)
+
 def k2w(k1, k2=0e0, h=inf, g=9.81, u1=0e0, u2=0e0):
     ''' Translates from wave number to frequency
         using the dispersion relation
@@ -70,7 +103,8 @@ def k2w(k1, k2=0e0, h=inf, g=9.81, u1=0e0, u2=0e0):
     theta = arctan2(k2, k1)
 
     k = sqrt(k1i**2+k2i**2)
-    w = where(k>0, ku1+ku2+sqrt(gi*k*tanh(k*hi)), 0.0)
+    tanh_kh = where(isinf(hi), 1.0, tanh(k*where(isinf(hi), 0.0, hi)))
+    w = ku1+ku2+sqrt(gi*k*tanh_kh)
 
     cond = (w<0)
     if any(cond):
@@ -84,7 +118,7 @@ def k2w(k1, k2=0e0, h=inf, g=9.81, u1=0e0, u2=0e0):
 
     return w, theta
 
-def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100):
+def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100, cache=True):
     '''
     Translates from frequency to wave number
       using the dispersion relation
@@ -99,6 +133,11 @@ def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100):
         water depth [m].
     g : real scalar or array-like of size 2.
         constant of gravity [m/s**2] or 3D normalizing constant
+    count_limit : scalar integer
+        maximum number of Newton iterations (default 100).
+    cache : bool
+        if True the wave numbers for finite depth are looked up in, or 
+        stored in, a least recently used cache keyed on (w, h, g) (default).
 
     Returns
     -------
@@ -109,7 +148,11 @@ def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100):
     -----------
     Uses Newton Raphson method to find the wave number k in the dispersion relation 
         w**2= g*k*tanh(k*h).
-    The solution k(w) => k1 = k(w)*cos(theta)
+    The iteration starts from the explicit approximation of Fenton and McKee 
+    (1990), 
+        k*h = x/tanh(x**(3/4))**(2/3), where x = w**2*h/g,
+    which has a relative error less than 2%, so that it usually converges in
+    2-3 iterations. The solution k(w) => k1 = k(w)*cos(theta)
                          k2 = k(w)*sin(theta)
     The size of k1,k2 is the common shape of w and theta according to numpy
     broadcasting rules. If w or theta is scalar it functions as a constant
@@ -131,6 +174,12 @@ def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100):
     See also
     --------
     k2w
+
+    Reference
+    ---------
+    Fenton, J.D. and McKee, W.D. (1990)
+    "On calculating the lengths of water waves",
+    Coastal Engineering, Vol 14, pp 499-513
     '''
     wi, th, hi, gi = atleast_1d(w, theta, h, g)
 
@@ -151,17 +200,44 @@ def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100):
         raise ValueError(txt0)
 
 
+    if cache:
+        key = (wi.shape, wi.astype(float).tostring(), hi.shape, 
+               hi.astype(float).tostring(), float(gi[0]), count_limit)
+        kc = _W2K_CACHE.get(key)
+        if kc is None:
+            kc = _w2k_newton(wi, hi, gi, count_limit)
+            _W2K_CACHE.set(key, kc)
+        k = kc.copy()
+    else:
+        k = _w2k_newton(wi, hi, gi, count_limit)
+
+    k2 = k*sin(th)
+    k1 = k*cos(th)
+    return k1, k2
+
+def _w2k_newton(wi, hi, gi, count_limit=100):
+    '''
+    Return wave numbers solving w**2= g*k*tanh(k*h) by Newton's method
+    '''
     find = flatnonzero
     eps = finfo(float).eps
 
-    oshape = k.shape
-    wi, k, hi = wi.ravel(), k.ravel(), hi.ravel()
+    oshape = wi.shape
+    wi, hi = wi.ravel(), hi.ravel()
+
+    # Initial guess of Fenton and McKee (1990)
+    hi = hi * ones_like(wi)
+    x = wi**2.0 * where(isinf(hi), 0.0, hi) / gi[0]
+    deep = (x > 20) | isinf(hi)
+    xs = where((x > 0) & ~deep, x, 1.0)
+    k = where(deep, 1.0*sign(wi)*wi**2.0 / gi[0],
+              sign(wi) * xs / tanh(xs**0.75)**(2.0/3) / where(deep, 1.0, hi))
+    k = where(wi != 0, k, 0.0)
 
     # Newton's Method
     # Permit no more than count_limit iterations.
-    hi = hi * ones_like(k)
     hn = zeros_like(k)
-    ix = find((wi<0) | (0<wi))
+    ix = find(((wi<0) | (0<wi)) & ~isinf(hi))
 
     # Break out of the iteration loop for three reasons:
     #  1) the last update is very small (compared to x)
@@ -171,7 +247,9 @@ def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100):
     while (ix.size>0 and count < count_limit):
         ki = k[ix]
         kh = ki * hi[ix]
-        hn[ix] = (ki*tanh(kh)-wi[ix]**2.0/gi)/(tanh(kh)+kh/(cosh(kh)**2.0))
+        tanh_kh = tanh(kh)
+        # 1/cosh(kh)**2 = 1-tanh(kh)**2 avoids overflow for large kh
+        hn[ix] = (ki*tanh_kh-wi[ix]**2.0/gi)/(tanh_kh+kh*(1.0-tanh_kh**2.0))
         knew = ki - hn[ix]
         # Make sure that the current guess is not zero.
         # When Newton's Method suggests steps that lead to zero guesses
@@ -193,10 +271,7 @@ def w2k(w, theta=0.0, h=inf, g=9.81, count_limit=100):
         warnings.warn(txt1)
 
     k.shape = oshape
-
-    k2 = k*sin(th)
-    k1 = k*cos(th)
-    return k1, k2
+    return k
 
 def main():
     import doctest
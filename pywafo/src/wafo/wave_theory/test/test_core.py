@@ -0,0 +1,43 @@
+'''
+Test functions for the wafo.wave_theory.core module
+'''
+import numpy as np
+from wafo.wave_theory.core import TransferFunction, transfer_matrix
+
+
+def test_transfer_matrix():
+    w = np.linspace(0.05, 3, 64)
+    theta = np.linspace(-np.pi, np.pi, 37)
+    stypes = ['n', 'n_t', 'n_tt', 'n_x', 'n_y', 'n_xx', 'n_yy', 'n_xy', 'p',
+              'u', 'v', 'w', 'u_t', 'v_t', 'w_t', 'x_p', 'y_p', 'z_p']
+    sensors = [((10 * np.cos(i), 10 * np.sin(i), -(i % 7)), stype)
+               for i, stype in enumerate(stypes)]
+    sensors.append(((1., 2., -3.), 8))
+    for h in [np.inf, 15.]:
+        Hwt = transfer_matrix(w, theta, sensors, h=h, cache=False)
+        assert(Hwt.shape == (len(sensors), 37, 64))
+        for i, (pos, stype) in enumerate(sensors[:-1]):
+            tf = TransferFunction(pos=pos, sensortype=stype, h=h)
+            Hw, Gwt = tf.tran(w, theta)
+            assert(np.allclose(Hwt[i], Hw * Gwt))
+        assert(np.allclose(Hwt[-1], transfer_matrix(w, theta, [((1, 2, -3), 'p')], h=h)))
+
+
+def test_transfer_matrix_cache():
+    from wafo.wave_theory.core import _TRAN_CACHE
+    _TRAN_CACHE.clear()
+    w = np.linspace(0.05, 3, 64)
+    theta = np.linspace(-np.pi, np.pi, 37)
+    sensors = [((0, 0, 0), 'n'), ((5, 0, 0), 'n_x')]
+    Hwt = transfer_matrix(w, theta, sensors, h=20)
+    Hwt[:] = 0
+    Hwt1 = transfer_matrix(w, theta, sensors, h=20)
+    assert(_TRAN_CACHE.hits == 1 and _TRAN_CACHE.misses == 1)
+    assert(np.allclose(Hwt1, transfer_matrix(w, theta, sensors, h=20, cache=False)))
+    transfer_matrix(w, theta, sensors, h=30)
+    assert(_TRAN_CACHE.misses == 2)
+
+
+if __name__ == '__main__':
+    import nose
+    nose.run()
@@ -25,7 +25,31 @@ def test_w2k_finite_water_depth():
     vals = w2k(range(4),h=20)[0]
     true_vals = np.array([ 0.        ,  0.10503601,  0.40774726,  0.91743119])
     assert((np.abs(vals-true_vals)<1e-7).all())
-    
+
+def test_w2k_newton_accuracy():
+    w = np.linspace(-3, 6, 1001)
+    for h in [0.5, 5., 20., 200.]:
+        k = w2k(w, 0, h, cache=False)[0]
+        assert((np.abs(w**2 - 9.81*k*np.tanh(k*h)) <= 1e-7*w**2).all())
+        assert((np.sign(k) == np.sign(w)).all())
+        assert(np.allclose(k2w(k, h=h)[0], np.abs(w)))
+
+def test_w2k_cache():
+    from wafo.wave_theory.dispersion_relation import _W2K_CACHE
+    _W2K_CACHE.clear()
+    w = np.linspace(0, 3, 257)
+    k1 = w2k(w, 0.5, h=20)
+    k2 = w2k(w, 0.1, h=20)
+    assert(_W2K_CACHE.hits == 1 and _W2K_CACHE.misses == 1)
+    k3 = w2k(w, 0.1, h=20, cache=False)
+    assert(np.allclose(k2, k3))
+    assert(np.allclose(np.hypot(*k1), np.hypot(*k2)))
+    w2k(w, 0.1, h=30)
+    assert(_W2K_CACHE.misses == 2)
+    # returned arrays must not be shared with the cache
+    k2[0][:] = 0
+    assert(np.allclose(w2k(w, 0.1, h=20)[0], k3[0]))
+
 if __name__ == '__main__':
     import nose
     nose.run()
\ No newline at end of file